@@ -0,0 +1,53 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+"""Measure the throughput of each merge copy mode.
+
+A source file of the given size is created in DIR (use a folder on the
+volume of your archive), and copied a number of times with each mode::
+
+    python benchmarks/bench_copy.py [-d DIR] [-s SIZE_MB] [-n COUNT]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyimgren.fastcopy import COPY_MODES, copy_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-d", "--dir", default=None)
+    parser.add_argument("-s", "--size", type=int, default=64,
+                        help="size of the source file in MB")
+    parser.add_argument("-n", "--count", type=int, default=10)
+    params = parser.parse_args()
+    with tempfile.TemporaryDirectory(dir=params.dir) as folder:
+        src = os.path.join(folder, "src.jpg")
+        with open(src, "wb") as fd:
+            for _ in range(params.size):
+                fd.write(os.urandom(1 << 20))
+        print("{:10} {:10} {:>12}".format("mode", "method", "MB/s"))
+        for mode in COPY_MODES:
+            method = "-"
+            start = time.perf_counter()
+            try:
+                for i in range(params.count):
+                    method = copy_file(src, os.path.join(
+                        folder, "{}{}.jpg".format(mode, i)), mode)
+            except OSError:
+                print("{:10} {:10} {:>12}".format(mode, "-",
+                                                  "unsupported"))
+                continue
+            elapsed = time.perf_counter() - start
+            print("{:10} {:10} {:>12.0f}".format(
+                mode, method, params.size * params.count / elapsed))
+
+
+if __name__ == "__main__":
+    main()
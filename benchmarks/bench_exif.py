@@ -0,0 +1,88 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+"""Compare the exif fast paths with a full piexif.load.
+
+For each file, prints the number of bytes read and the mean wall time of
+the stream reader and of piexif, and the mean wall time of
+exif.file_timestamp (which maps TIFF based files in memory)::
+
+    python benchmarks/bench_exif.py [-n REPEAT] files...
+"""
+
+import argparse
+import io
+import os.path
+import sys
+import time
+
+import piexif
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyimgren import exif
+
+
+class CountingFile(io.FileIO):
+    """A raw file that counts the bytes actually read"""
+    nread = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.nread += len(data)
+        return data
+
+
+def fast(file):
+    with CountingFile(file) as fd:
+        try:
+            exif.read_timestamp(fd)
+        except exif.UndecidedError:
+            return fd.nread + os.path.getsize(file)
+        return fd.nread
+
+
+def mapped(file):
+    with open(file, "rb") as fd:
+        try:
+            exif.file_timestamp(fd)
+        except exif.UndecidedError:
+            pass
+    return 0
+
+
+def full(file):
+    with CountingFile(file) as fd:
+        try:
+            piexif.load(fd.read())
+        except ValueError:
+            pass
+        return fd.nread
+
+
+def measure(func, file, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        nread = func(file)
+    return nread, (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-n", "--repeat", type=int, default=100)
+    parser.add_argument("files", nargs="*", default=[os.path.join(
+        os.path.dirname(__file__), "..", "tests", "DSCF9762.JPG")])
+    params = parser.parse_args()
+    print("{:30} {:>10} {:>10} {:>10} {:>10} {:>10}".format(
+        "file", "fast B", "fast us", "file us", "piexif B", "piexif us"))
+    for file in params.files:
+        fb, ft = measure(fast, file, params.repeat)
+        _mb, mt = measure(mapped, file, params.repeat)
+        pb, pt = measure(full, file, params.repeat)
+        print("{:30} {:>10} {:>10.1f} {:>10.1f} {:>10} {:>10.1f}".format(
+            os.path.basename(file)[-30:], fb, ft * 1e6, mt * 1e6, pb,
+            pt * 1e6))
+
+
+if __name__ == "__main__":
+    main()
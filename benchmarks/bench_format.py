@@ -0,0 +1,61 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+"""Compare the naming of pictures through datetime objects and stamps.
+
+For N raw exif timestamps of pictures taken during sessions of a few
+hours, times the former path (strptime, timedelta and strftime) and the
+stamps path (parse and a compiled NameFormat)::
+
+    python benchmarks/bench_format.py [-n N] [--delta MINUTES] [--mask MASK]
+"""
+
+import argparse
+import datetime
+import os.path
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyimgren import stamps
+
+
+def with_datetime(raws, delta, mask):
+    delta = datetime.timedelta(minutes=delta)
+    return [(datetime.datetime.strptime(raw.decode("ascii"),
+                                        "%Y:%m:%d %H:%M:%S")
+             + delta).strftime(mask) for raw in raws]
+
+
+def with_stamps(raws, delta, mask):
+    fmt = stamps.NameFormat(mask)
+    return [fmt(stamps.parse(raw), delta) for raw in raws]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-n", type=int, default=100_000)
+    parser.add_argument("--delta", type=int, default=0)
+    parser.add_argument("--mask", default="%Y%m%d_%H%M%S")
+    params = parser.parse_args()
+    rnd = random.Random(0)
+    # pictures taken during sessions of a few hours, 500 per session
+    sessions = [datetime.datetime(2000, 1, 1, 8) + datetime.timedelta(
+        days=rnd.randrange(9000)) for _ in range(max(1, params.n // 500))]
+    raws = [(rnd.choice(sessions) + datetime.timedelta(
+        seconds=rnd.randrange(36000))).strftime(
+            "%Y:%m:%d %H:%M:%S").encode("ascii") for _ in range(params.n)]
+    results = {}
+    for func in (with_datetime, with_stamps):
+        begin = time.perf_counter()
+        results[func.__name__] = func(raws, params.delta, params.mask)
+        print("{:15} {:10.3f} s".format(func.__name__,
+                                        time.perf_counter() - begin))
+    if results["with_datetime"] != results["with_stamps"]:
+        sys.exit("different names")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+"""Time get_new_file_name against large names.log contents.
+
+For each size, a Renamer is given a names mapping of that many entries
+and asked for new names colliding or not with existing ones::
+
+    python benchmarks/bench_names.py [-n CALLS] [sizes...]
+"""
+
+import argparse
+import collections
+import os.path
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyimgren import Renamer
+
+
+def build_names(size):
+    return collections.OrderedDict(
+        ("{:08d}_120000.jpg".format(i), "DSCF{:07d}.JPG".format(i))
+        for i in range(size))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-n", "--calls", type=int, default=1000)
+    parser.add_argument("sizes", nargs="*", type=int,
+                        default=[10_000, 100_000, 1_000_000])
+    params = parser.parse_args()
+    print("{:>10} {:>12} {:>12}".format("entries", "index s", "call us"))
+    with tempfile.TemporaryDirectory() as folder:
+        for size in params.sizes:
+            ren = Renamer(folder)
+            ren.names = build_names(size)
+            start = time.perf_counter()
+            ren._names_index()
+            built = time.perf_counter() - start
+            start = time.perf_counter()
+            for i in range(params.calls):
+                # half of the names collide with an existing entry
+                ren.get_new_file_name("{:08d}_120000.jpg".format(
+                    i * 2 * size // params.calls))
+            elapsed = (time.perf_counter() - start) / params.calls
+            print("{:>10} {:>12.3f} {:>12.1f}".format(size, built,
+                                                      elapsed * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+"""Measure how a rename of a huge folder scales with the shard pool.
+
+For each number of workers, a fresh copy of a synthetic corpus (see
+corpus.py) is renamed with the "shard" pool and with the "process" pool
+(which only reads the exif dates in the workers). The wall time, the
+speedup over one worker and the time spent by the parent in the naming
+and rename phases (the serial part) are printed::
+
+    python benchmarks/bench_shard.py [-n FILES] [-j 1,2,4,8,16,32]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pyimgren import Renamer
+import corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-n", "--files", type=int, default=100_000)
+    parser.add_argument("-j", "--jobs", default="1,2,4,8,16,32",
+                        help="comma separated numbers of workers")
+    parser.add_argument("--burst", type=int, default=5,
+                        help="pictures sharing the same second")
+    params = parser.parse_args()
+    jobs = [int(job) for job in params.jobs.split(",")]
+    with tempfile.TemporaryDirectory() as tmp:
+        master = os.path.join(tmp, "corpus")
+        corpus.make_corpus(master, params.files, burst=params.burst,
+                           payload=64)
+        print("{:>8} {:>8} {:>10} {:>8} {:>10}".format(
+            "pool", "workers", "time s", "speedup", "serial s"))
+        for pool in ("shard", "process"):
+            base = None
+            for workers in jobs:
+                folder = os.path.join(tmp, "run")
+                shutil.copytree(master, folder)
+                ren = Renamer(folder)
+                begin = time.perf_counter()
+                ren.rename("*.JPG", workers=workers, pool=pool)
+                elapsed = time.perf_counter() - begin
+                base = base or elapsed
+                print("{:>8} {:>8} {:>10.2f} {:>8.2f} {:>10.2f}".format(
+                    pool, workers, elapsed, base / elapsed,
+                    ren.stats.times["name"] + ren.stats.times["rename"]))
+                shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
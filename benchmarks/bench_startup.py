@@ -0,0 +1,89 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+"""Time the startup of the pyimgren command line against a budget.
+
+Each command is started REPEAT times in a new interpreter (as a file
+watcher would do) and its median wall time is compared to its budget.
+The back command runs on a small folder renamed before each run. The
+exit status is 1 if a command exceeds its budget::
+
+    python benchmarks/bench_startup.py [-n REPEAT] [--files FILES]
+        [--budget-version SECONDS] [--budget-back SECONDS]
+
+The budgets include the start of the interpreter (about 20 ms); they are
+meant for a warm file system cache and compiled byte code.
+"""
+
+import argparse
+import os.path
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import corpus
+
+
+def run_cli(*args):
+    """Start python -m pyimgren with args, return its wall time."""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "pyimgren"] + list(args),
+                   check=True, env=env, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def import_time():
+    """Return the cumulated import time of pyimgren.cmdline in seconds."""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                           "import pyimgren.cmdline"], env=env,
+                          stderr=subprocess.PIPE, universal_newlines=True,
+                          check=True)
+    last = proc.stderr.strip().splitlines()[-1]
+    return int(last.split("|")[1]) / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-n", "--repeat", type=int, default=10)
+    parser.add_argument("--files", type=int, default=20,
+                        help="number of files of the folder for back")
+    parser.add_argument("--budget-version", type=float, default=0.1)
+    parser.add_argument("--budget-back", type=float, default=0.2)
+    params = parser.parse_args()
+    run_cli("--version")            # compile the byte code
+    times = {"--version": [], "back": []}
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "src")
+        corpus.make_corpus(src, params.files)
+        for _ in range(params.repeat):
+            times["--version"].append(run_cli("--version"))
+            folder = os.path.join(tmp, "pict")
+            shutil.rmtree(folder, ignore_errors=True)
+            shutil.copytree(src, folder)
+            run_cli("-f", folder, "rename", "*.JPG")
+            times["back"].append(run_cli("-f", folder, "back"))
+    print("import pyimgren.cmdline: {:.1f} ms".format(import_time() * 1000))
+    print("{:12} {:>10} {:>10} {:>10}".format("command", "median ms",
+                                               "budget ms", "status"))
+    failed = False
+    for command, budget in (("--version", params.budget_version),
+                            ("back", params.budget_back)):
+        median = statistics.median(times[command])
+        status = "ok" if median <= budget else "OVER"
+        failed = failed or median > budget
+        print("{:12} {:>10.1f} {:>10.1f} {:>10}".format(
+            command, median * 1000, budget * 1000, status))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+"""Synthetic corpora for the benchmarks.
+
+make_corpus writes minimal JPEG files with controllable exif layouts:
+
+* bursts of pictures sharing the same second (collisions in names)
+* pictures without any date tag, or with only the IFD0 DateTime
+* pictures with a large MakerNote before the image data
+
+make_names_log writes a names.log of any number of lines.
+"""
+
+import datetime
+import os
+import random
+import struct
+
+import piexif
+
+_START = datetime.datetime(2020, 1, 1, 8, 0, 0)
+
+
+def jpeg_bytes(tags=None, payload=4096):
+    """Build a JPEG file content with an optional exif segment followed by
+    payload bytes of (fake) image data."""
+    data = b"\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01\x01\x01\x00H\x00H\x00\x00"
+    if tags is not None:
+        seg = piexif.dump(tags)
+        data += b"\xff\xe1" + struct.pack(">H", len(seg) + 2) + seg
+    return data + b"\xff\xda\x00\x02" + b"\x00" * payload + b"\xff\xd9"
+
+
+def make_corpus(folder, count, burst=1, missing=0.0, ifd0_only=0.0,
+                makernote=0, payload=4096, seed=0):
+    """Write count pictures named DSCF0000.JPG... in folder.
+
+    Parameters:
+        folder    : the folder (created if needed)
+        count     : number of pictures
+        burst     : number of consecutive pictures sharing the same second
+        missing   : ratio of pictures without any date
+        ifd0_only : ratio of pictures only having the IFD0 DateTime tag
+        makernote : size of a MakerNote tag added to every picture
+        payload   : size of the fake image data
+        seed      : seed of the random choices
+
+    Returns:
+        list: the names of the files
+    """
+    rnd = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    names = []
+    for i in range(count):
+        date = (_START + datetime.timedelta(seconds=i // burst)).strftime(
+            "%Y:%m:%d %H:%M:%S").encode("ascii")
+        roll = rnd.random()
+        if roll < missing:
+            tags = {"0th": {0x10f: b"Synthetic"}}
+        elif roll < missing + ifd0_only:
+            tags = {"0th": {0x132: date}}
+        else:
+            tags = {"0th": {0x132: date},
+                    "Exif": {0x9003: date, 0x9004: date}}
+        if makernote and "Exif" in tags:
+            tags["Exif"][0x927c] = bytes(rnd.getrandbits(8)
+                                         for _ in range(makernote))
+        name = "DSCF{:04d}.JPG".format(i)
+        with open(os.path.join(folder, name), "wb") as fd:
+            fd.write(jpeg_bytes(tags, payload))
+        names.append(name)
+    return names
+
+
+def make_names_log(folder, lines, ref_file="names.log"):
+    """Write a names.log of lines entries (for files that do not exist)."""
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, ref_file), "w", encoding="utf-8") as fd:
+        for i in range(lines):
+            date = _START + datetime.timedelta(seconds=i)
+            fd.write("{}.jpg:IMG{:07d}.JPG\n".format(
+                date.strftime("%Y%m%d_%H%M%S"), i))
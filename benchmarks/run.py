@@ -0,0 +1,165 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+"""Benchmark suite for the rename, merge, back and load_names hot paths.
+
+Each scenario runs on a fresh copy of a synthetic corpus (see corpus.py).
+The best wall time of REPEAT runs is kept, and one more run measures the
+peak of Python memory (tracemalloc) and, on Linux, the number of read and
+write system calls (/proc/self/io). Results are printed and can be saved
+as JSON to be compared with the results of another commit::
+
+    python benchmarks/run.py -o before.json
+    ... change the code ...
+    python benchmarks/run.py -o after.json --compare before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pyimgren import Renamer
+import corpus
+
+# name: (corpus parameters, names.log lines)
+CORPORA = {
+    "plain": (dict(), 0),
+    "burst": (dict(burst=30), 0),
+    "sparse": (dict(missing=0.3, ifd0_only=0.3), 0),
+    "makernote": (dict(makernote=32768), 0),
+}
+
+
+def io_counters():
+    """Return (read syscalls, write syscalls) or None if not available."""
+    try:
+        with open("/proc/self/io") as fd:
+            values = dict(line.split(": ") for line in fd.read().splitlines())
+        return int(values["syscr"]), int(values["syscw"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def scenarios(params):
+    """Yield (name, setup, run) triples.
+
+    setup(folder) prepares a fresh folder and returns a callable context
+    for run(context)."""
+    for kind, (options, _lines) in CORPORA.items():
+        def setup_rename(folder, options=options):
+            corpus.make_corpus(folder, params.files, **options)
+            return Renamer(folder)
+        yield ("rename/" + kind, setup_rename,
+               lambda ren: ren.rename("*.JPG"))
+
+        def setup_merge(folder, options=options):
+            corpus.make_corpus(os.path.join(folder, "src"), params.files,
+                               **options)
+            os.mkdir(os.path.join(folder, "dst"))
+            return Renamer(os.path.join(folder, "dst")), os.path.join(
+                folder, "src")
+        yield ("merge/" + kind, setup_merge,
+               lambda ctx: ctx[0].merge("*.JPG", src_folder=ctx[1]))
+
+    def setup_back(folder):
+        corpus.make_corpus(folder, params.files, burst=10)
+        ren = Renamer(folder)
+        ren.rename("*.JPG")
+        return Renamer(folder)
+    yield "back/all", setup_back, lambda ren: ren.back()
+    yield "back/pattern", setup_back, lambda ren: ren.back("*0a.jpg")
+
+    for lines in params.names:
+        def setup_load(folder, lines=lines):
+            corpus.make_names_log(folder, lines)
+            return Renamer(folder)
+        yield ("load_names/{}".format(lines), setup_load,
+               lambda ren: ren.load_names())
+
+
+def measure(setup, run, repeat):
+    result = {}
+    walls = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as folder:
+            ctx = setup(folder)
+            start = time.perf_counter()
+            run(ctx)
+            walls.append(time.perf_counter() - start)
+    result["wall"] = min(walls)
+    with tempfile.TemporaryDirectory() as folder:
+        ctx = setup(folder)
+        before = io_counters()
+        tracemalloc.start()
+        run(ctx)
+        result["peak_mem"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        after = io_counters()
+        if before is not None and after is not None:
+            result["syscr"] = after[0] - before[0]
+            result["syscw"] = after[1] - before[1]
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+            text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+            check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-f", "--files", type=int, default=500,
+                        help="number of pictures per corpus")
+    parser.add_argument("--names", type=int, nargs="*",
+                        default=[1000, 10_000, 100_000],
+                        help="sizes of the names.log files to load")
+    parser.add_argument("-n", "--repeat", type=int, default=3)
+    parser.add_argument("-k", "--filter", default="",
+                        help="only run scenarios containing this string")
+    parser.add_argument("-o", "--output", help="save results as JSON")
+    parser.add_argument("--compare", help="JSON results to compare with")
+    params = parser.parse_args()
+
+    reference = {}
+    if params.compare:
+        with open(params.compare) as fd:
+            reference = {r["name"]: r for r in json.load(fd)["results"]}
+    results = []
+    print("{:22} {:>10} {:>12} {:>8} {:>8} {:>8}".format(
+        "scenario", "wall ms", "peak KiB", "syscr", "syscw", "ratio"))
+    for name, setup, run in scenarios(params):
+        if params.filter not in name:
+            continue
+        result = dict(name=name, **measure(setup, run, params.repeat))
+        results.append(result)
+        ratio = ""
+        if name in reference:
+            ratio = "{:.2f}".format(result["wall"] / reference[name]["wall"])
+        print("{:22} {:>10.1f} {:>12.0f} {:>8} {:>8} {:>8}".format(
+            name, result["wall"] * 1000, result["peak_mem"] / 1024,
+            result.get("syscr", "-"), result.get("syscw", "-"), ratio))
+    if params.output:
+        with open(params.output, "w") as fd:
+            json.dump({"meta": {"revision": git_revision(),
+                                "python": platform.python_version(),
+                                "platform": platform.platform(),
+                                "files": params.files},
+                       "results": results}, fd, indent=2)
+
+
+if __name__ == "__main__":
+    main()
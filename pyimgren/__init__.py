@@ -1,9 +1,18 @@
 # MIT License
 # Copyright (c) 2018-current s-ball
 
-from .renamer import Renamer, nls_init
+from .i18n import nls_init
 from .version import version as __version__
 
 
 __all__ = ["Renamer", "nls_init"]
 
+
+def __getattr__(name):
+    # the Renamer (and the exif and file machinery behind it) is only
+    # imported when first used, to keep the command line startup fast
+    if name == "Renamer":
+        from .renamer import Renamer
+        return Renamer
+    raise AttributeError("module {!r} has no attribute {!r}".format(
+        __name__, name))
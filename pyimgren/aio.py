@@ -0,0 +1,235 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+"""asyncio interface of a Renamer.
+
+An AsyncRenamer can be driven from an event loop (a GUI or a web service)
+without blocking it: every file system access runs in the default executor
+of the loop, and at most ``concurrency`` exif reads are in flight at the
+same time. The exif dates are read ahead while the files are renamed or
+copied one at a time in the order of the patterns, so that the names
+chosen are the same as with the synchronous commands, which share the
+naming and names.log logic.
+
+Cancelling a command stops it after the current file: the file operation
+in progress is completed and the names already given are saved in the
+ref_file before the CancelledError propagates.
+"""
+
+import asyncio
+import collections
+import os.path
+from typing import Callable, Iterable, Optional
+
+from .cache import MISSING
+from .fastcopy import COPY_MODES
+from .progress import CACHE_HIT, READ
+from . import renamer
+from .renamer import Renamer, exif_stamp
+
+#: a progress callback receives the original and the new name of a file
+Progress = Callable[[str, str], None]
+
+
+class AsyncRenamer(Renamer):
+    """A Renamer with coroutine versions of its commands.
+
+    Parameters:
+        folder     : as for Renamer
+        concurrency: maximum number of files read concurrently (default 8)
+
+    The other parameters are the ones of Renamer. The synchronous commands
+    are still available.
+
+    Example::
+
+        ren = AsyncRenamer(path)
+        await ren.arename("*.jpg", progress=lambda old, new: print(old, new))
+    """
+
+    def __init__(self, folder, *args, concurrency: int = 8, **kwargs):
+        super().__init__(folder, *args, **kwargs)
+        self.concurrency = concurrency
+
+    async def arename(self, *pictures, delta: int = 0, debug: bool = False,
+                      dummy: bool = False,
+                      progress: Optional[Progress] = None) -> None:
+        """Coroutine version of rename.
+
+        Parameters:
+            progress: an optional callable called with the original and
+                      the new name of each renamed file
+
+        See Renamer.rename for the other parameters.
+        """
+        self._begin(delta, debug, dummy)
+        try:
+            await asyncio.to_thread(self.load_names)
+            await self._aprocess(self._rename_filter(pictures), self.folder,
+                                 self._move, progress)
+        finally:
+            await self._aend()
+
+    async def aback(self, *pictures, delta: int = 0, debug: bool = False,
+                    dummy: bool = False, since=None, until=None,
+                    progress: Optional[Progress] = None) -> None:
+        """Coroutine version of back.
+
+        Parameters:
+            progress: an optional callable called with the current and the
+                      original name of each file renamed back
+
+        See Renamer.back for the other parameters.
+        """
+        self._begin(delta, debug, dummy)
+        try:
+            await asyncio.to_thread(self.load_names)
+            files = await asyncio.to_thread(self._back_files, pictures,
+                                            since, until)
+            for file in files:
+                orig = await _complete(asyncio.to_thread(self._back_file,
+                                                         file))
+                if orig is not None and progress is not None:
+                    progress(file, orig)
+        finally:
+            await self._aend()
+
+    async def amerge(self, *files, src_folder: str = '.', delta: int = 0,
+                     debug: bool = False, dummy: bool = False,
+                     copy_mode: str = "copy", dedupe: bool = False,
+                     progress: Optional[Progress] = None) -> None:
+        """Coroutine version of merge.
+
+        Parameters:
+            progress: an optional callable called with the name of each
+                      copied file (in src_folder) and the name of its copy
+
+        See Renamer.merge for the other parameters.
+        """
+        if copy_mode not in COPY_MODES:
+            raise ValueError(renamer._("Unknown copy mode {}").format(
+                copy_mode))
+        if renamer.is_archive(src_folder):
+            self._begin(delta, debug, dummy)
+            try:
+                await asyncio.to_thread(self.load_names)
+                await self._amerge_archive(src_folder, files, progress)
+            finally:
+                await self._aend()
+            return
+        self._begin(delta, debug, dummy)
+        self.copy_mode = copy_mode
+        if dedupe:
+            self._digests = renamer.DigestIndex(
+                self.folder, os.path.join(self.folder, renamer.DIGEST_FILE),
+                dummy)
+        try:
+            files = self._merge_filter(src_folder, files)
+            await asyncio.to_thread(self.load_names)
+            await self._aprocess(files, src_folder, self._copy, progress)
+        finally:
+            await self._aend()
+
+    async def _amerge_archive(self, path: str, patterns: Iterable[str],
+                              progress: Optional[Progress]):
+        """Asynchronous version of Renamer._merge_archive: the members are
+        read and copied one at a time."""
+        reader = await asyncio.to_thread(self._archive, path)
+        unmatched = []
+        members = reader.members(patterns, unmatched, lambda name:
+                                 self._accepts(path + renamer.ARCHIVE_SEP
+                                               + name))
+        while True:
+            member = await asyncio.to_thread(next, members, None)
+            if member is None:
+                break
+            new_name = await _complete(asyncio.to_thread(
+                self._merge_member, path, member))
+            if new_name is not None and progress is not None:
+                progress(member.name, new_name)
+        for pattern in unmatched:
+            self.log.warning(renamer._("{} not found").format(pattern))
+
+    async def _aprocess(self, pictures: Iterable[str], src_folder: str,
+                        file_action, progress: Optional[Progress]):
+        """Asynchronous version of Renamer._process.
+
+        The dates of the next files are read concurrently while the
+        current one is processed."""
+        files = await asyncio.to_thread(list, self._scan(pictures, src_folder))
+        cache = self._open_cache()      # used from the loop thread only
+        semaphore = asyncio.Semaphore(self.concurrency)
+        pending = collections.deque()
+        try:
+            for file in files:
+                pending.append((file, asyncio.ensure_future(
+                    self._aread(file, cache, semaphore))))
+                if len(pending) < 2 * self.concurrency:
+                    continue
+                await self._aprocess_one(*pending.popleft(), file_action,
+                                         progress)
+            while pending:
+                await self._aprocess_one(*pending.popleft(), file_action,
+                                         progress)
+        finally:
+            for _file, task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*(task for _file, task in pending),
+                                     return_exceptions=True)
+            if cache is not None:
+                cache.close()
+
+    async def _aprocess_one(self, file: str, task: asyncio.Future,
+                            file_action, progress: Optional[Progress]):
+        new_name = self._target_name(file, await task, file_action)
+        if new_name is None:
+            return
+        rel = os.path.basename(file)
+        done = await _complete(asyncio.to_thread(file_action, file,
+                                                 self.folder, new_name, rel))
+        if progress is not None and done is not False:     # see _copy
+            progress(rel, new_name)
+
+    async def _aread(self, file: str, cache, semaphore: asyncio.Semaphore):
+        """Read the exif date of a file, through the cache if any."""
+        async with semaphore:
+            if cache is None:
+                dat = await asyncio.to_thread(exif_stamp, file)
+                self._event(READ, file)
+                return dat
+            st = await asyncio.to_thread(os.stat, file)
+            dat = cache.get(file, st, raw=True)
+            if dat is MISSING:
+                dat = await asyncio.to_thread(exif_stamp, file)
+                self._event(READ, file)
+                cache.put(file, st, dat)
+            else:
+                self._event(CACHE_HIT, file)
+            return dat
+
+    async def _aend(self):
+        """Save the names and reset the Renamer at the end of a command."""
+        try:
+            if self.names is not None:
+                await asyncio.to_thread(self._save_names)
+        finally:
+            self._reset()
+
+
+async def _complete(coro):
+    """Await coro, letting it complete even if the caller is cancelled.
+
+    A file operation running in a thread cannot be interrupted: the names
+    must not be saved before its bookkeeping is done."""
+    try:
+        await asyncio.sleep(0)      # a pending cancellation stops us here
+    except asyncio.CancelledError:
+        coro.close()
+        raise
+    future = asyncio.ensure_future(coro)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        await future
+        raise
@@ -0,0 +1,292 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+"""Reading of the pictures of a zip or tar archive without extracting it.
+
+merge accepts an archive as src_folder: its members are read once, in
+archive order, and each one is streamed to its final name in the folder:
+
+* the first HEADER bytes of a member are read, which hold the exif
+  segment of a JPEG file and usually the IFDs of a TIFF based RAW file,
+  and the timestamp is found in that buffer (exif.buffer_timestamp)
+* the member is then copied to its new name, starting with the header
+  already read, so that no byte is read twice and nothing is written to
+  a scratch folder
+* a member whose date cannot be found in its header is spooled to a
+  temporary file (in the target folder, so that it is then only linked)
+  and read by the usual exif_stamp
+
+The original name recorded in the ref_file is ``archive!member``, for
+example ``card.zip!DCIM/100CANON/IMG_0001.JPG``.
+"""
+
+import errno
+import fnmatch
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+from typing import (BinaryIO, Callable, Iterable, Iterator, Optional,
+                    Tuple)
+
+from . import exif, stamps
+
+#: separator of the archive and the member in an original name
+ARCHIVE_SEP = "!"
+
+#: extensions of the archives, to recognize the names they give
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tgz", ".tar.gz", ".tbz2",
+                      ".tar.bz2", ".txz", ".tar.xz")
+
+#: number of bytes read from each member to find its timestamp
+HEADER = 128 * 1024
+
+_BLOCK = 1024 * 1024
+
+
+def is_archive(path: str) -> bool:
+    """Tells whether path is a zip or tar archive file."""
+    if not os.path.isfile(path):
+        return False
+    try:
+        return zipfile.is_zipfile(path) or tarfile.is_tarfile(path)
+    except OSError:
+        return False
+
+
+def split_source(source: str) -> Optional[Tuple[str, str]]:
+    """Split the source of a copy into an archive and a member.
+
+    Returns:
+        tuple: (archive path, member name), or None if source is not a
+            member of an existing archive
+    """
+    pos = source.find(ARCHIVE_SEP)
+    while pos >= 0:
+        if is_archive(source[:pos]):
+            return source[:pos], source[pos + 1:]
+        pos = source.find(ARCHIVE_SEP, pos + 1)
+    return None
+
+
+def member_name(orig: str) -> Optional[str]:
+    """Return the base name of the member for an original name recorded
+    for an archive (``archive!member``), or None for another name."""
+    pos = orig.find(ARCHIVE_SEP)
+    while pos >= 0:
+        if orig[:pos].lower().endswith(ARCHIVE_EXTENSIONS):
+            return orig[pos + 1:].rsplit("/", 1)[-1] or None
+        pos = orig.find(ARCHIVE_SEP, pos + 1)
+    return None
+
+
+class Member:
+    """A regular file of an archive, being read.
+
+    Attributes:
+        name  : the name of the member in the archive
+        size  : its size
+        header: its first HEADER bytes (or less for a smaller member)
+        spooled: the temporary file holding the member, if it was spooled
+    """
+
+    def __init__(self, name: str, size: int, stream: BinaryIO):
+        self.name, self.size = name, size
+        self._stream = stream
+        self.header = stream.read(HEADER)
+        self.spooled = None
+
+    def stamp(self) -> Optional[str]:
+        """Return the exif stamp found in the header, or None.
+
+        Raises:
+            exif.UndecidedError:
+                if the header does not allow to decide; the member can
+                then be spooled and read as a file
+        """
+        if exif.sniff(self.header[:exif.SNIFF_SIZE]) is None:
+            return None         # not a picture: never spooled
+        raw = exif.buffer_timestamp(memoryview(self.header))
+        return None if raw is None else stamps.parse(raw)
+
+    def spool(self, folder: str) -> str:
+        """Write the member into a new temporary file in folder and return
+        its path."""
+        fd, path = tempfile.mkstemp(".pyimgren.part", ".", folder)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                self._write(out)
+        except BaseException:
+            os.remove(path)
+            raise
+        self.spooled = path
+        return path
+
+    def copy_to(self, path: str):
+        """Copy the member into a new file."""
+        if self.spooled is not None:
+            # never overwrite path, as the "xb" open below
+            try:
+                os.link(self.spooled, path)
+            except FileExistsError:
+                raise
+            except OSError:     # no hard links on that file system
+                if os.path.lexists(path):
+                    raise FileExistsError(errno.EEXIST,
+                                          os.strerror(errno.EEXIST), path)
+                os.replace(self.spooled, path)
+            else:
+                os.remove(self.spooled)
+            self.spooled = None
+            return
+        with open(path, "xb") as out:
+            try:
+                self._write(out)
+            except BaseException:
+                out.close()
+                os.remove(path)
+                raise
+
+    def discard(self):
+        """Remove the spooled file, if any."""
+        if self.spooled is not None:
+            os.remove(self.spooled)
+            self.spooled = None
+
+    def close(self):
+        self.discard()
+        self._stream.close()
+
+    def _write(self, out: BinaryIO):
+        out.write(self.header)
+        self.header = b""       # the stream has moved past it
+        shutil.copyfileobj(self._stream, out, _BLOCK)
+
+
+class ArchiveReader:
+    """A zip or tar archive (possibly compressed) opened for reading.
+
+    Parameters:
+        path: the archive file
+
+    Raises:
+        ValueError:
+            if path is not a zip or tar archive
+
+    The archive (and the member being read) is closed at the end of a with
+    statement.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._zip = self._tar = None
+        self._current = None
+        if zipfile.is_zipfile(path):
+            self._zip = zipfile.ZipFile(path)
+        else:
+            try:
+                self._tar = tarfile.open(path)
+            except tarfile.TarError as e:
+                raise ValueError("{} is not an archive".format(path)
+                                 ) from e
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_args):
+        self.close()
+
+    def members(self, patterns: Iterable[str], unmatched: Optional[list]
+                = None, accept: Optional[Callable[[str], bool]] = None
+                ) -> Iterator[Member]:
+        """Yield the regular files matching one of patterns, in archive
+        order.
+
+        The patterns are matched with fnmatch against the whole member
+        names, so that ``*.JPG`` also matches ``DCIM/100CANON/X.JPG``.
+        Each Member can only be read until the next one is requested. The
+        patterns that matched no member are appended to unmatched, if
+        given, once the iteration is complete. If accept is given, the
+        members whose name it rejects are not even opened."""
+        patterns = list(patterns)
+        matched = set()
+        for name, size, info in self._infos():
+            found = [pattern for pattern in patterns
+                     if fnmatch.fnmatch(name, pattern)]
+            if not found:
+                continue
+            matched.update(found)
+            if accept is not None and not accept(name):
+                continue
+            member = self._current = self._open(name, size, info)
+            try:
+                yield member
+            finally:
+                member.close()
+                if self._current is member:
+                    self._current = None
+        if unmatched is not None:
+            unmatched.extend(pattern for pattern in patterns
+                             if pattern not in matched)
+
+    def has(self, name: str) -> bool:
+        """Tells whether the archive has a regular file name."""
+        try:
+            self._info(name)
+            return True
+        except KeyError:
+            return False
+
+    def member(self, name: str) -> Member:
+        """Return a member, which is the current one of members if it has
+        that name.
+
+        Raises:
+            KeyError:
+                if the archive has no regular file of that name
+        """
+        if self._current is not None and self._current.name == name:
+            return self._current
+        if self._current is not None:
+            self._current.close()
+        size, info = self._info(name)
+        self._current = self._open(name, size, info)
+        return self._current
+
+    def close(self):
+        if self._current is not None:
+            self._current.close()
+            self._current = None
+        for archive in (self._zip, self._tar):
+            if archive is not None:
+                archive.close()
+        self._zip = self._tar = None
+
+    def _infos(self):
+        """Yield (name, size, info) for the regular files."""
+        if self._zip is not None:
+            for info in self._zip.infolist():
+                if not info.is_dir():
+                    yield info.filename, info.file_size, info
+        else:
+            # iterating a TarFile reads the headers lazily, in order
+            for info in self._tar:
+                if info.isfile():
+                    yield info.name, info.size, info
+
+    def _info(self, name: str):
+        if self._zip is not None:
+            info = self._zip.getinfo(name)
+            if info.is_dir():
+                raise KeyError(name)
+            return info.file_size, info
+        info = self._tar.getmember(name)
+        if not info.isfile():
+            raise KeyError(name)
+        return info.size, info
+
+    def _open(self, name: str, size: int, info) -> Member:
+        if self._zip is not None:
+            return Member(name, size, self._zip.open(info))
+        return Member(name, size, self._tar.extractfile(info))
@@ -0,0 +1,180 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+"""Ordered execution of a batch of renames in one folder.
+
+The renames of a command are computed first (see pyimgren.plan), then run
+in one pass by rename_batch:
+
+* a rename whose target is the current name of another file of the batch
+  waits until that file has been renamed
+* cycles (a -> b, b -> a) are broken by moving one file to a temporary
+  name
+* names are resolved relative to a file descriptor of the folder
+  (``os.rename`` with ``src_dir_fd`` and ``dst_dir_fd``) where the platform
+  supports it
+* a rename that fails does not stop the other ones, but the renames that
+  would overwrite its file are skipped
+* a rename to the target of a previous rename of the batch (a hand edited
+  names.log) fails as if that file already existed
+"""
+
+import errno
+import os
+from typing import (Callable, Collection, List, Optional, Sequence, Tuple)
+
+#: format of the temporary names used to break cycles
+TEMP_FORMAT = "{}.{}.pyimgren.tmp"
+
+
+def order_renames(renames: Sequence[Tuple[str, str]],
+                  existing: Collection[str] = ()
+                  ) -> List[Tuple[str, str, Optional[int]]]:
+    """Compute an order of renames where no target is still in use.
+
+    Parameters:
+        renames : (source, target) pairs of names in one folder
+        existing: normalized names of the files of the folder, to choose
+                  free temporary names
+
+    Returns:
+        list: (source, target, index) triples, where index is the position
+            in renames of the rename completed by that operation, or None
+            for a move to a temporary name
+
+    Raises:
+        ValueError:
+            if two renames have the same source or the same target
+    """
+    norm = os.path.normcase
+    by_src = {}
+    for i, (src, _dst) in enumerate(renames):
+        if by_src.setdefault(norm(src), i) != i:
+            raise ValueError("Duplicate source {}".format(src))
+    # waiting[normalized name] = index of the rename targeting that
+    # name while another file of the batch still holds it
+    waiting = {}
+    targets = set()
+    for i, (_src, dst) in enumerate(renames):
+        if norm(dst) in targets:
+            raise ValueError("Duplicate target {}".format(dst))
+        targets.add(norm(dst))
+        if by_src.get(norm(dst), i) != i:
+            waiting[norm(dst)] = i
+    current = [src for src, _dst in renames]
+    done = [False] * len(renames)
+    order = []
+
+    def run(i):
+        while i is not None:
+            order.append((current[i], renames[i][1], i))
+            done[i] = True
+            i = waiting.pop(norm(renames[i][0]), None)
+
+    for i, (_src, dst) in enumerate(renames):
+        holder = by_src.get(norm(dst), i)
+        if not done[i] and (holder == i or done[holder]):
+            run(i)
+    used = set(existing)
+    for i, (src, _dst) in enumerate(renames):
+        if done[i]:
+            continue
+        # only cycles remain: free the name of src through a temporary one
+        n = 0
+        while True:
+            tmp = TEMP_FORMAT.format(src, n)
+            if norm(tmp) not in used and norm(tmp) not in by_src:
+                break
+            n += 1
+        used.add(norm(tmp))
+        order.append((src, tmp, None))
+        current[i] = tmp
+        run(waiting.pop(norm(src)))
+    return order
+
+
+def rename_batch(folder: str, renames: Sequence[Tuple[str, str]],
+                 existing: Collection[str] = (),
+                 on_done: Optional[Callable[[int], None]] = None
+                 ) -> List[Optional[OSError]]:
+    """Run renames of files of a folder in a conflict free order.
+
+    Parameters:
+        folder  : the folder
+        renames : (source, target) pairs of names in that folder
+        existing: normalized names of the files of the folder. A rename
+                  to one of them which is not renamed by the batch fails
+                  with FileExistsError instead of overwriting it
+        on_done : called with the index of each rename once it is done
+
+    Returns:
+        list: for each rename, None if it was done, else the OSError that
+            prevented it
+    """
+    norm = os.path.normcase
+    results: List[Optional[OSError]] = [None] * len(renames)
+    sources = set(norm(src) for src, _dst in renames)
+    blocked = set()     # names of the batch files still at their place
+    kept, targets = [], set()
+    for i, (src, dst) in enumerate(renames):
+        if norm(dst) in targets:
+            results[i] = OSError(errno.EEXIST, os.strerror(errno.EEXIST), dst)
+            blocked.add(norm(src))
+        else:
+            targets.add(norm(dst))
+            kept.append(i)
+    fd = _open_folder(folder)
+    try:
+        for src, dst, j in order_renames([renames[i] for i in kept],
+                                         existing):
+            i = None if j is None else kept[j]
+            if i is None:
+                try:
+                    _rename(folder, fd, src, dst)
+                except OSError:
+                    blocked.add(norm(src))
+                continue
+            orig = renames[i][0]
+            error = None
+            if norm(dst) in blocked or (norm(dst) in existing
+                                        and norm(dst) not in sources
+                                        and norm(dst) != norm(orig)):
+                error = OSError(errno.EEXIST, os.strerror(errno.EEXIST),
+                                dst)
+            elif src != dst:
+                try:
+                    _rename(folder, fd, src, dst)
+                except OSError as e:
+                    error = e
+            if error is None:
+                if on_done is not None:
+                    on_done(i)
+                continue
+            results[i] = error
+            blocked.add(norm(orig))
+            if src != orig:         # put back a file moved to a temporary
+                try:
+                    _rename(folder, fd, src, orig)
+                except OSError:
+                    pass
+    finally:
+        if fd is not None:
+            os.close(fd)
+    return results
+
+
+def _open_folder(folder: str) -> Optional[int]:
+    """Open a folder for the dir_fd parameters, if supported."""
+    if os.rename not in os.supports_dir_fd or not hasattr(os, "O_DIRECTORY"):
+        return None
+    try:
+        return os.open(folder, os.O_RDONLY | os.O_DIRECTORY)
+    except OSError:
+        return None
+
+
+def _rename(folder: str, fd: Optional[int], src: str, dst: str):
+    if fd is None:
+        os.rename(os.path.join(folder, src), os.path.join(folder, dst))
+    else:
+        os.rename(src, dst, src_dir_fd=fd, dst_dir_fd=fd)
@@ -0,0 +1,130 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+"""Persistent cache of exif timestamps.
+
+The timestamps are stored in a SQLite database, keyed by the identity of a
+file (device and inode, or its path when the file system has no inodes)
+and validated by its stat signature (size and modification time). As the
+identity survives a rename, a folder can be processed again with only one
+stat call per unchanged file.
+"""
+
+import datetime
+import os
+import sqlite3
+import time
+from typing import Union
+
+#: returned by ExifCache.get for an unknown or modified file
+MISSING = object()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS exif (
+    ident TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    date TEXT,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS exif_used ON exif (used);
+"""
+
+
+def connect_readonly(path: str, **kwargs) -> sqlite3.Connection:
+    """Open an existing SQLite database without ever writing it.
+
+    The keyword arguments are passed to sqlite3.connect."""
+    import urllib.request     # slow to import, seldom needed
+    return sqlite3.connect("file:{}?mode=ro".format(
+        urllib.request.pathname2url(os.path.abspath(path))), uri=True,
+        **kwargs)
+
+
+class ExifCache:
+    """A size bounded cache of exif timestamps.
+
+    Parameters:
+        path       : the name of the database file
+        max_entries: number of entries kept when the cache is closed, the
+                     least recently used ones being evicted first
+        readonly   : if True, the database is never written (the file must
+                     exist)
+
+    An ExifCache is a context manager that closes itself on exit.
+    """
+
+    def __init__(self, path: str, max_entries: int = 1_000_000,
+                 readonly: bool = False):
+        self.path, self.max_entries, self.readonly = (path, max_entries,
+                                                      readonly)
+        if readonly:
+            self._db = connect_readonly(path)
+        else:
+            self._db = sqlite3.connect(path)
+            self._db.executescript(_SCHEMA)
+        self._now = time.time()
+        self.hits = self.misses = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_args):
+        self.close()
+
+    def get(self, file: str, st: os.stat_result, raw: bool = False
+            ) -> Union[None, datetime.datetime, str, object]:
+        """Return the cached timestamp of a file.
+
+        Parameters:
+            file: the name of the file
+            st  : the current os.stat of the file
+            raw : if True, the timestamp is returned as an ISO string
+                  instead of a datetime
+
+        Returns:
+            the cached timestamp (None if the file is known to have no
+            timestamp) or MISSING if the file is unknown or has changed
+        """
+        ident = _ident(file, st)
+        row = self._db.execute(
+            "SELECT size, mtime, date FROM exif WHERE ident = ?",
+            (ident,)).fetchone()
+        if row is None or row[:2] != (st.st_size, st.st_mtime_ns):
+            self.misses += 1
+            return MISSING
+        self.hits += 1
+        if not self.readonly:
+            self._db.execute("UPDATE exif SET used = ?, path = ? "
+                             "WHERE ident = ?", (self._now, file, ident))
+        if row[2] is None or raw:
+            return row[2]
+        return datetime.datetime.fromisoformat(row[2])
+
+    def put(self, file: str, st: os.stat_result,
+            date: Union[None, datetime.datetime, str]):
+        """Store the timestamp (or its absence) of a file, as a datetime or
+        an ISO string."""
+        if self.readonly:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO exif VALUES (?, ?, ?, ?, ?, ?)",
+            (_ident(file, st), st.st_size, st.st_mtime_ns, file,
+             date.isoformat() if isinstance(date, datetime.datetime)
+             else date, self._now))
+
+    def close(self):
+        """Evict the least recently used entries, commit and close."""
+        if not self.readonly:
+            self._db.execute(
+                "DELETE FROM exif WHERE ident IN (SELECT ident FROM exif "
+                "ORDER BY used DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+            self._db.commit()
+        self._db.close()
+
+
+def _ident(file: str, st: os.stat_result) -> str:
+    if st.st_ino:
+        return "{}:{}".format(st.st_dev, st.st_ino)
+    return os.path.normcase(os.path.abspath(file))
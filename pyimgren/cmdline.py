@@ -3,26 +3,27 @@
 #  SPDX-License-Identifier: MIT
 
 import argparse
-import gettext
+import io
 import locale
-import logging
-import os.path
+import sys
 
 import i18nparse
 
-from . import __version__, Renamer, __name__ as prog
-from . import nls_init as ext_init
+from . import __version__, __name__ as prog
+from .fastcopy import COPY_MODES
+from .i18n import Translator, nls_init as ext_init
 
-_ = lambda x: x
+_ = Translator("cmdline")
+
+# imported by simple_cmd once the command line is parsed, so that --version
+# and --help do not load the exif and file machinery
+Renamer = None
 
 
 def nls_init():
-    global _
     lang = ext_init()
     if lang:
-        localedir = os.path.join(os.path.dirname(__file__), "locale")
-        tr = gettext.translation("cmdline", localedir, [lang], fallback=True)
-        _ = tr.gettext
+        _.activate([lang])
 
 
 def set_parser():
@@ -40,29 +41,115 @@ def set_parser():
                         help = _("extension for the new file name"))
     parser.add_argument("-r", "--ref_file", default="names.log",
                         help = _("a file to remember the old names"))
+    parser.add_argument("--journal", action="store_true",
+                        help = _("append changes to a journal instead of "
+                                 "rewriting the ref_file"))
+    parser.add_argument("-R", "--recursive", action="store_true",
+                        help = _("also process all the sub-folders"))
     parser.add_argument("-x", "--delta", default=0., type=float,
                         help = _("number of minutes to add to exif time"))
     parser.add_argument("-D", "--debug", action="store_true",
                         help = _("print a line per rename"))
     parser.add_argument("-X", "--dry_run", action="store_true", dest="dummy",
                         help = _("process normally except no rename occurs"))
+    parser.add_argument("--progress", action="store_true",
+                        help = _("display a progress line and final "
+                                 "statistics"))
+    parser.add_argument("--profile", metavar="REPORT", dest="profile_file",
+                        help = _("write the timings of each phase to REPORT "
+                                 "(JSON for a .json extension, - for the "
+                                 "standard error)"))
+    parser.add_argument("--pstats", metavar="PSTATS_FILE",
+                        help = _("dump a cProfile profile of the command "
+                                 "to PSTATS_FILE"))
+
+    # options common to the commands reading exif dates (rename, merge)
+    exif = argparse.ArgumentParser(add_help=False)
+    exif.add_argument("-j", "--jobs", default=1, type=int, dest="workers",
+                      help=_("number of workers reading exif dates"))
+    exif.add_argument("--pool", default="thread",
+                      choices=("thread", "process", "shard"),
+                      help=_("kind of workers reading exif dates (shard: "
+                             "processes also naming the files)"))
+    exif.add_argument("--cache", default="names.cache", dest="cache_file",
+                      help=_("a file caching the exif dates"))
+    exif.add_argument("--no-cache", action="store_const", const=None,
+                      dest="cache_file", help=_("do not cache exif dates"))
+    exif.add_argument("--rebuild-cache", action="store_true",
+                      help=_("ignore the previously cached exif dates"))
+    exif.add_argument("--include", metavar="EXT", action="append",
+                      help=_("only process the files with that extension "
+                             "(can be repeated)"))
+    exif.add_argument("--exclude", metavar="EXT", action="append",
+                      help=_("skip the files with that extension (can be "
+                             "repeated)"))
+
+    # option common to the commands that can be planned (rename, back, merge)
+    planned = argparse.ArgumentParser(add_help=False)
+    planned.add_argument("--plan", metavar="PLAN_FILE",
+                         help=_("save the plan of the command as JSON "
+                                "instead of executing it"))
 
     # subcommands configuration (rename, back, merge)
     subparser = parser.add_subparsers(dest='subcommand', help=_("sub-commands"))
-    ren = subparser.add_parser("rename", help=
+    ren = subparser.add_parser("rename", parents=[exif, planned], help=
                                _("rename files by using their exif timestamp"))
     ren.add_argument("files", nargs="+",
                       help = _("files to process"))
-    back = subparser.add_parser("back",
+    back = subparser.add_parser("back", parents=[planned],
                             help=_("rename files back to their original name"))
     back.add_argument("files", nargs="*",
                     help = _("files to process (default: content of ref_file)"))
-    merge = subparser.add_parser("merge",
+    back.add_argument("--since", metavar="DATE", type=_date,
+                      help=_("only files named with a date after DATE "
+                             "(YYYY[-MM[-DD[THH[:MM[:SS]]]]])"))
+    back.add_argument("--until", metavar="DATE", type=_date,
+                      help=_("only files named with a date before DATE, "
+                             "included"))
+    merge = subparser.add_parser("merge", parents=[exif, planned],
                                  help=_("merge files from a different folder"))
     merge.add_argument("files", nargs="+",
                       help = _("files to process"))
     merge.add_argument("-s", "--src_folder", default=".",
-                       help = _("source folder for merging from"))
+                       help = _("source folder (or zip or tar archive) for "
+                                "merging from"))
+    merge.add_argument("--copy-mode", default="copy", choices=COPY_MODES,
+                       help = _("how files are copied"))
+    merge.add_argument("--dedupe", action="store_true",
+                       help = _("skip the files already present in the "
+                                "folder (same content)"))
+    convert = subparser.add_parser("convert",
+                                   help=_("copy the ref_file into a new one"))
+    convert.add_argument("files", nargs=1, metavar="NEW_REF_FILE",
+                         help=_("the new ref_file (SQLite format for a .db, "
+                                ".sqlite or .sqlite3 extension)"))
+    watch = subparser.add_parser("watch", parents=[exif],
+                                 help=_("rename new files as they arrive"))
+    watch.add_argument("files", nargs="+",
+                       help=_("patterns of the files to process"))
+    watch.add_argument("-w", "--watch", action="append", default=[],
+                       dest="folders", metavar="FOLDER",
+                       help=_("another folder to watch with the same "
+                              "options"))
+    watch.add_argument("--settle", default=2.0, type=float,
+                       help=_("seconds a file must remain unchanged before "
+                              "being renamed"))
+    watch.add_argument("--interval", default=1.0, type=float,
+                       help=_("seconds between two scans when polling"))
+    watch.add_argument("--poll", action="store_true",
+                       help=_("poll the folders instead of using inotify"))
+    watch.add_argument("--new-only", action="store_true",
+                       help=_("ignore the files present at start"))
+    batch = subparser.add_parser("batch", parents=[exif],
+                                 help=_("run the jobs of a manifest"))
+    batch.add_argument("files", nargs=1, metavar="MANIFEST",
+                       help=_("a JSON or TOML (.toml) file listing the jobs"))
+    batch.add_argument("-o", "--output", metavar="REPORT",
+                       help=_("write the report as JSON to REPORT"))
+    apply = subparser.add_parser("apply",
+                                 help=_("execute a plan saved by --plan"))
+    apply.add_argument("files", nargs=1, metavar="PLAN_FILE",
+                       help=_("the plan to execute"))
     # parser.set_defaults(subcommand="rename") # uncomment to have a default
     return parser
 
@@ -73,15 +160,142 @@ def simple_cmd():
     nls_init()
     parser = set_parser()
     params = parser.parse_args()
-    files = params.files
-    command = params.subcommand
     kwargs = vars(params)
+    if kwargs.get('plan') and params.recursive:
+        parser.error(_("--plan cannot be used with --recursive"))
+    global Renamer
+    if Renamer is None:
+        from . import Renamer
     if params.debug:
+        import logging
         log = logging.getLogger("pyimgren")
         log.setLevel(logging.DEBUG)
         log.addHandler(logging.StreamHandler())
     renamer = Renamer(**{k: v for k,v in kwargs.items()
-                         if k in ('folder', 'dst_mask', 'ext')})
-    getattr(renamer, command)(*files, **{k: v for k,v in kwargs.items()
-                                         if k in ('delta', 'debug',
-                                                  'dummy', 'src_folder')})
+                         if k in ('folder', 'dst_mask', 'ext_mask',
+                                  'ref_file', 'cache_file', 'journal',
+                                  'include', 'exclude')})
+    if kwargs.get('rebuild_cache'):
+        renamer.clear_cache()
+    if params.progress:
+        from .progress import ProgressLine
+        renamer.progress = ProgressLine()
+    profiler = None
+    if params.pstats:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        run_cmd(renamer, params)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(params.pstats)
+    if params.progress:
+        renamer.progress.close(renamer.stats)
+        sys.stderr.write(str(renamer.stats) + "\n")
+    if params.profile_file:
+        write_report(renamer.stats, params.profile_file)
+
+
+def _date(value: str) -> str:
+    """Check a date given as a prefix of an ISO date."""
+    from .stamps import bound
+    try:
+        return bound(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+def run_cmd(renamer, params):
+    """Run the subcommand of the parsed params with a Renamer."""
+    files = params.files
+    command = params.subcommand
+    kwargs = dict(vars(params), profile=params.profile_file is not None)
+    if command == 'apply':
+        from .plan import Plan
+        with io.open(files[0], encoding="utf-8") as fd:
+            plan = Plan.from_json(fd.read())
+        renamer.apply(plan, debug=params.debug, dummy=params.dummy,
+                      profile=kwargs['profile'])
+        return
+    if command == 'watch':
+        watch_cmd(renamer, params)
+        return
+    if command == 'batch':
+        batch_cmd(renamer, params)
+        return
+    if command == 'convert':
+        args = ('debug', 'dummy')
+    else:
+        args = ('delta', 'debug', 'dummy', 'src_folder', 'workers', 'pool',
+                'recursive', 'copy_mode', 'profile', 'since', 'until',
+                'dedupe')
+    plan_file = kwargs.get('plan')
+    kwargs = {k: v for k,v in kwargs.items() if k in args}
+    if plan_file:
+        plan = renamer.plan(command, *files, **kwargs)
+        with io.open(plan_file, "w", encoding="utf-8") as fd:
+            fd.write(plan.to_json())
+        return
+    getattr(renamer, command)(*files, **kwargs)
+
+
+def watch_cmd(renamer, params):
+    """Watch the folder of renamer, and the other ones of params, until
+    interrupted."""
+    from .watch import Watcher
+    renamers = [renamer]
+    for folder in params.folders:
+        ren = Renamer(folder, renamer.dst_mask, renamer.ext_mask,
+                      renamer.ref_file, renamer.cache_file, renamer.journal,
+                      renamer.include, renamer.exclude)
+        ren.progress = renamer.progress
+        renamers.append(ren)
+    watcher = Watcher(renamers, params.files, settle=params.settle,
+                      interval=params.interval, poll=params.poll,
+                      existing=not params.new_only, delta=params.delta,
+                      debug=params.debug, dummy=params.dummy,
+                      workers=params.workers, pool=params.pool)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+
+def batch_cmd(renamer, params):
+    """Run the jobs of a manifest, the command line options giving the
+    default values of their parameters. Exits with status 1 if a job
+    failed."""
+    from .manifest import load_manifest, run_jobs
+    defaults = {k: v for k, v in vars(params).items()
+                if k in ('dst_mask', 'ext_mask', 'ref_file', 'cache_file',
+                         'journal', 'include', 'exclude', 'delta', 'dummy',
+                         'recursive')}
+    jobs = load_manifest(params.files[0], defaults)
+    report = run_jobs(jobs, params.workers, params.pool)
+    renamer.stats = report.stats
+    print(report)
+    if params.output:
+        import json
+        with io.open(params.output, "w", encoding="utf-8") as fd:
+            json.dump(report.to_dict(), fd, indent=1)
+    if report.failed:
+        sys.exit(1)
+
+
+def write_report(stats, path):
+    """Write the timings of a command as text, or as JSON for a .json
+    path. A path of - is the standard error."""
+    if path.endswith(".json"):
+        import json
+        text = json.dumps(stats.to_dict(), indent=1)
+    else:
+        text = stats.report()
+    if path == "-":
+        sys.stderr.write(text + "\n")
+    else:
+        with io.open(path, "w", encoding="utf-8") as fd:
+            fd.write(text + "\n")
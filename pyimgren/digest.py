@@ -0,0 +1,206 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+"""Detection of the files already present in a folder, by content.
+
+A merge with dedupe skips the source files that are byte-identical to a
+file of the target folder, so that importing the same memory card twice
+does not create ...a.jpg copies. Reading every file would be as costly as
+copying it, so the comparison goes through three levels:
+
+* sizes: the target folder is scanned once; a source file whose size
+  matches no target file is never read
+* partial digest: a hash of the size, the first and the last block of a
+  file, which is the whole content for small files
+* full digest: only computed when the partial digests are equal
+
+The digests of the target files are kept in a SQLite database (by default
+names.digest in the folder), validated by the size and modification time
+of each file, so that they are computed once.
+"""
+
+import hashlib
+import os
+import sqlite3
+from typing import Dict, List, Optional
+
+from .cache import connect_readonly
+
+#: default name of the digest database of a folder
+DIGEST_FILE = "names.digest"
+
+#: size of the blocks hashed by the partial digest
+BLOCK = 64 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS digests (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    partial TEXT NOT NULL,
+    full TEXT
+);
+"""
+
+
+def partial_digest(path: str, size: int) -> str:
+    """Hash the size and the first and last BLOCK bytes of a file."""
+    digest = hashlib.blake2b(size.to_bytes(8, "little"), digest_size=16)
+    with open(path, "rb") as fd:
+        digest.update(fd.read(BLOCK))
+        if size > 2 * BLOCK:
+            fd.seek(-BLOCK, os.SEEK_END)
+            digest.update(fd.read(BLOCK))
+        elif size > BLOCK:
+            digest.update(fd.read())
+    return digest.hexdigest()
+
+
+def full_digest(path: str) -> str:
+    """Hash the whole content of a file."""
+    digest = hashlib.blake2b(digest_size=32)
+    with open(path, "rb") as fd:
+        for block in iter(lambda: fd.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class _Entry:
+    """A file and its digests, computed when needed."""
+    __slots__ = ("name", "path", "st", "key", "partial", "full")
+
+    def __init__(self, name: str, path: str, st: os.stat_result,
+                 key: Optional[str]):
+        self.name, self.path, self.st, self.key = name, path, st, key
+        self.partial = self.full = None
+
+
+class DigestIndex:
+    """Find the files of a folder having the same content as a file.
+
+    Parameters:
+        folder  : the folder
+        path    : the digest database
+        readonly: if True, the database is never written nor created
+
+    Used in a with statement, a DigestIndex is closed (and its database
+    committed) at the end of the block.
+
+    Attributes:
+        reads: number of digests computed (each one reads a file)
+    """
+
+    def __init__(self, folder: str, path: str, readonly: bool = False):
+        self.folder, self.path, self.readonly = folder, path, readonly
+        self._db = None
+        # an AsyncRenamer uses the index from the threads of its loop
+        if not readonly:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.executescript(_SCHEMA)
+        elif os.path.exists(path):
+            self._db = connect_readonly(path, check_same_thread=False)
+        self._sizes: Optional[Dict[int, List[_Entry]]] = None
+        self._sources: Dict[str, _Entry] = {}
+        self.reads = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_args):
+        self.close()
+
+    def find(self, path: str) -> Optional[str]:
+        """Return the name of a file of the folder (or the path of a file
+        given to add) having the same content as path, or None."""
+        source = self._source(path)
+        candidates = self._by_size().get(source.st.st_size)
+        if not candidates:
+            return None
+        for entry in candidates:
+            if entry is source or self._partial(entry) != self._partial(
+                    source):
+                continue
+            if (source.st.st_size <= 2 * BLOCK      # all the content hashed
+                    or self._full(entry) == self._full(source)):
+                return entry.name
+        return None
+
+    def add(self, path: str):
+        """Remember a file that is going to be copied into the folder, so
+        that the next identical files are found."""
+        source = self._source(path)
+        self._by_size().setdefault(source.st.st_size, []).append(source)
+
+    def close(self):
+        """Forget the digests of the files no longer in the folder, commit
+        and close."""
+        if self._db is None:
+            return
+        if not self.readonly and self._sizes is not None:
+            present = set(entry.key for entries in self._sizes.values()
+                          for entry in entries)
+            self._db.executemany(
+                "DELETE FROM digests WHERE name = ?",
+                [row for row in self._db.execute("SELECT name FROM digests")
+                 if row[0] not in present])
+            self._db.commit()
+        self._db.close()
+        self._db = None
+
+    def _by_size(self) -> Dict[int, List[_Entry]]:
+        """Return the files of the folder by size, scanned once."""
+        if self._sizes is None:
+            self._sizes = {}
+            try:
+                with os.scandir(self.folder) as entries:
+                    for entry in entries:
+                        if entry.is_file():
+                            st = entry.stat()
+                            self._sizes.setdefault(st.st_size, []).append(
+                                _Entry(entry.name, entry.path, st,
+                                       os.path.normcase(entry.name)))
+            except FileNotFoundError:
+                pass
+        return self._sizes
+
+    def _source(self, path: str) -> _Entry:
+        source = self._sources.get(path)
+        if source is None:
+            source = self._sources[path] = _Entry(path, path, os.stat(path),
+                                                  None)
+        return source
+
+    def _partial(self, entry: _Entry) -> str:
+        if entry.partial is None:
+            self._load(entry)
+        if entry.partial is None:
+            self.reads += 1
+            entry.partial = partial_digest(entry.path, entry.st.st_size)
+            self._store(entry)
+        return entry.partial
+
+    def _full(self, entry: _Entry) -> str:
+        if entry.full is None:
+            self.reads += 1
+            entry.full = full_digest(entry.path)
+            self._store(entry)
+        return entry.full
+
+    def _load(self, entry: _Entry):
+        """Read the digests of an unchanged file of the folder."""
+        if entry.key is None or self._db is None:
+            return
+        row = self._db.execute(
+            "SELECT size, mtime, partial, full FROM digests WHERE name = ?",
+            (entry.key,)).fetchone()
+        if row is not None and row[:2] == (entry.st.st_size,
+                                           entry.st.st_mtime_ns):
+            entry.partial, entry.full = row[2:]
+
+    def _store(self, entry: _Entry):
+        if entry.key is None or self._db is None or self.readonly:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?)",
+            (entry.key, entry.st.st_size, entry.st.st_mtime_ns,
+             entry.partial, entry.full))
@@ -0,0 +1,249 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+"""Lightweight extraction of exif timestamps.
+
+piexif reads a whole image file and decodes every IFD only to let us pick
+one of three tags. This module walks the JPEG markers up to the APP1 (exif)
+segment and then only follows the TIFF IFD0 and Exif IFD, so that only a
+small prefix of the file is ever read.
+
+file_timestamp also accepts TIFF based RAW files (CR2, NEF, ARW, DNG...)
+whose IFDs may lay anywhere in the file, for example after the image data.
+Those files are mapped in memory and the IFD offsets are followed on
+memoryview slices, so that only the pages holding the headers are read
+from disk and nothing is copied.
+
+Before any parsing, sniff tells from the first SNIFF_SIZE bytes of a file
+whether it can hold exif data at all, so that videos, sidecars and other
+files are rejected after a single small read instead of being loaded by
+piexif.
+"""
+
+import io
+import mmap
+import struct
+from typing import BinaryIO, Optional
+
+# tags searched in that order
+DATE_TIME_ORIGINAL = 0x9003     # Exif IFD
+DATE_TIME_DIGITIZED = 0x9004    # Exif IFD
+DATE_TIME = 0x132               # IFD0
+EXIF_IFD_POINTER = 0x8769       # IFD0
+
+_SOI = b"\xff\xd8"
+_APP1 = 0xe1
+_SOS = 0xda
+_EOI = 0xd9
+_EXIF_HEADER = b"Exif\x00\x00"
+_TIFF_HEADERS = (b"II*\x00", b"MM\x00*")
+_ASCII = 2
+_LONG = 4
+
+#: number of bytes examined by sniff
+SNIFF_SIZE = 16
+
+
+class UndecidedError(Exception):
+    """Raised when the fast path cannot decide whether a file contains a
+    timestamp. Callers are expected to fall back to a full parser."""
+
+
+def sniff(head: bytes) -> Optional[str]:
+    """Identify a file that can hold exif data from its first bytes.
+
+    Parameters:
+        head: the first SNIFF_SIZE bytes of the file (or less for a small
+              file)
+
+    Returns:
+        str:
+            "jpeg", "tiff" (including the TIFF based RAW files) or "webp",
+            the formats known to piexif, or None for any other file
+    """
+    if head[:2] == _SOI:
+        return "jpeg"
+    if head[:4] in _TIFF_HEADERS:
+        return "tiff"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def read_timestamp(fd: BinaryIO) -> Optional[bytes]:
+    """Find the raw exif timestamp of a JPEG file.
+
+    Parameters:
+        fd: a binary file object positioned at the start of the file. Only
+            the JPEG segment headers and the APP1 exif segment are read.
+
+    Returns:
+        bytes:
+            the raw value (``b"YYYY:MM:DD HH:MM:SS"``) of the first of
+            DateTimeOriginal, DateTimeDigitized or DateTime found, or None
+            if the picture has no such tag.
+
+    Raises:
+        UndecidedError:
+            if the file is not a JPEG file or its headers could not be
+            decoded
+    """
+    if fd.read(2) != _SOI:
+        raise UndecidedError("not a JPEG file")
+    while True:
+        head = fd.read(4)
+        if len(head) < 4 or head[0] != 0xff:
+            raise UndecidedError("corrupted JPEG header")
+        marker = head[1]
+        if marker in (_SOS, _EOI):   # end of metadata: no exif segment
+            return None
+        length = struct.unpack(">H", head[2:])[0] - 2
+        if length < 0:
+            raise UndecidedError("corrupted JPEG header")
+        if marker == _APP1:
+            segment = fd.read(length)
+            if segment[:6] == _EXIF_HEADER:
+                return tiff_timestamp(segment[6:])
+        else:
+            fd.seek(length, io.SEEK_CUR)
+
+
+def file_timestamp(fd: BinaryIO) -> Optional[bytes]:
+    """Find the raw exif timestamp of a JPEG or TIFF based file.
+
+    JPEG files are passed to read_timestamp, which only reads their first
+    segments. TIFF files are mapped in memory, and only their headers are
+    accessed. TIFF files that cannot be mapped (pipes, in memory streams)
+    cannot be decided.
+
+    Parameters:
+        fd: a seekable binary file object positioned at the start of the
+            file
+
+    Returns:
+        bytes: the raw timestamp or None if no date tag is present
+
+    Raises:
+        UndecidedError:
+            if the file is neither a JPEG nor a TIFF file or its headers
+            could not be decoded
+    """
+    header = fd.read(4)
+    fd.seek(0)
+    if header not in _TIFF_HEADERS:
+        return read_timestamp(fd)
+    try:
+        mapped = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        raise UndecidedError("cannot map the file") from e
+    try:
+        with memoryview(mapped) as view:
+            try:
+                return buffer_timestamp(view)
+            except UndecidedError as e:
+                # the traceback holds slices of the map: drop it before
+                # closing the map
+                args = e.args
+        raise UndecidedError(*args)
+    finally:
+        mapped.close()
+
+
+def buffer_timestamp(data) -> Optional[bytes]:
+    """Find the raw exif timestamp of a JPEG or TIFF file in a buffer.
+
+    Parameters:
+        data: the content of the file, preferably as a memoryview so that
+              no part of it is copied
+
+    Returns:
+        bytes: the raw timestamp or None if no date tag is present
+
+    Raises:
+        UndecidedError:
+            if the data is neither a JPEG nor a TIFF file or its headers
+            could not be decoded
+    """
+    if data[:4] in _TIFF_HEADERS:
+        return tiff_timestamp(data)
+    if data[:2] != _SOI:
+        raise UndecidedError("neither a JPEG nor a TIFF file")
+    pos = 2
+    while True:
+        try:
+            mark, marker, length = struct.unpack_from(">BBH", data, pos)
+        except struct.error as e:
+            raise UndecidedError("corrupted JPEG header") from e
+        if mark != 0xff:
+            raise UndecidedError("corrupted JPEG header")
+        if marker in (_SOS, _EOI):   # end of metadata: no exif segment
+            return None
+        if length < 2:
+            raise UndecidedError("corrupted JPEG header")
+        if marker == _APP1 and data[pos + 4: pos + 10] == _EXIF_HEADER:
+            return tiff_timestamp(data[pos + 10: pos + 2 + length])
+        pos += 2 + length
+
+
+def tiff_timestamp(tiff: bytes) -> Optional[bytes]:
+    """Find the raw exif timestamp in a TIFF structure.
+
+    Parameters:
+        tiff: the TIFF data, starting with its byte order mark, as bytes
+              or as a memoryview
+
+    Returns:
+        bytes: the raw timestamp or None if no date tag is present
+
+    Raises:
+        UndecidedError: if the TIFF structure is corrupted
+    """
+    if tiff[:2] == b"II":
+        endian = "<"
+    elif tiff[:2] == b"MM":
+        endian = ">"
+    else:
+        raise UndecidedError("invalid TIFF byte order")
+    try:
+        offset = struct.unpack_from(endian + "L", tiff, 4)[0]
+        ifd0 = _read_ifd(tiff, offset, endian, (EXIF_IFD_POINTER, DATE_TIME))
+        exif = {}
+        if EXIF_IFD_POINTER in ifd0:
+            typ, _count, pos = ifd0[EXIF_IFD_POINTER]
+            if typ != _LONG:
+                raise UndecidedError("invalid Exif IFD pointer")
+            offset = struct.unpack_from(endian + "L", tiff, pos)[0]
+            exif = _read_ifd(tiff, offset, endian,
+                             (DATE_TIME_ORIGINAL, DATE_TIME_DIGITIZED))
+        for ifd, tag in ((exif, DATE_TIME_ORIGINAL),
+                         (exif, DATE_TIME_DIGITIZED),
+                         (ifd0, DATE_TIME)):
+            if tag in ifd:
+                return _ascii(tiff, endian, *ifd[tag])
+    except struct.error as e:
+        raise UndecidedError("truncated TIFF data") from e
+    return None
+
+
+def _read_ifd(tiff: bytes, offset: int, endian: str,
+              tags: tuple) -> dict:
+    """Return {tag: (type, count, value_position)} for the wanted tags"""
+    entries = {}
+    count = struct.unpack_from(endian + "H", tiff, offset)[0]
+    for pos in range(offset + 2, offset + 2 + 12 * count, 12):
+        tag, typ, cnt = struct.unpack_from(endian + "HHL", tiff, pos)
+        if tag in tags:
+            entries[tag] = (typ, cnt, pos + 8)
+    return entries
+
+
+def _ascii(tiff: bytes, endian: str, typ: int, count: int,
+           pos: int) -> bytes:
+    """Decode an ASCII tag value, stopping at its terminating null"""
+    if typ != _ASCII:
+        raise UndecidedError("date tag is not ASCII")
+    if count > 4:
+        pos = struct.unpack_from(endian + "L", tiff, pos)[0]
+    if pos + count > len(tiff):
+        raise UndecidedError("truncated TIFF data")
+    return bytes(tiff[pos: pos + count]).split(b"\x00")[0]
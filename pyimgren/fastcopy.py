@@ -0,0 +1,120 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+"""File copy strategies used by merge.
+
+Merging into an archive on the same volume does not need to stream every
+byte through user space:
+
+* ``reflink`` clones the file extents (FICLONE ioctl, Linux btrfs, XFS...):
+  the copy is instantaneous and shares no data once modified
+* ``hardlink`` creates a new link to the same inode
+* ``auto`` tries a reflink, then a kernel side copy (``os.copy_file_range``
+  or ``os.sendfile``) and finally a plain copy
+* ``copy`` is the historical ``shutil.copy``
+
+Only the ``copy`` mode copies the permission bits of the source file.
+"""
+
+import errno
+import os
+import shutil
+
+COPY_MODES = ("copy", "reflink", "hardlink", "auto")
+
+# from linux/fs.h: _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+
+def copy_file(src: str, dst: str, mode: str = "copy") -> str:
+    """Copy a file according to a copy mode.
+
+    Parameters:
+        src : the name of the file to copy
+        dst : the name of the copy (must not exist)
+        mode: one of COPY_MODES
+
+    Returns:
+        str: the method actually used: "copy", "reflink", "hardlink" or
+            "kernel"
+
+    Raises:
+        OSError:
+            if the file could not be copied, or if the reflink or hardlink
+            mode is not supported for those files
+        ValueError:
+            for an unknown mode
+    """
+    if mode == "copy":
+        shutil.copy(src, dst)
+        return "copy"
+    if mode == "hardlink":
+        os.link(src, dst)
+        return "hardlink"
+    if mode == "reflink":
+        reflink(src, dst)
+        return "reflink"
+    if mode != "auto":
+        raise ValueError(mode)
+    try:
+        reflink(src, dst)
+        return "reflink"
+    except FileExistsError:
+        raise               # the plain copy would overwrite it
+    except OSError:
+        pass
+    try:
+        kernel_copy(src, dst)
+        return "kernel"
+    except FileExistsError:
+        raise
+    except OSError:
+        shutil.copyfile(src, dst)
+        return "copy"
+
+
+def reflink(src: str, dst: str):
+    """Clone src into a new dst file with the FICLONE ioctl."""
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError(errno.ENOTSUP, "reflink not supported", src) from None
+    with open(src, "rb") as fin:
+        with open(dst, "xb") as fout:
+            try:
+                fcntl.ioctl(fout.fileno(), FICLONE, fin.fileno())
+                return
+            except OSError:
+                pass
+        os.remove(dst)
+    raise OSError(errno.ENOTSUP, "reflink not supported", src)
+
+
+def kernel_copy(src: str, dst: str):
+    """Copy src into a new dst file without user space buffers."""
+    copy = getattr(os, "copy_file_range", None)
+    if copy is None:
+        copy = getattr(os, "sendfile", None)
+        if copy is None:
+            raise OSError(errno.ENOTSUP, "kernel copy not supported", src)
+    with open(src, "rb") as fin:
+        size = os.fstat(fin.fileno()).st_size
+        with open(dst, "xb") as fout:
+            try:
+                offset = 0
+                while offset < size:
+                    if copy is os.sendfile:
+                        sent = copy(fout.fileno(), fin.fileno(), offset,
+                                    size - offset)
+                    else:
+                        sent = copy(fin.fileno(), fout.fileno(),
+                                    size - offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+                if offset == size:
+                    return
+            except OSError:
+                pass
+        os.remove(dst)      # nothing or only a part of src was copied
+    raise OSError(errno.ENOTSUP, "kernel copy not supported", src)
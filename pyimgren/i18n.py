@@ -0,0 +1,82 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+"""Deferred translations of the messages of the package.
+
+The message catalogs are only looked up the first time a message is
+translated, so that a command that prints nothing (or only its version)
+does not pay for the gettext lookups. This module only depends on the
+standard library and is cheap to import.
+"""
+
+import gettext
+import locale
+import os.path
+from typing import Optional
+
+#: folder of the message catalogs
+LOCALEDIR = os.path.join(os.path.dirname(__file__), "locale")
+
+
+class Translator:
+    """A gettext function for a domain, loading its catalog lazily.
+
+    Parameters:
+        domain: the gettext domain (name of the .mo files)
+
+    Until activate is called, messages are returned unchanged.
+    """
+
+    def __init__(self, domain: str):
+        self.domain = domain
+        self._active = False
+        self._languages = None
+        self._gettext = None
+
+    def activate(self, languages=None):
+        """Translate the next messages for languages (as accepted by
+        gettext.translation), the catalog being loaded on first use."""
+        self._active, self._languages, self._gettext = True, languages, None
+
+    def deactivate(self):
+        """Return the next messages unchanged."""
+        self._active, self._gettext = False, None
+
+    def __call__(self, message: str) -> str:
+        if not self._active:
+            return message
+        if self._gettext is None:
+            self._gettext = gettext.translation(
+                self.domain, LOCALEDIR, self._languages,
+                fallback=True).gettext
+        return self._gettext(message)
+
+
+#: translator of the messages of the Renamer
+_ = Translator("pyimgren")
+
+
+def nls_init(reset: bool=False) -> str:
+    """ Initialize the package for i18n
+
+    Parameters:
+        reset: Indicates whether i18n should be setup (if True)
+               or removed (if False)
+
+    Returns: the name of the locale currently used by the package
+    """
+    if reset:
+        _.deactivate()
+        return None
+    loc: Optional[str]
+    if "LANG" in os.environ:
+        loc = os.environ["LANG"]
+    else:
+        loc = locale.getlocale()[0]
+        if loc is None:
+            try:
+                loc = locale.setlocale(locale.LC_ALL, '')[0]
+            except locale.Error:
+                loc = None
+    _.activate(loc)
+    return loc
@@ -0,0 +1,280 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+"""Run commands on many folders in one process, from a manifest.
+
+A manifest is a JSON or TOML file listing jobs. Each job gives a folder,
+a command and its parameters, and optionally the parameters of the
+Renamer of that folder. The values of the optional defaults table apply
+to all the jobs::
+
+    {"defaults": {"dst_mask": "%Y%m%d_%H%M%S", "delta": 0},
+     "jobs": [
+        {"folder": "2024-05-01", "command": "rename", "files": ["*.JPG"]},
+        {"folder": "2024-05-02", "command": "rename", "files": ["*.JPG"],
+         "ref_file": "names.db", "delta": -60},
+        {"folder": "album", "command": "merge", "files": ["*.jpg"],
+         "src_folder": "2024-05-01", "copy_mode": "hardlink"}]}
+
+or in TOML::
+
+    [defaults]
+    dst_mask = "%Y%m%d_%H%M%S"
+
+    [[jobs]]
+    folder = "2024-05-01"
+    command = "rename"
+    files = ["*.JPG"]
+
+Relative folders are relative to the folder of the manifest. The jobs run
+on a pool of workers, each one with its own Renamer. The jobs working on
+the same ref_file run one after the other in the order of the manifest,
+so that a ref_file is never used by two workers at the same time. An
+error in a job is reported and does not stop the other ones.
+"""
+
+import io
+import json
+import os.path
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from .fastcopy import COPY_MODES
+from .i18n import _
+from .progress import COPIED, ERROR, RENAMED, Stats
+
+#: parameters of the Renamer of a job
+RENAMER_KEYS = ("dst_mask", "ext_mask", "ref_file", "cache_file", "journal",
+                "include", "exclude")
+
+#: parameters of each command
+COMMAND_KEYS = {
+    "rename": ("files", "delta", "dummy", "recursive"),
+    "back": ("files", "delta", "dummy", "recursive", "since", "until"),
+    "merge": ("files", "src_folder", "delta", "dummy", "recursive",
+              "copy_mode", "dedupe"),
+}
+
+
+class Job(NamedTuple):
+    """One job of a manifest.
+
+    Attributes:
+        folder : the folder of the Renamer
+        command: "rename", "back" or "merge"
+        files  : the files or patterns of the command
+        renamer: the parameters of the Renamer (see RENAMER_KEYS)
+        kwargs : the other parameters of the command
+    """
+    folder: str
+    command: str
+    files: List[str]
+    renamer: Dict
+    kwargs: Dict
+
+
+class JobResult(NamedTuple):
+    """The result of a Job.
+
+    Attributes:
+        index: the position of the job in the manifest
+        job  : the job
+        error: None if the job succeeded, else the error message
+        stats: the Stats of the command
+    """
+    index: int
+    job: Job
+    error: Optional[str]
+    stats: Stats
+
+
+class Report:
+    """The results of the jobs of a manifest, in the manifest order.
+
+    Attributes:
+        results: the JobResult of each job
+        stats  : the sum of the Stats of the jobs
+    """
+
+    def __init__(self, results: Iterable[JobResult]):
+        self.results = sorted(results, key=lambda result: result.index)
+        self.stats = Stats()
+        for result in self.results:
+            self.stats.merge(result.stats)
+        self.stats.stop()
+
+    @property
+    def failed(self) -> List[JobResult]:
+        return [result for result in self.results if result.error is not None]
+
+    def to_dict(self) -> dict:
+        return {"jobs": [{"folder": result.job.folder,
+                          "command": result.job.command,
+                          "error": result.error,
+                          "counts": dict(result.stats.counts),
+                          "elapsed": result.stats.elapsed}
+                         for result in self.results],
+                "failed": len(self.failed),
+                "stats": self.stats.to_dict()}
+
+    def __str__(self) -> str:
+        lines = []
+        for result in self.results:
+            counts = result.stats.counts
+            lines.append("{} {} {}: {}".format(
+                result.job.command, result.job.folder,
+                " ".join(result.job.files),
+                result.error if result.error is not None else
+                "{} renamed, {} copied, {} errors".format(
+                    counts[RENAMED], counts[COPIED], counts[ERROR])))
+        lines.append("{} jobs, {} failed".format(len(self.results),
+                                                 len(self.failed)))
+        return "\n".join(lines)
+
+
+def load_manifest(path: str, defaults: Optional[dict] = None) -> List[Job]:
+    """Read the jobs of a JSON (or TOML for a .toml extension) manifest.
+
+    Parameters:
+        path    : the manifest file
+        defaults: default values for the jobs, overridden by the defaults
+                  table of the manifest
+
+    Raises:
+        ValueError:
+            if the manifest is not valid
+    """
+    with io.open(path, encoding="utf-8") as fd:
+        text = fd.read()
+    if path.lower().endswith(".toml"):
+        data = _load_toml(text)
+    else:
+        data = json.loads(text)
+    return parse_manifest(data, os.path.dirname(os.path.abspath(path)),
+                          defaults)
+
+
+def parse_manifest(data: dict, base: str = ".",
+                   defaults: Optional[dict] = None) -> List[Job]:
+    """Build the jobs of the content of a manifest.
+
+    Parameters:
+        data    : the manifest as a dict
+        base    : the folder the relative folders are relative to
+        defaults: default values for the jobs
+
+    Raises:
+        ValueError:
+            if the manifest is not valid
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("jobs"), list):
+        raise ValueError(_("A manifest must contain a list of jobs"))
+    common = dict(defaults or {})
+    common.update(data.get("defaults", {}))
+    known = set(RENAMER_KEYS).union(*COMMAND_KEYS.values())
+    unknown = set(data.get("defaults", {})) - known
+    if unknown:
+        raise ValueError(_("Unknown default parameters {}").format(
+            ", ".join(sorted(unknown))))
+    jobs = []
+    for i, entry in enumerate(data["jobs"]):
+        if not isinstance(entry, dict):
+            raise ValueError(_("Job {}: not a table").format(i))
+        values = dict(common, **entry)
+        command = values.pop("command", "rename")
+        if command not in COMMAND_KEYS:
+            raise ValueError(_("Job {}: unknown command {}").format(
+                i, command))
+        if "folder" not in values:
+            raise ValueError(_("Job {}: no folder").format(i))
+        folder = os.path.join(base, values.pop("folder"))
+        renamer = {key: values.pop(key) for key in RENAMER_KEYS
+                   if key in values}
+        kwargs = {key: values.pop(key) for key in COMMAND_KEYS[command]
+                  if key in values}
+        unknown = set(entry) - {"folder", "command"} - set(renamer) - set(
+            kwargs)
+        if unknown:
+            raise ValueError(_("Job {}: unknown parameters {}").format(
+                i, ", ".join(sorted(unknown))))
+        files = kwargs.pop("files", [])
+        if isinstance(files, str):
+            files = [files]
+        if (not isinstance(files, list)
+                or not all(isinstance(file, str) for file in files)
+                or (not files and command != "back")):
+            raise ValueError(_("Job {}: files must be a list of names")
+                             .format(i))
+        if "src_folder" in kwargs:
+            kwargs["src_folder"] = os.path.join(base, kwargs["src_folder"])
+        if kwargs.get("copy_mode", "copy") not in COPY_MODES:
+            raise ValueError(_("Job {}: unknown copy mode {}").format(
+                i, kwargs["copy_mode"]))
+        jobs.append(Job(folder, command, files, renamer, kwargs))
+    return jobs
+
+
+def run_jobs(jobs: Iterable[Job], workers: int = 1,
+             pool: str = "thread") -> Report:
+    """Run jobs on a pool of workers.
+
+    Parameters:
+        jobs   : the jobs (see load_manifest)
+        workers: number of jobs run concurrently
+        pool   : "thread" or "process" (or "shard", the same as
+                 "process" for jobs): kind of workers when workers > 1
+
+    Returns:
+        Report:
+            the result of each job
+
+    Raises:
+        ValueError:
+            for an unknown pool type
+    """
+    from .renamer import _check_pool
+    _check_pool(pool)
+    # the jobs sharing a ref_file form a chain run by a single worker
+    chains: Dict[tuple, list] = {}
+    for i, job in enumerate(jobs):
+        key = (os.path.normcase(os.path.abspath(job.folder)),
+               job.renamer.get("ref_file", "names.log"))
+        chains.setdefault(key, []).append((i, job))
+    if workers <= 1:
+        return Report(result for chain in chains.values()
+                      for result in _run_chain(chain))
+    import concurrent.futures
+    executor_class = (concurrent.futures.ThreadPoolExecutor
+                      if pool == "thread"
+                      else concurrent.futures.ProcessPoolExecutor)
+    with executor_class(workers) as executor:
+        futures = [executor.submit(_run_chain, chain)
+                   for chain in chains.values()]
+        return Report(result for future in futures
+                      for result in future.result())
+
+
+def _run_chain(chain: List[tuple]) -> List[JobResult]:
+    return [_run_job(i, job) for i, job in chain]
+
+
+def _run_job(index: int, job: Job) -> JobResult:
+    """Run one job with its own Renamer."""
+    from .renamer import Renamer, _run_job as run
+    stats, error = run(Renamer(job.folder, **job.renamer), job.command,
+                       tuple(job.files), job.kwargs)
+    return JobResult(index, job, error, stats)
+
+
+def _load_toml(text: str) -> dict:
+    try:
+        import tomllib
+    except ImportError:     # Python < 3.11
+        try:
+            import tomli as tomllib
+        except ImportError:
+            raise ValueError(_("Reading a TOML manifest requires Python "
+                               ">= 3.11 or the tomli package")) from None
+    try:
+        return tomllib.loads(text)
+    except tomllib.TOMLDecodeError as e:
+        raise ValueError(str(e)) from e
@@ -0,0 +1,257 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+"""Append-only journal of the changes to a names.log file.
+
+In journaled mode, a Renamer does not rewrite its whole ref_file at the end
+of each command. Each new name is immediately appended to a journal file
+(``names.log.journal`` next to ``names.log``) as a ``+new:orig`` record and
+each removed name as a ``-new`` record. The journal is replayed over the
+ref_file when the names are loaded, and folded into it (compacted) when it
+grows too large compared to the ref_file.
+
+As every record is flushed when written, a crash can at most lose the last
+(partially written) record, which is ignored at replay time.
+
+For very large histories, a ref_file with a SQLite extension (.db,
+.sqlite or .sqlite3) is stored as an indexed SqliteNames table instead,
+which is queried without ever being loaded in memory.
+"""
+
+import io
+import os.path
+import sqlite3
+from collections.abc import MutableMapping
+
+#: a journal is compacted when it has more records than this...
+COMPACT_MIN = 1000
+#: ... and more than this ratio of the number of names
+COMPACT_RATIO = 0.5
+
+
+class NamesJournal:
+    """The journal of a ref_file.
+
+    Parameters:
+        path: the name of the journal file
+
+    Attributes:
+        records: the number of records in the journal file
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records = 0
+        self._fd = None
+
+    def replay(self, names: MutableMapping) -> int:
+        """Apply the records of an existing journal to names.
+
+        Returns:
+            int: the number of records applied
+
+        Raises:
+            ValueError: with the line number and the line as arguments if a
+                record cannot be decoded
+        """
+        self.records = 0
+        if not os.path.exists(self.path):
+            return 0
+        try:
+            with io.open(self.path, encoding="utf-8") as fd:
+                for numlig, line in enumerate(fd, 1):
+                    if not line.endswith("\n"):     # interrupted write
+                        break
+                    op, record = line[:1], line[1:-1]
+                    if op == "+" and ":" in record:
+                        new, orig = record.split(":", 1)
+                        names.pop(new, None)        # keep the order of adds
+                        names[new] = orig
+                    elif op == "-":
+                        names.pop(record, None)
+                    else:
+                        raise ValueError(numlig, line)
+                    self.records += 1
+        except FileNotFoundError:
+            pass
+        return self.records
+
+    def add(self, new: str, orig: str):
+        """Record a new name."""
+        self._write("+{}:{}\n".format(os.path.normcase(new), orig))
+
+    def remove(self, new: str):
+        """Record the removal of a name."""
+        self._write("-{}\n".format(os.path.normcase(new)))
+
+    def needs_compaction(self, size: int) -> bool:
+        """Tells whether the journal should be folded in a ref_file of size
+        names."""
+        return self.records > max(COMPACT_MIN, COMPACT_RATIO * size)
+
+    def close(self):
+        if self._fd is not None:
+            self._fd.close()
+            self._fd = None
+
+    def discard(self):
+        """Close and remove the journal (once folded in its ref_file)."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.records = 0
+
+    def _write(self, record: str):
+        if self._fd is None:
+            self._fd = io.open(self.path, "a", encoding="utf-8")
+        self._fd.write(record)
+        self._fd.flush()
+        self.records += 1
+
+
+#: extensions of the ref_files using the SqliteNames format
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS names (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    new TEXT NOT NULL UNIQUE,
+    orig TEXT NOT NULL,
+    orig_norm TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS names_orig ON names (orig_norm);
+"""
+
+
+def is_sqlite(ref_file: str) -> bool:
+    """Tells whether a ref_file uses the SQLite format."""
+    return os.path.splitext(ref_file)[1].lower() in SQLITE_EXTENSIONS
+
+
+class SqliteNames(MutableMapping):
+    """An ordered {new name: original name} mapping stored in SQLite.
+
+    Unlike the text format, the names are never loaded in memory: each
+    lookup is an indexed query. The database file is only created when a
+    first name is stored, and changes are written on commit. A closed
+    mapping opens its database again on the next query.
+
+    Parameters:
+        path: the name of the database file
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db = None
+        if os.path.exists(path):
+            self._connect()
+
+    def __getitem__(self, key: str) -> str:
+        row = self._query("SELECT orig FROM names WHERE new = ?",
+                          os.path.normcase(key)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return row[0]
+
+    def __setitem__(self, key: str, orig: str):
+        db = self._connect()
+        key = os.path.normcase(key)
+        db.execute("DELETE FROM names WHERE new = ?", (key,))
+        db.execute("INSERT INTO names (new, orig, orig_norm) "
+                   "VALUES (?, ?, ?)", (key, orig, os.path.normcase(orig)))
+
+    def __delitem__(self, key: str):
+        if self._query("DELETE FROM names WHERE new = ?",
+                       os.path.normcase(key)).rowcount == 0:
+            raise KeyError(key)
+
+    def __iter__(self):
+        for row in self._query("SELECT new FROM names ORDER BY seq"):
+            yield row[0]
+
+    def __len__(self) -> int:
+        row = self._query("SELECT COUNT(*) FROM names").fetchone()
+        return 0 if row is None else row[0]
+
+    def items(self):
+        return list(self._query("SELECT new, orig FROM names ORDER BY seq"))
+
+    def extend(self, items):
+        """Append many (new, orig) pairs in one statement."""
+        self._connect().executemany(
+            "INSERT OR REPLACE INTO names (new, orig, orig_norm) "
+            "VALUES (?, ?, ?)",
+            ((os.path.normcase(new), orig, os.path.normcase(orig))
+             for new, orig in items))
+
+    def glob(self, pattern: str) -> list:
+        """Return the names matching a glob pattern, in insertion order.
+
+        The pattern is normalized as the names are, and its fixed prefix
+        is looked up in the index of the names."""
+        pattern = os.path.normcase(pattern).replace("[!", "[^")
+        return [row[0] for row in self._query(
+            "SELECT new FROM names WHERE new GLOB ? ORDER BY seq", pattern)]
+
+    def is_used(self, norm: str) -> bool:
+        """Tells whether a normalized name is a new or an original name."""
+        row = self._query(
+            "SELECT EXISTS(SELECT 1 FROM names WHERE new = ?) "
+            "OR EXISTS(SELECT 1 FROM names WHERE orig_norm = ?)",
+            norm, norm).fetchone()
+        return bool(row and row[0])
+
+    def has_orig(self, norm: str) -> bool:
+        row = self._query(
+            "SELECT EXISTS(SELECT 1 FROM names WHERE orig_norm = ?)",
+            norm).fetchone()
+        return bool(row and row[0])
+
+    def count_orig(self, norm: str) -> int:
+        """Number of names having a normalized original name."""
+        row = self._query("SELECT COUNT(*) FROM names WHERE orig_norm = ?",
+                          norm).fetchone()
+        return 0 if row is None else row[0]
+
+    def commit(self):
+        if self._db is not None:
+            self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.commit()
+            self._db.close()
+            self._db = None
+
+    def discard(self):
+        """Close and remove the database (once it holds no names)."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.executescript(_SCHEMA)
+        return self._db
+
+    def _query(self, sql: str, *params):
+        if self._db is None:
+            if not os.path.exists(self.path):   # no database: behave as empty
+                return _EMPTY
+            self._connect()
+        return self._db.execute(sql, params)
+
+
+class _Empty:
+    """Stands for the cursor of a query on a missing database."""
+    rowcount = 0
+
+    def fetchone(self):
+        return None
+
+    def __iter__(self):
+        return iter(())
+
+
+_EMPTY = _Empty()
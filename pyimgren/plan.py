@@ -0,0 +1,124 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+"""Plans of the file operations of a command.
+
+A dry run of rename, back or merge computes a Plan: the ordered list of
+the file operations of the command, each one with the change it makes to
+the ref_file. As the plan is computed with the same naming logic as a
+real run, tracking the names given to the previous files, it shows the
+exact names a real run would give.
+
+A Plan can be printed, saved as JSON, and later executed by Renamer.apply
+without reading any exif data again::
+
+    plan = ren.plan("rename", "*.JPG")
+    print(plan)
+    ren.apply(plan)
+
+Relative source paths are relative to the working directory at the time
+the plan was computed.
+"""
+
+import json
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+#: version of the JSON format of plans
+FORMAT = 1
+
+ACTIONS = ("move", "copy", "back")
+
+
+class Step(NamedTuple):
+    """One file operation of a Plan.
+
+    Attributes:
+        action: "move" (rename), "copy" (merge) or "back"
+        source: the path of the file to rename or copy
+        target: the new name of the file in the Renamer folder
+        remove: a new name removed from the ref_file, or None
+        orig  : the original name recorded in the ref_file for target, or
+                None if nothing is recorded
+    """
+    action: str
+    source: str
+    target: str
+    remove: Optional[str] = None
+    orig: Optional[str] = None
+
+
+class Plan:
+    """The file operations of a command on a folder.
+
+    Parameters:
+        folder   : the folder of the Renamer
+        ref_file : its ref_file
+        copy_mode: the copy mode of the copy steps
+        steps    : the initial steps
+    """
+
+    def __init__(self, folder: str, ref_file: str, copy_mode: str = "copy",
+                 steps: Iterable[Step] = ()):
+        self.folder, self.ref_file, self.copy_mode = (folder, ref_file,
+                                                      copy_mode)
+        self.steps: List[Step] = list(steps)
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+    def __iter__(self) -> Iterator[Step]:
+        return iter(self.steps)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Plan) and self.to_dict() == other.to_dict()
+
+    def __str__(self) -> str:
+        return "".join("{} -> {}\n".format(step.source, step.target)
+                       for step in self.steps)
+
+    def append(self, step: Step):
+        self.steps.append(step)
+
+    @property
+    def added(self) -> List[Tuple[str, str]]:
+        """The (new name, original name) pairs added to the ref_file."""
+        return [(step.target, step.orig) for step in self.steps
+                if step.orig is not None]
+
+    @property
+    def removed(self) -> List[str]:
+        """The new names removed from the ref_file."""
+        return [step.remove for step in self.steps if step.remove is not None]
+
+    def to_dict(self) -> dict:
+        return {"format": FORMAT, "folder": self.folder,
+                "ref_file": self.ref_file, "copy_mode": self.copy_mode,
+                "steps": [step._asdict() for step in self.steps]}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Plan":
+        """Build a Plan from the result of to_dict.
+
+        Raises:
+            ValueError: if data is not a valid plan
+        """
+        try:
+            if data["format"] != FORMAT:
+                raise ValueError("Unsupported plan format {}".format(
+                    data["format"]))
+            steps = [Step(**step) for step in data["steps"]]
+            plan = cls(data["folder"], data["ref_file"], data["copy_mode"],
+                       steps)
+        except (KeyError, TypeError) as e:
+            raise ValueError("Invalid plan") from e
+        for step in steps:
+            if step.action not in ACTIONS:
+                raise ValueError("Unknown action {}".format(step.action))
+        return plan
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=1)
+
+    @classmethod
+    def from_json(cls, text: str) -> "Plan":
+        return cls.from_dict(json.loads(text))
@@ -0,0 +1,229 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+"""Progress events and statistics of the Renamer commands.
+
+Each command of a Renamer counts what it does and times its phases in a
+Stats object (the stats attribute of the Renamer). If the progress
+attribute of the Renamer is set, it is called for each event with the
+event name, the file concerned (or None) and the current Stats. This is
+enough to display a progress line or to feed a monitoring system, without
+any per file logging::
+
+    ren.progress = lambda event, file, stats: ...
+    ren.rename("*.JPG")
+    print(ren.stats)
+    metrics = ren.stats.to_dict()
+
+With the profile parameter of the commands, the Stats also keeps the
+duration of each entry in a phase (each file for the name phase, each
+wait for the next exif date for the read phase) and report gives a per
+phase table of the timings.
+"""
+
+import sys
+import time
+from typing import Optional, TextIO
+
+SCANNED = "scanned"         #: a file matched by the patterns
+SKIPPED = "skipped"         #: a file rejected by the extension filters
+READ = "read"               #: the exif date of a file was read
+CACHE_HIT = "cache_hit"     #: the exif date of a file was in the cache
+NO_DATE = "no_date"         #: a file has no exif date
+COLLISION = "collision"     #: a name needed a suffix
+RENAMED = "renamed"         #: a file was renamed
+COPIED = "copied"           #: a file was copied
+DUPLICATE = "duplicate"     #: a file was already in the folder (dedupe)
+ERROR = "error"             #: a file operation failed
+
+EVENTS = (SCANNED, SKIPPED, READ, CACHE_HIT, NO_DATE, COLLISION, RENAMED,
+          COPIED, DUPLICATE, ERROR)
+
+#: phases of a command: loading of the ref_file, pattern expansion, content
+#: comparisons (dedupe), exif reads, naming, file operations and saving of
+#: the ref_file
+PHASES = ("load", "scan", "hash", "read", "name", "rename", "copy", "save")
+
+
+class Stats:
+    """Counters and timings of a command.
+
+    Attributes:
+        counts : {event: number of occurrences}
+        times  : {phase: seconds spent in that phase}. A phase started
+                 inside another one pauses it, so that the times add up.
+        elapsed: total duration of the command in seconds
+        io_read: bytes read by the process during the command, or None
+                 where unknown (only available on Linux)
+        samples: {phase: [seconds spent in each entry of the phase]} if
+                 the Stats was built with samples=True, else None
+    """
+
+    def __init__(self, samples: bool = False):
+        self.counts = dict.fromkeys(EVENTS, 0)
+        self.times = dict.fromkeys(PHASES, 0.0)
+        self.elapsed = 0.0
+        self.io_read = None
+        self.samples = {} if samples else None
+        self._start = time.perf_counter()
+        self._io_start = _io_read()
+        self._stack = []
+        self._phases = {}
+
+    def phase(self, name: str) -> "_Phase":
+        """Return a (reusable) context manager timing a phase."""
+        phase = self._phases.get(name)
+        if phase is None:
+            phase = self._phases[name] = _Phase(self, name)
+        return phase
+
+    def stop(self):
+        """Record the total duration and I/O of the command."""
+        self.elapsed = time.perf_counter() - self._start
+        io = _io_read()
+        if io is not None and self._io_start is not None:
+            self.io_read = io - self._io_start
+
+    def merge(self, other: "Stats"):
+        """Add the counters and times of another Stats (a sub-folder)."""
+        for event, count in other.counts.items():
+            self.counts[event] += count
+        for phase, seconds in other.times.items():
+            self.times[phase] += seconds
+        if self.samples is not None and other.samples is not None:
+            for phase, durations in other.samples.items():
+                self.samples.setdefault(phase, []).extend(durations)
+
+    @property
+    def files(self) -> int:
+        """Number of files whose exif date is known (read or cached)."""
+        return self.counts[READ] + self.counts[CACHE_HIT]
+
+    def rate(self) -> float:
+        """Files processed per second."""
+        elapsed = self.elapsed or time.perf_counter() - self._start
+        return self.files / elapsed if elapsed > 0 else 0.0
+
+    def summary(self) -> dict:
+        """Per phase timings: {phase: {"total", "share", "calls", "mean",
+        "max"}}, where share is the fraction of the elapsed time. calls,
+        mean and max (per entry of the phase) are only given with samples.
+        """
+        result = {}
+        for phase, total in self.times.items():
+            line = {"total": total,
+                    "share": total / self.elapsed if self.elapsed else 0.0}
+            durations = (self.samples or {}).get(phase)
+            if durations:
+                line.update(calls=len(durations),
+                            mean=total / len(durations), max=max(durations))
+            result[phase] = line
+        return result
+
+    def report(self) -> str:
+        """A text table of the per phase timings."""
+        lines = ["{:10} {:>10} {:>6} {:>8} {:>10} {:>10}".format(
+            "phase", "total (s)", "%", "calls", "mean (ms)", "max (ms)")]
+        for phase, line in self.summary().items():
+            if line.get("calls"):
+                details = "{:>8} {:>10.3f} {:>10.3f}".format(
+                    line["calls"], 1000 * line["mean"], 1000 * line["max"])
+            else:
+                details = ""
+            lines.append("{:10} {:>10.3f} {:>6.1f} {}".format(
+                phase, line["total"], 100 * line["share"], details).rstrip())
+        lines.append("{:10} {:>10.3f}".format("total", self.elapsed))
+        return "\n".join(lines)
+
+    def to_dict(self) -> dict:
+        result = {"counts": dict(self.counts), "times": dict(self.times),
+                  "elapsed": self.elapsed, "io_read": self.io_read,
+                  "rate": self.rate()}
+        if self.samples is not None:
+            result["phases"] = self.summary()
+        return result
+
+    def __str__(self) -> str:
+        lines = ["{:10} {:>10}".format(event, count)
+                 for event, count in self.counts.items() if count]
+        lines.extend("{:10} {:>10.3f} s".format(phase, seconds)
+                     for phase, seconds in self.times.items() if seconds)
+        lines.append("{:10} {:>10.3f} s".format("total", self.elapsed))
+        lines.append("{:10} {:>10.1f} files/s".format("rate", self.rate()))
+        if self.io_read is not None:
+            lines.append("{:10} {:>10} bytes".format("io_read", self.io_read))
+        return "\n".join(lines)
+
+
+class _Phase:
+    """Context manager charging the elapsed time to a phase."""
+    __slots__ = ("stats", "name")
+
+    def __init__(self, stats: Stats, name: str):
+        self.stats, self.name = stats, name
+
+    def __enter__(self):
+        now = time.perf_counter()
+        stack = self.stats._stack
+        if stack:       # pause the outer phase
+            outer = stack[-1]
+            outer[2] += now - outer[1]
+        stack.append([self.name, now, 0.0])
+        return self
+
+    def __exit__(self, *_args):
+        now = time.perf_counter()
+        stats = self.stats
+        name, since, spent = stats._stack.pop()
+        spent += now - since
+        stats.times[name] = stats.times.get(name, 0.0) + spent
+        if stats.samples is not None:
+            stats.samples.setdefault(name, []).append(spent)
+        if stats._stack:
+            stats._stack[-1][1] = now
+
+
+class ProgressLine:
+    """A progress callback rewriting a status line on a terminal.
+
+    Parameters:
+        stream  : where the line is written (default sys.stderr)
+        interval: minimum number of seconds between two updates
+    """
+
+    def __init__(self, stream: Optional[TextIO] = None,
+                 interval: float = 0.5):
+        self.stream = sys.stderr if stream is None else stream
+        self.interval = interval
+        self._next = 0.0
+
+    def __call__(self, event: str, file: Optional[str], stats: Stats):
+        now = time.perf_counter()
+        if now < self._next:
+            return
+        self._next = now + self.interval
+        self.stream.write("\r" + self.line(stats))
+        self.stream.flush()
+
+    def line(self, stats: Stats) -> str:
+        counts = stats.counts
+        return ("{} scanned, {} read, {} cached, {} renamed, {} copied, "
+                "{} errors ({:.0f} files/s)").format(
+            counts[SCANNED], counts[READ], counts[CACHE_HIT],
+            counts[RENAMED], counts[COPIED], counts[ERROR], stats.rate())
+
+    def close(self, stats: Stats):
+        """Write the final line."""
+        self.stream.write("\r" + self.line(stats) + "\n")
+        self.stream.flush()
+
+
+def _io_read() -> Optional[int]:
+    try:
+        with open("/proc/self/io", "rb") as fd:
+            for line in fd:
+                if line.startswith(b"rchar:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
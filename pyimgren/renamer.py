@@ -5,22 +5,26 @@
 
 import collections
 import datetime
-import gettext
+import fnmatch
 import glob
 import io
 import itertools
-import locale
 import logging
 import os.path
-import os.path
-import os.path
-import shutil
+import re
 import sys
-from typing import Iterable, Mapping
-
-import piexif
-
-_ = lambda x: x
+from typing import Iterable, Iterator, Mapping, Optional, Tuple
+
+from . import batch, exif, progress, stamps
+from .archive import (ARCHIVE_SEP, ArchiveReader, Member, is_archive,
+                      member_name, split_source)
+from .cache import ExifCache, MISSING
+from .digest import DIGEST_FILE, DigestIndex
+from .fastcopy import COPY_MODES, copy_file
+from .i18n import _, nls_init
+from .namelog import NamesJournal, SqliteNames, is_sqlite
+from .plan import Plan, Step
+from .progress import Stats
 
 # a hack to use the new root_dir feature of glob.glob for Python>=3.10
 # while still being 3.9 compliant
@@ -38,37 +42,10 @@ except TypeError:
                 yield os.path.basename(n)
 
 
-def nls_init(reset: bool=False) -> str:
-    """ Initialize the package for i18n
-
-    Parameters:
-        reset: Indicates whether i18n should be setup (if True)
-               or removed (if False)
-
-    Returns: the name of the locale currently used by the package
-    """
-    global _
-
-    if reset:
-        _ = lambda x: x
-        loc = None
-    else:
-        if "LANG" in os.environ:
-            loc = os.environ["LANG"]
-        else:
-            loc = locale.getlocale()[0]
-            if loc is None:
-                try:
-                    loc = locale.setlocale(locale.LC_ALL, '')[0]
-                except locale.Error:
-                    loc = None
+def _pattern_regex(pattern: str):
+    """Compile a glob pattern (to match normalized names)."""
+    return re.compile(fnmatch.translate(os.path.normcase(pattern)))
 
-        _ = gettext.translation("pyimgren",
-                                         os.path.join(os.path.dirname(__file__),
-                                                      "locale"),
-                                         loc,
-                                         fallback=True).gettext
-    return loc
 
 class PyimgrenException(Exception):
     """Base for pyimgren exceptions"""
@@ -119,6 +96,184 @@ class MergeSameDirException(PyimgrenException):
         return _("Cannot merge {} into itself").format(self.folder)
 
 
+# suffixes tried to find a free name, in order: "", "a" to "z", "aa" to "zz"
+_SUFFIXES = [""] + [chr(i) for i in range(ord("a"), ord("z") + 1)] + [
+    chr(i) + chr(j) for i in range(ord("a"), ord("z") + 1)
+    for j in range(ord("a"), ord("z") + 1)]
+
+#: kinds of workers of the commands
+POOLS = ("thread", "process", "shard")
+
+#: maximum number of files of a shard of the "shard" pool
+SHARD_SIZE = 4096
+
+# the side files of the ref_file (journal, temporary copy) and of the
+# SQLite databases (rollback journal, write-ahead log)
+_SIDE_SUFFIXES = ("", ".journal", ".tmp", "-journal", "-wal", "-shm")
+
+
+class _NameIndex:
+    """Normalized index of a names mapping, maintained incrementally.
+
+    Allows constant time tests for names already used either as a new
+    name or as an original one. All changes to the mapping must go through
+    add and remove to keep the index in sync.
+
+    Attributes:
+        names: the indexed mapping {new name: original name}
+        keys : {normalized new name: new name}
+        origs: Counter of the normalized original names
+    """
+    def __init__(self, names: Mapping[str, str]):
+        self.names = names
+        self.keys = {os.path.normcase(key): key for key in names}
+        self.origs = collections.Counter(os.path.normcase(orig)
+                                         for orig in names.values())
+
+    def __contains__(self, norm: str) -> bool:
+        """Tells whether a normalized name is used in the mapping."""
+        return norm in self.keys or norm in self.origs
+
+    def key(self, name: str) -> Optional[str]:
+        """Return the actual key matching name or None."""
+        return self.keys.get(os.path.normcase(name))
+
+    def has_orig(self, norm: str) -> bool:
+        """Tells whether a normalized name is used as an original name."""
+        return norm in self.origs
+
+    def orig_count(self, norm: str) -> int:
+        return self.origs.get(norm, 0)
+
+    def orig(self, key: str) -> str:
+        """Return the original name of an actual key."""
+        return self.names[key]
+
+    def match(self, pattern: str) -> Iterator[str]:
+        """Yield the actual keys matching a normalized glob pattern."""
+        regex = _pattern_regex(pattern)
+        return (key for norm, key in self.keys.items() if regex.match(norm))
+
+    def add(self, new: str, orig: str):
+        if new in self.names:
+            self.remove(new)
+        self.names[new] = orig
+        self.keys[os.path.normcase(new)] = new
+        self.origs[os.path.normcase(orig)] += 1
+
+    def remove(self, new: str) -> str:
+        """Remove a new name and return its original name."""
+        orig = self.names.pop(new)
+        del self.keys[os.path.normcase(new)]
+        norm = os.path.normcase(orig)
+        self.origs[norm] -= 1
+        if self.origs[norm] <= 0:
+            del self.origs[norm]
+        return orig
+
+
+class _SqliteIndex:
+    """Same interface as _NameIndex for a SqliteNames mapping, where each
+    test is an indexed query instead of an in memory lookup."""
+    def __init__(self, names: SqliteNames):
+        self.names = names
+
+    def __contains__(self, norm: str) -> bool:
+        return self.names.is_used(norm)
+
+    def key(self, name: str) -> Optional[str]:
+        norm = os.path.normcase(name)
+        return norm if norm in self.names else None
+
+    def has_orig(self, norm: str) -> bool:
+        return self.names.has_orig(norm)
+
+    def orig_count(self, norm: str) -> int:
+        return self.names.count_orig(norm)
+
+    def orig(self, key: str) -> str:
+        return self.names[key]
+
+    def match(self, pattern: str) -> Iterator[str]:
+        return iter(self.names.glob(pattern))
+
+    def add(self, new: str, orig: str):
+        self.names[new] = orig
+
+    def remove(self, new: str) -> str:
+        return self.names.pop(new)
+
+
+class _PlannedIndex:
+    """Changes planned over an index, which is left untouched.
+
+    Used by dry runs, so that each file sees the names given to the
+    previous ones exactly as in a real run.
+
+    Attributes:
+        base : the underlying index
+        keys : {normalized new name: new name, or None once removed}
+        origs: {normalized new name: original name} of the added names
+        counts: Counter of the changes to the count of each normalized
+                original name
+    """
+    def __init__(self, base):
+        self.base = base
+        self.names = base.names
+        self.keys = {}
+        self.origs = {}
+        self.counts = collections.Counter()
+
+    def __contains__(self, norm: str) -> bool:
+        return self.key(norm) is not None or self.has_orig(norm)
+
+    def key(self, name: str) -> Optional[str]:
+        norm = os.path.normcase(name)
+        if norm in self.keys:
+            return self.keys[norm]
+        return self.base.key(name)
+
+    def has_orig(self, norm: str) -> bool:
+        change = self.counts.get(norm, 0)
+        if change == 0:
+            return self.base.has_orig(norm)
+        return self.base.orig_count(norm) + change > 0
+
+    def orig_count(self, norm: str) -> int:
+        return self.base.orig_count(norm) + self.counts.get(norm, 0)
+
+    def orig(self, key: str) -> str:
+        norm = os.path.normcase(key)
+        if norm in self.origs:
+            return self.origs[norm]
+        return self.base.orig(key)
+
+    def match(self, pattern: str) -> Iterator[str]:
+        regex = _pattern_regex(pattern)
+        for key in self.base.match(pattern):
+            if os.path.normcase(key) not in self.keys:
+                yield key
+        for norm, key in self.keys.items():
+            if key is not None and regex.match(norm):
+                yield key
+
+    def add(self, new: str, orig: str):
+        if self.key(new) is not None:
+            self.remove(self.key(new))
+        norm = os.path.normcase(new)
+        self.keys[norm] = new
+        self.origs[norm] = orig
+        self.counts[os.path.normcase(orig)] += 1
+
+    def remove(self, new: str) -> str:
+        orig = self.orig(new)
+        norm = os.path.normcase(new)
+        self.keys[norm] = None
+        self.origs.pop(norm, None)
+        self.counts[os.path.normcase(orig)] -= 1
+        return orig
+
+
 class Renamer:
     """Main class of the module.
 
@@ -135,8 +290,23 @@ class Renamer:
                   "%Y%m%d_%H%M%S")
         ext_mask: the extension of the new name
         ref_file: the name of a file that will remember the old names
-                  (default names.log)
-
+                  (default names.log). If its extension is .db, .sqlite or
+                  .sqlite3, the names are stored in an indexed SQLite
+                  database which is never fully loaded in memory.
+        cache_file: the name of a file (in folder) caching the exif dates
+                  of the processed files between runs (default None: no
+                  cache)
+        journal : if True, changes are appended to a journal file as soon
+                  as a file is renamed, and the ref_file is only rewritten
+                  when the journal becomes too large (default False)
+        include : if not None, an iterable of extensions (".jpg" or "jpg",
+                  case insensitive): the files with another extension are
+                  skipped by rename and merge before being read
+        exclude : an iterable of extensions of files always skipped, for
+                  example (".mp4", ".xmp") (default none)
+
+    The files written by the Renamer itself (ref_file and its journal,
+    cache_file, names.digest and temporary files) are always skipped.
 
     All parameters become attribute of the object with the same name
 
@@ -149,8 +319,15 @@ class Renamer:
             dummy   : a boolean flag that will cause a "dry run", meaning that
                       the folder will be scanned, and debug info eventually printed
                       but no file will be renamed (default false)
+            workers : number of threads or processes used to read the
+                      exif dates (default 1)
+            pool    : "thread", "process" or "shard" (default "thread")
         log: an object respecting a logging.Logger interface. By default,
             ``logging.getLogger("pyimgren")``
+        progress: None or a callable receiving (event, file, stats) for
+            each event of a command (see pyimgren.progress)
+        stats: the Stats (counters and timings) of the current or last
+            command
 
     A file named names.log is created in the folder to store the new names
     and the original ones, in order to be able to rename them back.
@@ -169,22 +346,43 @@ class Renamer:
     delta: int
     debug: bool
     dummy: bool
-    _orig: set
-    _target: set
+    workers: int
+    pool: str
+    copy_mode: str
 
     def __init__(self, folder,
                  dst_mask = "%Y%m%d_%H%M%S",
                  ext_mask = ".jpg",
                  ref_file = "names.log",
+                 cache_file = None,
+                 journal = False,
+                 include = None,
+                 exclude = (),
                  ):
         self.folder, self.dst_mask, self.ext_mask, self.ref_file = (
             folder, dst_mask, ext_mask, ref_file)
+        self.cache_file, self.journal = cache_file, journal
+        self.include, self.exclude = include, exclude
         self.log = logging.getLogger("pyimgren")
+        self.progress = None
+        self.stats = Stats()
         self.names = None
+        self._index = None
+        self._journal = None
+        # names as in the text ref_file, and the names added since then
+        self._synced, self._appended = None, []
+        self._subfolder = False
+        self._plan = self._last_plan = None
+        self._format = None
+        self._digests = None
+        self._archives = {}
+        self._filters = (None, frozenset())
         self._reset()
 
     def rename(self, *pictures, delta:int = 0,
-               debug: bool=False, dummy:bool=False) -> None:
+               debug: bool=False, dummy:bool=False,
+               workers: int = 1, pool: str = "thread",
+               recursive: bool = False, profile: bool = False) -> None:
         """Rename pictures in folder
 
         Parameters:
@@ -199,31 +397,51 @@ class Renamer:
             dummy   : a boolean flag that will cause a "dry run", meaning that
                       the folder will be scanned, and debug info eventually printed
                       but no file will be renamed
+            workers : number of workers used to read the exif dates (default
+                      1: dates are read in the calling thread)
+            pool    : "thread", "process" or "shard": kind of workers used
+                      when workers > 1. With "shard", the files are split
+                      into contiguous shards and worker processes also
+                      compute their tentative names (see _process_sharded)
+            recursive: if True, pictures are renamed in folder and in all
+                      its sub-folders, each one having its own ref_file. The
+                      workers then process different folders concurrently.
+            profile : if True, self.stats also records the duration of each
+                      file in each phase (see pyimgren.progress)
 
         Uses load_names to load the names.log file, and get_new_name to avoid
-        collisions in file names.
+        collisions in file names. The new names are given in the order of
+        pictures whatever the number of workers, then all the files are
+        renamed in one batch (see pyimgren.batch).
 
         Raises:
             RuntimeErrorException:
                 if for a destination name, all files from a to zz already exist
         """
-        self.delta, self.debug, self.dummy = delta, debug, dummy
+        if recursive:
+            self._recurse("rename", pictures, workers, pool, delta=delta,
+                          debug=debug, dummy=dummy, profile=profile)
+            return
+        self._begin(delta, debug, dummy, workers, pool, profile)
         names = self.load_names()
         pictures = self._rename_filter(pictures)
-        self._process(names, pictures, self.folder, self._move)
+        self._batched(lambda: self._process(names, pictures, self.folder,
+                                            self._move))
         self._save_names()
         self._reset()
 
     def back(self, *pictures, delta:int = 0,
-               debug: bool=False, dummy:bool=False) -> None:
+               debug: bool=False, dummy:bool=False,
+               recursive: bool = False, profile: bool = False,
+               since=None, until=None) -> None:
         """Rename pictures back to their initial name in folder
         (by default all pictures known in ref file)
 
         Parameters:
             pictures: an iterable of names. If one name exists in the local
                 ref_file, that file will be renamed back. If it contains
-                wildcard characters (* and ?), all files matching that
-                pattern will be processed.
+                wildcard characters (* and ?), all names of the ref_file
+                matching that pattern will be processed.
             delta:    a number of minutes to add to the time found in exif data.
                       This is intended to cope with a camera having a wrong time
             debug   : a boolean flag that will cause a line to be printed for
@@ -231,42 +449,143 @@ class Renamer:
             dummy   : a boolean flag that will cause a "dry run", meaning that
                       the folder will be scanned, and debug info eventually printed
                       but no file will be renamed
+            recursive: if True, pictures are renamed back in folder and in
+                      all its sub-folders
+            profile : if True, self.stats also records the duration of each
+                      file in each phase
+            since   : only process the pictures whose name (built with
+                      dst_mask) has a date after since: a date, a datetime
+                      or a prefix of an ISO date like "2023-05"
+            until   : only process the pictures whose name has a date
+                      before until, included: with "2023-05", all the
+                      pictures of May 2023 are processed
+
+        Uses load_names to load the names.log file. The patterns are
+        matched against the names of the ref_file, and the names whose file
+        is no longer in folder are skipped. The files are renamed in one
+        batch, in an order where no file is overwritten even if an
+        original name is the current name of another file.
 
-        Uses load_names to load the names.log file.
+        Raises:
+            ValueError:
+                if since or until is not a valid date, or if dst_mask
+                does not allow to read dates back from the names
         """
-        self.delta, self.debug, self.dummy = delta, debug, dummy
-        names = self.load_names()
-        if len(pictures) == 0:
-            files = list(names.keys())
-        else:
-            files = genfiles(pictures, self.folder)
-        for file in files:
-            try:
-                orig = names[os.path.normcase(file)]
-            except KeyError:
-                self.log.warning(UnknownPictureException(file,self))
-                continue
-            if self.debug: self.log.debug("%s -> %s", file, orig)
-            if not self.dummy:
-                try:
-                    os.rename(os.path.join(self.folder, file),
-                              os.path.join(self.folder, orig))
-                    del self.names[file]
-                except OSError as e:
-                    self.log.warning(_("Could not rename {file} in {folder}",
-                                       ).format(file=file, folder = self.folder),
-                                     exc_info=e)
+        if recursive:
+            self._recurse("back", pictures, delta=delta, debug=debug,
+                          dummy=dummy, profile=profile, since=since,
+                          until=until)
+            return
+        self._begin(delta, debug, dummy, profile=profile)
+        self.load_names()
+        with self.stats.phase("scan"):
+            files = self._back_files(pictures, since, until)
+        with self.stats.phase("name"):
+            existing = set(self._folder_files())
+            # the steps do not depend on each other: no naming pass needed
+            steps = [step for step in map(self._back_step, files)
+                     if step is not None]
+            if self._plan is None:
+                self._run_batch(steps, existing)
+            else:
+                for step in steps:
+                    self._run_step(step)
+                    self._track(step)
         self._save_names()
         self._reset()
-                    
+
+    def _back_files(self, pictures: Iterable[str], since=None,
+                    until=None) -> list:
+        """Select the names of the ref_file to rename back.
+
+        Patterns are matched against the indexed names of the ref_file
+        instead of the folder, dates are read back from the names, and the
+        names whose file is not in the folder snapshot are skipped with a
+        single warning."""
+        index = self._names_index()
+        if len(pictures) == 0:
+            keys = list(index.names.keys())
+        else:
+            keys = {}
+            for pict in pictures:
+                if not glob.has_magic(pict):
+                    key = index.key(pict)
+                    if key is None:
+                        self.log.warning(UnknownPictureException(pict, self))
+                    else:
+                        keys[key] = True
+                    continue
+                hidden = os.path.basename(pict).startswith(".")
+                for key in index.match(pict):
+                    if hidden or not key.startswith("."):  # as glob does
+                        keys[key] = True
+        if since is not None or until is not None:
+            since = None if since is None else stamps.bound(since)
+            until = None if until is None else stamps.bound(until)
+            fmt = stamps.NameFormat(self.dst_mask)
+            selected = []
+            for key in keys:
+                stamp = fmt.stamp_of(key)
+                if stamp is not None and stamps.in_range(stamp, since,
+                                                         until):
+                    selected.append(key)
+            keys = selected
+        files = self._folder_files()
+        present = [key for key in keys if os.path.normcase(key) in files]
+        if len(present) < len(keys):
+            self.log.warning(_("{count} files of {ref_file} are not in "
+                               "{folder}").format(
+                count=len(keys) - len(present), ref_file=self.ref_file,
+                folder=self.folder))
+        return present
+
+    def _back_step(self, file: str) -> Optional[Step]:
+        """Return the step renaming back one file of folder, or None if
+        the file is unknown."""
+        self._event(progress.SCANNED, file)
+        index = self._names_index()
+        key = index.key(file)
+        if key is None:
+            self.log.warning(UnknownPictureException(file,self))
+            return None
+        orig = index.orig(key)
+        member = member_name(orig)
+        if member is not None:
+            # a file merged from an archive goes back to the name of its
+            # member, which other members (or merges) may share
+            orig = self.get_new_file_name(member)
+            self._add_file(orig)
+        if self.debug: self.log.debug("%s -> %s", file, orig)
+        return Step("back", os.path.join(self.folder, file), orig, key)
+
+    def _back_file(self, file: str) -> Optional[str]:
+        """Rename back one file of folder and return its original name, or
+        None if the file is unknown or could not be renamed."""
+        step = self._back_step(file)
+        if step is None:
+            return None
+        try:
+            self._run_step(step)
+        except OSError as e:
+            self.log.warning(_("Could not rename {file} in {folder}",
+                               ).format(file=file, folder = self.folder),
+                             exc_info=e)
+            return None
+        self._track(step)
+        return step.target
+
     def merge(self, *files, src_folder:str= '.', delta:int = 0,
-               debug: bool=False, dummy:bool=False) -> None:
+               debug: bool=False, dummy:bool=False,
+               workers: int = 1, pool: str = "thread",
+               recursive: bool = False, copy_mode: str = "copy",
+               profile: bool = False, dedupe: bool = False) -> None:
         """Merge files from a different folder.
 
         Parameters:
             *files: file names or patterns containing wildcard characters (* or?)
                 defining the files to be copied.
-            src_folder: the name of the folder containing the files to merge.
+            src_folder: the name of the folder containing the files to merge,
+                or of a zip or tar archive (see below).
                 It cannot contain wildcard characters.
             delta:    a number of minutes to add to the time found in exif data.
                       This is intended to cope with a camera having a wrong time
@@ -275,6 +594,21 @@ class Renamer:
             dummy   : a boolean flag that will cause a "dry run", meaning that
                       the folder will be scanned, and debug info eventually printed
                       but no file will be renamed
+            workers : number of workers used to read the exif dates
+            pool    : "thread", "process" or "shard": kind of workers used
+                      when workers > 1 (see rename)
+            recursive: if True, the sub-folders of src_folder are merged
+                      into the same sub-folders of folder (created if
+                      needed), each one having its own ref_file
+            copy_mode: how files are copied: "copy" (shutil.copy),
+                      "reflink" (cloned extents), "hardlink" or "auto" (the
+                      fastest method supported, see pyimgren.fastcopy)
+            profile : if True, self.stats also records the duration of each
+                      file in each phase
+            dedupe  : if True, the files having the same content as a file
+                      of folder (or as a file already merged) are skipped.
+                      The digests of the files of folder are kept in
+                      names.digest (see pyimgren.digest)
 
         If src_folder is given it is used as a start path component for all
         relative paths in files.
@@ -285,18 +619,197 @@ class Renamer:
 
         If a name matches a directory, the directory is ignored and a warning
         is issued.
+
+        If src_folder is a zip or tar archive (possibly compressed), the
+        files are patterns matched against the whole names of its members,
+        which are read once in archive order and streamed to their new
+        names, without being extracted elsewhere. The original name
+        recorded in the ref_file is then ``archive!member``. The exif
+        cache, the workers, copy_mode and dedupe are not used for an
+        archive (see pyimgren.archive).
         
         Raises:
             RuntimeErrorException:
                 if all files from a to zz already exist
+            ValueError:
+                for a recursive merge from an archive
         """
-        self.delta, self.debug, self.dummy = delta, debug, dummy
+        if copy_mode not in COPY_MODES:
+            raise ValueError(_("Unknown copy mode {}").format(copy_mode))
+        archive = is_archive(src_folder)
+        if recursive and archive:
+            raise ValueError(_("An archive cannot be merged recursively"))
+        if recursive:
+            self._recurse("merge", files, workers, pool, src_folder=src_folder,
+                          delta=delta, debug=debug, dummy=dummy,
+                          copy_mode=copy_mode, profile=profile, dedupe=dedupe)
+            return
+        self._begin(delta, debug, dummy, workers, pool, profile)
+        self.copy_mode = copy_mode
+        if self._plan is not None:
+            self._plan.copy_mode = copy_mode
+        if archive:
+            if dedupe:
+                self.log.warning(_("dedupe is not used for archive {}"
+                                   ).format(src_folder))
+            self.load_names()
+            self._merge_archive(src_folder, files)
+            self._save_names()
+            self._reset()
+            return
+        if dedupe:
+            self._digests = DigestIndex(
+                self.folder, os.path.join(self.folder, DIGEST_FILE), dummy)
         files = self._merge_filter(src_folder, files)
         names = self.load_names()
         self._process(names, files, src_folder, self._copy)
         self._save_names()
         self._reset()
 
+    def convert(self, ref_file: str, debug: bool = False,
+                dummy: bool = False) -> None:
+        """Copy the content of the ref_file into a new ref_file, and use
+        that new one from now on.
+
+        Parameters:
+            ref_file: the name of the new ref_file. Its extension gives its
+                      format: SQLite for .db, .sqlite or .sqlite3, text
+                      otherwise
+            debug   : a boolean flag that will cause a line to be printed
+            dummy   : a boolean flag that will cause a "dry run", meaning
+                      that nothing will be written
+
+        The current ref_file is left untouched.
+
+        Raises:
+            FileExistsError:
+                if the new ref_file already exists
+        """
+        self._begin(0, debug, dummy)
+        path = os.path.join(self.folder, ref_file)
+        if os.path.exists(path):
+            raise FileExistsError(path)
+        old = self.load_names()
+        if self.debug:
+            self.log.debug("%s -> %s", self.ref_file, ref_file)
+        if not self.dummy:
+            self.ref_file = ref_file
+            self.names = self._index = self._journal = None
+            names = self.load_names()
+            if isinstance(names, SqliteNames):
+                names.extend(old.items())
+                names.close()
+            else:
+                names.update(old.items())
+                self._write_names()
+        if isinstance(old, SqliteNames):
+            old.close()
+        self._reset()
+
+    def plan(self, command: str, *pictures, **kwargs) -> Plan:
+        """Compute what a command would do, without changing anything.
+
+        Parameters:
+            command : "rename", "back" or "merge"
+            pictures: the files or patterns of the command
+            kwargs  : the other parameters of the command (except dummy
+                      and recursive)
+
+        Returns:
+            Plan:
+                the file operations of the command and the changes to the
+                ref_file, that can be executed later by apply
+
+        A dry run (dummy=True) of a command computes the same plan.
+
+        Raises:
+            ValueError:
+                for an unknown command or a recursive one
+        """
+        if command not in ("rename", "back", "merge"):
+            raise ValueError(_("Unknown command {}").format(command))
+        if kwargs.pop("recursive", False):
+            raise ValueError(_("A plan cannot be recursive"))
+        kwargs.pop("dummy", None)
+        self._last_plan = None
+        getattr(self, command)(*pictures, dummy=True, **kwargs)
+        return self._last_plan
+
+    def apply(self, plan: Plan, debug: bool = False,
+              dummy: bool = False, profile: bool = False) -> None:
+        """Execute a plan, without reading any exif data.
+
+        Parameters:
+            plan : a Plan computed by plan (possibly by another Renamer, or
+                   loaded from JSON)
+            debug: a boolean flag that will cause a line to be printed for
+                   each step when true
+            dummy: a boolean flag that will cause the plan to be only
+                   checked
+            profile: if True, self.stats also records the duration of
+                   each entry in each phase
+
+        The steps made stale by changes in the folder since the plan was
+        computed (missing source, existing target or ref_file entry
+        already removed) are skipped with a warning.
+
+        Raises:
+            ValueError:
+                if the plan was computed for another folder or ref_file
+        """
+        if (os.path.normcase(os.path.abspath(plan.folder))
+                != os.path.normcase(os.path.abspath(self.folder))
+                or plan.ref_file != self.ref_file):
+            raise ValueError(_("Plan for {} cannot be applied to {}").format(
+                os.path.join(plan.folder, plan.ref_file),
+                os.path.join(self.folder, self.ref_file)))
+        self._begin(0, debug, dummy, profile=profile)
+        self.copy_mode = plan.copy_mode
+        self.load_names()
+        sources = set(os.path.normcase(os.path.basename(step.source))
+                      for step in plan if step.action != "copy")
+        removed = set(os.path.normcase(name) for name in plan.removed)
+        current = Plan(plan.folder, plan.ref_file, plan.copy_mode)
+        for step in plan:
+            if not self._is_current(step, sources, removed):
+                self.log.warning(_("{} -> {}: folder changed since the plan "
+                                   "was computed").format(step.source,
+                                                          step.target))
+                continue
+            if self.debug:
+                self.log.debug("%s -> %s", step.source, step.target)
+            current.append(step)
+        if self._plan is not None:
+            self._plan.steps.extend(current)
+        else:
+            self._run_batch(current, set(self._folder_files()))
+        self._save_names()
+        self._reset()
+
+    def _is_current(self, step: Step, sources: set, removed: set) -> bool:
+        """Tells whether a step of a plan can still be executed.
+
+        sources are the normalized names of the files renamed by the plan,
+        which free their names, and removed the new names it removes."""
+        files = self._folder_files()
+        target = os.path.normcase(step.target)
+        if target in files and target not in sources:
+            return False
+        if step.action == "copy":
+            member = self._archive_member(step.source)
+            if member is None:
+                if not os.path.isfile(step.source):
+                    return False
+            elif not member[0].has(member[1]):
+                return False
+        elif os.path.normcase(os.path.basename(step.source)) not in files:
+            return False
+        index = self._names_index()
+        if step.remove is not None and index.key(step.remove) is None:
+            return False
+        return (step.orig is None or index.key(step.target) is None
+                or target in removed)
+
     def load_names(self) -> Mapping[str, str]:
         """Load new and original names from a names.log file.
 
@@ -305,6 +818,10 @@ class Renamer:
                 the keys of the dict are the new names of the
                 renamed pictures and the values are the original names
 
+        A journal left by a journaled Renamer is replayed over the content
+        of names.log. For a SQLite ref_file, a SqliteNames mapping is
+        returned without loading anything.
+
         Raises:
             NamesLogException:
                 the attributes of the NamesLogException are the number
@@ -313,9 +830,18 @@ class Renamer:
         """
         if self.names is not None:
             return self.names
-
+        with self.stats.phase("load"):
+            return self._read_names()
+
+    def _read_names(self) -> Mapping[str, str]:
+        if is_sqlite(self.ref_file):
+            self.names = SqliteNames(os.path.join(self.folder,
+                                                  self.ref_file))
+            self._index = _SqliteIndex(self.names)
+            return self.names
         names = collections.OrderedDict()
         numlig = 0
+        line = "\n"
         try:
             with io.open(os.path.join(self.folder, self.ref_file),
                          encoding="utf-8") as fd:
@@ -328,24 +854,93 @@ class Renamer:
         except IndexError as e:
             raise NamesLogException(numlig,line).with_traceback(
                 sys.exc_info()[2]) from e
+        try:
+            replayed = self._get_journal().replay(names)
+        except ValueError as e:
+            raise NamesLogException(*e.args) from e
         self.names = names
-        self._target = set(self.names.keys())
-        self._orig = set(self.names.values())
+        self._index = _NameIndex(names)
+        # new names can be appended to a ref_file holding exactly names
+        synced = replayed == 0 and line.endswith("\n")
+        self._synced, self._appended = (names if synced else None), []
         return names
 
     def _save_names(self):
-        if not self.dummy:
-            file = os.path.join(self.folder, self.ref_file)
-            if len(self.names) == 0:
-                if os.path.exists(file):
-                    os.remove(file)
-            else:
-                with io.open(file, "w", encoding="utf-8") as fd:
-                    for name, old in self.names.items():
-                        fd.write("{}:{}\n".format(os.path.normcase(name),
-                                                  old))
-            self._target = set(self.names.keys())
-            self._orig = set(self.names.values())
+        with self.stats.phase("save"):
+            if isinstance(self.names, SqliteNames):
+                if not self.dummy and len(self.names) == 0:
+                    self.names.discard()
+                else:
+                    self.names.close()
+                return
+            if not self.dummy:
+                if not self.journal and self._synced is self.names:
+                    self._append_names()
+                    return
+                journal = self._get_journal()
+                if self.journal and not journal.needs_compaction(
+                        len(self.names)):
+                    journal.close()
+                    return
+                self._write_names()
+                journal.discard()
+
+    def _append_names(self):
+        """Append the names added since the text ref_file was read or
+        written, when none was removed."""
+        if self._appended:
+            with io.open(os.path.join(self.folder, self.ref_file), "a",
+                         encoding="utf-8") as fd:
+                for name, old in self._appended:
+                    fd.write("{}:{}\n".format(os.path.normcase(name), old))
+        self._appended = []
+
+    def _write_names(self):
+        """Rewrite the whole text ref_file from names."""
+        file = os.path.join(self.folder, self.ref_file)
+        if len(self.names) == 0:
+            if os.path.exists(file):
+                os.remove(file)
+        else:
+            # a journal is only discarded once the new file is complete
+            tmp = file + ".tmp" if self.journal else file
+            with io.open(tmp, "w", encoding="utf-8") as fd:
+                for name, old in self.names.items():
+                    fd.write("{}:{}\n".format(os.path.normcase(name),
+                                              old))
+            if tmp != file:
+                os.replace(tmp, file)
+        self._synced, self._appended = self.names, []
+
+    def _get_journal(self) -> NamesJournal:
+        if self._journal is None:
+            self._journal = NamesJournal(os.path.join(
+                self.folder, self.ref_file + ".journal"))
+        return self._journal
+
+    def _add_name(self, new: str, orig: str):
+        """Register a new name, and journal it in journaled mode."""
+        self._names_index().add(new, orig)
+        if self._plan is None and self._synced is self.names:
+            self._appended.append((new, orig))
+        self._journal_change(NamesJournal.add, new, orig)
+
+    def _remove_name(self, key: str) -> str:
+        """Forget a name and return its original name."""
+        orig = self._names_index().remove(key)
+        if self._plan is None:
+            self._synced = None
+        self._journal_change(NamesJournal.remove, key)
+        return orig
+
+    def _journal_change(self, record, *args):
+        """In journaled mode, make a change durable as soon as possible."""
+        if not self.journal or self._plan is not None:
+            return
+        if isinstance(self.names, SqliteNames):
+            self.names.commit()
+        else:
+            record(self._get_journal(), *args)
 
     def get_new_name(self, name: str) -> str:
         """Finds the final name of a picture if a file with that name
@@ -369,86 +964,590 @@ class Renamer:
         return self.get_new_file_name(name + self.ext_mask)
 
     def get_new_file_name(self, file: str) -> str:
-        old_names = set(os.path.normcase(name) for name in itertools.chain(
-            self.names.values(), self.names.keys()))
-        name, ext = file.split('.') if '.' in file else (file, '')
-        if ext != '':
-            ext = '.' + ext
+        """Same as get_new_name for a file name including its extension.
+
+        Existing files are searched in a snapshot of the folder taken once
+        per command, and the last suffix found for a name is remembered so
+        that the next search for the same name starts from there."""
+        old_names = self._names_index()
+        files = self._folder_files()
+        name, ext = os.path.splitext(file)
         norm_file = os.path.normcase(file)
-        if os.path.exists(os.path.join(self.folder, file)) \
-                or norm_file in old_names:
-            for i in range(ord("a"), ord("z") + 1):
-                n = name + chr(i) + ext
-                norm_file = os.path.normcase(n)
-                if not os.path.exists(os.path.join(self.folder, n)) \
-                        and norm_file not in old_names:
-                    return n
-            for i in range(ord("a"), ord("z") + 1):
-                for j in range(ord("a"), ord("z") + 1):
-                    n = name + chr(i) + chr(j) + ext
-                    norm_file = os.path.normcase(n)
-                    if not os.path.exists(os.path.join(self.folder, n)) \
-                            and norm_file not in old_names:
-                        return n
-            raise RuntimeError(_("Too many files for {}").format(
-                file))
-        return file
+        for i in range(self._free.get(norm_file, 0), len(_SUFFIXES)):
+            n = name + _SUFFIXES[i] + ext
+            norm = os.path.normcase(n)
+            if norm not in files and norm not in old_names:
+                self._free[norm_file] = i
+                if i > 0:
+                    self._event(progress.COLLISION, file)
+                return n
+        raise RuntimeError(_("Too many files for {}").format(
+            file))
+
+    def _folder_files(self) -> set:
+        """Return the normalized names of the files in folder.
+
+        The folder is scanned once per command, and the snapshot is then
+        kept in sync by _add_file and _remove_file."""
+        if self._files is None:
+            try:
+                self._files = set(os.path.normcase(entry.name)
+                                  for entry in os.scandir(self.folder))
+            except FileNotFoundError:
+                self._files = set()
+        return self._files
+
+    def _add_file(self, name: str):
+        self._folder_files().add(os.path.normcase(name))
+
+    def _remove_file(self, name: str):
+        """Remove a name from the snapshot and forget the suffix hints that
+        could have skipped it."""
+        norm = os.path.normcase(name)
+        self._folder_files().discard(norm)
+        base, ext = os.path.splitext(norm)
+        for i in range(3):
+            self._free.pop(base + ext, None)
+            if base[-1:].isalpha() and base[-1:].islower():
+                base = base[:-1]
+            else:
+                break
 
     def _process(self, names: Mapping[str, str], pictures: Iterable[str],
                  src_folder: str, file_action):
-        """Processing common to rename and merge."""
+        """Processing common to rename and merge.
+
+        The exif dates are read first (possibly in parallel), then the
+        files are processed one at a time in a deterministic order."""
+        if self.pool == "shard" and self.workers > 1:
+            self._process_sharded(pictures, src_folder, file_action)
+            return names
+        dates = self._read_dates(self._scan(pictures, src_folder))
+        reading, naming = self.stats.phase("read"), self.stats.phase("name")
+        while True:
+            with reading:
+                item = next(dates, None)
+            if item is None:
+                break
+            file, dat = item
+            with naming:
+                new_name = self._target_name(file, dat, file_action)
+                if new_name is not None:
+                    file_action(file, self.folder, new_name,
+                                os.path.basename(file))
+        return names
+
+    def _process_sharded(self, pictures: Iterable[str], src_folder: str,
+                         file_action):
+        """Version of _process for the "shard" pool.
+
+        The list of files is split into contiguous shards, and worker
+        processes read the exif dates of a shard and format its tentative
+        names (_name_shard), so that the parent is left with the glob of
+        the patterns and a single collision resolution pass. That pass
+        takes the results in the order of the files, and is the same as
+        the one of _process: the final names do not depend on the number
+        of workers. The exif cache is not used."""
+        files = []
+        with self.stats.phase("scan"):
+            for pict in pictures:
+                found = glob.glob(os.path.join(src_folder, pict))
+                if len(found) == 0 and not self._subfolder:
+                    self.log.warning(_("{} not found").format(pict))
+                files.extend(file for file in found if self._accepts(file))
+        # a few shards per worker balance the load
+        size = max(1, min(SHARD_SIZE, -(-len(files) // (4 * self.workers))))
+        shards = [files[i: i + size] for i in range(0, len(files), size)]
+        import concurrent.futures
+        with concurrent.futures.ProcessPoolExecutor(self.workers) as executor:
+            results = executor.map(_name_shard, shards,
+                                   itertools.repeat(self.dst_mask),
+                                   itertools.repeat(self.delta))
+            reading, naming = (self.stats.phase("read"),
+                               self.stats.phase("name"))
+            for shard in shards:
+                with reading:
+                    names = next(results)
+                for file, name in zip(shard, names):
+                    if name is False:
+                        if not self._subfolder:
+                            self._warn_dir(file)
+                        continue
+                    self._event(progress.SCANNED, file)
+                    if (self._digests is not None
+                            and self._duplicate_of(file) is not None):
+                        continue
+                    self._event(progress.READ, file)
+                    with naming:
+                        if name is None:
+                            self._event(progress.NO_DATE, file)
+                            continue
+                        new_name = self._free_name(file, name, file_action)
+                        if new_name is not None:
+                            file_action(file, self.folder, new_name,
+                                        os.path.basename(file))
+
+    def _target_name(self, file: str, dat: Optional[str],
+                     file_action) -> Optional[str]:
+        """Return the free name for a file having an exif stamp dat, or None
+        if the file is to be left alone."""
+        if dat is None:
+            self._event(progress.NO_DATE, file)
+            return None
+        if self._format is None or self._format.mask != self.dst_mask:
+            self._format = stamps.NameFormat(self.dst_mask)
+        return self._free_name(file, self._format(dat, self.delta),
+                               file_action)
+
+    def _free_name(self, file: str, new_name: str,
+                   file_action) -> Optional[str]:
+        """Return the free name for a file whose name built from its date
+        is new_name, or None if the file is to be left alone."""
+        rel = os.path.basename(file)
+        # special case: do not try to rename a file with
+        # its original name
+        if (os.path.normcase(new_name + self.ext_mask)
+                == os.path.normcase(rel)) and (
+                file_action == self._move):
+            return None
+        new_name = self.get_new_name(new_name)
+        if self.debug:
+            self.log.debug("%s -> %s", rel, new_name)
+        return new_name
+
+    def _scan(self, pictures: Iterable[str], src_folder: str) -> Iterator[str]:
+        """Expand the pictures patterns into the names of regular files."""
         for pict in pictures:
-            files = glob.glob(os.path.join(src_folder, pict))
-            if len(files) == 0:
-                self.log.warning(_("{} not found").format(pict))
-            else:
+            with self.stats.phase("scan"):
+                files = glob.glob(os.path.join(src_folder, pict))
+                if len(files) == 0:
+                    if not self._subfolder:
+                        self.log.warning(_("{} not found").format(pict))
+                regular = []
                 for file in files:
+                    if not self._accepts(file):
+                        continue
                     if os.path.isdir(file):
-                        self._warn_dir(file)
-                    else:  # it is a file: must be in folder
-                        rel = os.path.basename(file)
-                        dat = exif_dat(file)
-                        if dat is not None:
-                            dat += datetime.timedelta(minutes=self.delta)
-                            new_name = dat.strftime(self.dst_mask)
-                            # special case: do not try to rename a file with
-                            # its original name
-                            if (os.path.normcase(new_name + self.ext_mask)
-                                    == os.path.normcase(rel)) and (
-                                    file_action == self._move):
-                                continue
-                            new_name = self.get_new_name(
-                                dat.strftime(self.dst_mask))
-                            if self.debug:
-                                self.log.debug("%s -> %s", rel, new_name)
-                            if not self.dummy:
-                                file_action(file, self.folder, new_name, rel)
-        return names
+                        if not self._subfolder:
+                            self._warn_dir(file)
+                    else:
+                        regular.append(file)
+            for file in regular:
+                self._event(progress.SCANNED, file)
+                if (self._digests is None
+                        or self._duplicate_of(file) is None):
+                    yield file
+
+    def _accepts(self, file: str) -> bool:
+        """Tells whether a file passes the extension filters and is not a
+        file of the Renamer, else count it as skipped."""
+        name = os.path.basename(file)
+        include, exclude = self._filters
+        ext = os.path.splitext(name)[1].lower()
+        if (not self._own_file(name) and ext not in exclude
+                and (include is None or ext in include)):
+            return True
+        self._event(progress.SKIPPED, file)
+        return False
+
+    def _own_file(self, name: str) -> bool:
+        """Tells whether a file is one of the files written by the Renamer.
+        """
+        norm = os.path.normcase(name)
+        own = [self.ref_file, DIGEST_FILE] + ([] if self.cache_file is None
+                                              else [self.cache_file])
+        return (any(norm == os.path.normcase(file + suffix) for file in own
+                    for suffix in _SIDE_SUFFIXES)
+                or norm.endswith(".pyimgren.tmp")   # see batch.TEMP_FORMAT
+                or norm.endswith(".pyimgren.part"))  # see archive.Member
+
+    def _duplicate_of(self, file: str) -> Optional[str]:
+        """Return the file of folder, or the file already copied there,
+        having the same content as a file to merge, or None."""
+        with self.stats.phase("hash"):
+            try:
+                same = self._digests.find(file)
+            except OSError as e:
+                self.log.warning(_("Could not compare {file}").format(
+                    file=file), exc_info=e)
+                return None
+        if same is not None:
+            self._event(progress.DUPLICATE, file)
+            if self.debug:
+                self.log.debug("%s = %s", file, same)
+        return same
+
+    def _read_dates(self, files: Iterable[str]
+                    ) -> Iterator[Tuple[str, Optional[str]]]:
+        """Yield (file, exif stamp) pairs in the order of files.
+
+        If a cache_file is configured, only the files unknown to the cache
+        or modified since they were cached are actually read."""
+        cache = self._open_cache()
+        if cache is None:
+            yield from self._extract_dates(files)
+            return
+        with cache:
+            looked = []
+            for file in files:
+                st = os.stat(file)
+                looked.append((file, st, cache.get(file, st, raw=True)))
+            read = self._extract_dates(file for file, st, dat in looked
+                                       if dat is MISSING)
+            for file, st, dat in looked:
+                if dat is MISSING:
+                    dat = next(read)[1]
+                    cache.put(file, st, dat)
+                else:
+                    self._event(progress.CACHE_HIT, file)
+                yield file, dat
+
+    def _extract_dates(self, files: Iterable[str]
+                       ) -> Iterator[Tuple[str, Optional[str]]]:
+        """Yield (file, exif stamp) pairs in the order of files.
+
+        When more than one worker is requested, the dates are extracted by
+        a pool of threads or processes."""
+        if self.workers <= 1:
+            for file in files:
+                dat = exif_stamp(file)
+                self._event(progress.READ, file)
+                yield file, dat
+            return
+        import concurrent.futures
+        files = list(files)
+        if self.pool == "process":
+            executor = concurrent.futures.ProcessPoolExecutor(self.workers)
+            chunksize = max(1, len(files) // (4 * self.workers))
+        else:
+            executor = concurrent.futures.ThreadPoolExecutor(self.workers)
+            chunksize = 1
+        with executor:
+            for file, dat in zip(files, executor.map(exif_stamp, files,
+                                                     chunksize=chunksize)):
+                self._event(progress.READ, file)
+                yield file, dat
+
+    def _open_cache(self) -> Optional[ExifCache]:
+        """Open the exif cache if one is configured (read only in dry runs)
+        """
+        if self.cache_file is None:
+            return None
+        path = os.path.join(self.folder, self.cache_file)
+        if not self.dummy:
+            return ExifCache(path)
+        if os.path.exists(path):
+            return ExifCache(path, readonly=True)
+        return None
+
+    def clear_cache(self) -> None:
+        """Remove the exif cache file, if any."""
+        if self.cache_file is not None:
+            path = os.path.join(self.folder, self.cache_file)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _begin(self, delta: int, debug: bool, dummy: bool,
+               workers: int = 1, pool: str = "thread", profile: bool = False):
+        """Set the parameters of a command and forget any folder snapshot."""
+        _check_pool(pool)
+        self.delta, self.debug, self.dummy = delta, debug, dummy
+        self.workers, self.pool = workers, pool
+        self._filters = (None if self.include is None
+                         else _extensions(self.include),
+                         _extensions(self.exclude or ()))
+        self._files = None
+        self._free = {}
+        self.stats = Stats(samples=profile)
+        # a dry run computes a plan instead of changing files and names
+        self._plan = Plan(self.folder, self.ref_file) if dummy else None
 
     def _reset(self):
+        self.stats.stop()
         self.delta = 0
         self.debug = self.dummy = False
+        self.workers, self.pool = 1, "thread"
+        self.copy_mode = "copy"
+        if self._digests is not None:
+            self._digests.close()
+            self._digests = None
+        for reader in self._archives.values():
+            reader.close()
+        self._archives = {}
+        self._files = None
+        self._free = {}
+        if self._plan is not None:
+            self._last_plan = self._plan
+            self._plan = None
+        if isinstance(self._index, _PlannedIndex):
+            self._index = self._index.base
+
+    def _recurse(self, command: str, pictures: Iterable[str],
+                 workers: int = 1, pool: str = "thread",
+                 src_folder: Optional[str] = None, **kwargs):
+        """Run a command in each folder of a tree, with one Renamer (hence
+        one ref_file) per folder.
+
+        The tree (folder, or src_folder for merge) is walked lazily, and
+        up to workers folders are processed concurrently. An error in one
+        folder is logged and does not stop the other ones.
+
+        The stats of the folders are summed in self.stats. The progress
+        callback receives the events of each folder with the stats of that
+        folder, and is not called from a process pool. The "shard" pool
+        is a process pool here: the folders are the shards."""
+        _check_pool(pool)
+        self.stats = Stats(samples=kwargs.get("profile", False))
+        top = self.folder if src_folder is None else src_folder
+        exclude = () if src_folder is None else (self.folder,)
+        callback = (None if workers > 1 and pool != "thread"
+                    else self.progress)
+        jobs = (self._subfolder_job(command, pictures, top, folder,
+                                    src_folder, kwargs, callback)
+                for folder in walk_folders(top, exclude))
+        if workers <= 1:
+            for job in jobs:
+                self.stats.merge(_run_job(*job)[0])
+            self.stats.stop()
+            return
+        import concurrent.futures
+        executor_class = (concurrent.futures.ThreadPoolExecutor
+                          if pool == "thread"
+                          else concurrent.futures.ProcessPoolExecutor)
+        with executor_class(workers) as executor:
+            pending = collections.deque()
+            for job in jobs:
+                if len(pending) >= 2 * workers:   # bound the queued folders
+                    self.stats.merge(pending.popleft().result()[0])
+                pending.append(executor.submit(_run_job, *job))
+            for future in pending:
+                self.stats.merge(future.result()[0])
+        self.stats.stop()
+
+    def _subfolder_job(self, command: str, pictures: Iterable[str],
+                       top: str, folder: str, src_folder: Optional[str],
+                       kwargs: dict, callback=None) -> tuple:
+        """Build the arguments of _run_job for one folder of a tree."""
+        kwargs = dict(kwargs)
+        if src_folder is not None:      # merge: mirror the source tree
+            kwargs["src_folder"] = folder
+            folder = os.path.normpath(os.path.join(
+                self.folder, os.path.relpath(folder, top)))
+        ren = Renamer(folder, self.dst_mask, self.ext_mask, self.ref_file,
+                      self.cache_file, self.journal, self.include,
+                      self.exclude)
+        ren.log = self.log
+        ren.progress = callback
+        ren._subfolder = folder != os.path.normpath(self.folder)
+        return ren, command, tuple(pictures), kwargs
 
     def _warn_dir(self, file: str):
         self.log.warning(_("Merge cannot process %s: is a directory"), file)
 
 
+    def _names_index(self) -> _NameIndex:
+        """Return the index of self.names, rebuilt if names was replaced."""
+        if self._index is None or self._index.names is not self.names:
+            self._index = (_SqliteIndex(self.names)
+                           if isinstance(self.names, SqliteNames)
+                           else _NameIndex(self.names))
+        if self._plan is not None and not isinstance(self._index,
+                                                     _PlannedIndex):
+            self._index = _PlannedIndex(self._index)
+        return self._index
+
     def _move(self, file: str, folder: str, new_name: str, rel: str):
         """Simply rename a file (full path) in a directory (folder)."""
-        os.rename(file, os.path.join(folder, new_name))
-        new_rel = os.path.normcase(rel)
-        if new_rel in self._target:
-            new_rel = self.names[rel]
-            del self.names[rel]
-            rel = new_rel
-        elif new_rel in self._orig:
-            rel = self.get_new_file_name(rel)
-        self.names[new_name] = rel
-
-    def _copy(self, file: str, folder: str, new_name: str, rel: str):
-        shutil.copy(file, os.path.join(folder, new_name))
+        step = Step("move", file, new_name)
+        self._track(step)
+        index = self._names_index()
+        key = index.key(rel)
+        if key is not None:
+            step = step._replace(remove=key, orig=index.orig(key))
+        elif index.has_orig(os.path.normcase(rel)):
+            step = step._replace(orig=self.get_new_file_name(rel))
+        else:
+            step = step._replace(orig=rel)
+        self._run_step(step)
+
+    def _copy(self, file: str, folder: str, new_name: str, rel: str
+              ) -> bool:
+        """Copy a file to merge, unless it is a duplicate of a file copied
+        before (dedupe), in which case return False."""
+        if (self._digests is not None
+                and self._duplicate_of(file) is not None):
+            return False
+        step = Step("copy", file, new_name)
+        self._track(step)
         if os.path.normcase(new_name) != os.path.normcase(rel):
-            self.names[new_name] = self.get_new_file_name(rel)
+            step = step._replace(orig=self.get_new_file_name(rel))
+        self._run_step(step)
+        if self._digests is not None:
+            # only a copied (or planned) file hides the next identical ones
+            self._digests.add(file)
+        return True
+
+    def _run_step(self, step: Step):
+        """Execute a step, or add it to the plan of a dry run, and record
+        its changes to the names."""
+        if self._plan is None:
+            target = os.path.join(self.folder, step.target)
+            try:
+                if step.action == "copy":
+                    with self.stats.phase("copy"):
+                        self._copy_file(step.source, target)
+                    self._event(progress.COPIED, step.source)
+                else:
+                    with self.stats.phase("rename"):
+                        os.rename(step.source, target)
+                    self._event(progress.RENAMED, step.source)
+            except OSError:
+                self._event(progress.ERROR, step.source)
+                raise
+        else:
+            self._plan.append(step)
+        self._record(step)
+
+    def _copy_file(self, source: str, target: str):
+        """Copy a file, or a member of an archive (archive!member)."""
+        member = self._archive_member(source)
+        if member is None:
+            copy_file(source, target, self.copy_mode)
+        else:
+            member[0].member(member[1]).copy_to(target)
+
+    def _merge_archive(self, path: str, patterns: Iterable[str]):
+        """Merge the members of an archive matching patterns, in archive
+        order, each one being read once from its header to its copy."""
+        with self.stats.phase("scan"):
+            reader = self._archive(path)
+        unmatched = []
+        members = reader.members(patterns, unmatched, lambda name:
+                                 self._accepts(path + ARCHIVE_SEP + name))
+        while True:
+            with self.stats.phase("scan"):
+                member = next(members, None)
+            if member is None:
+                break
+            self._merge_member(path, member)
+        if not self._subfolder:
+            for pattern in unmatched:
+                self.log.warning(_("{} not found").format(pattern))
+
+    def _merge_member(self, path: str, member: Member) -> Optional[str]:
+        """Copy the current member of an archive to its new name and
+        return that name, or None if the member has no date."""
+        source = path + ARCHIVE_SEP + member.name
+        self._event(progress.SCANNED, source)
+        with self.stats.phase("read"):
+            try:
+                dat = member.stamp()
+            except exif.UndecidedError:
+                # the date is further in the member, or needs piexif
+                spooled = member.spool(None if self.dummy else self.folder)
+                try:
+                    dat = exif_stamp(spooled)
+                finally:
+                    if self.dummy:
+                        member.discard()
+        self._event(progress.READ, source)
+        with self.stats.phase("name"):
+            new_name = self._target_name(source, dat, self._copy)
+            if new_name is None:
+                return None
+            step = Step("copy", source, new_name,
+                        orig=os.path.basename(path) + ARCHIVE_SEP
+                        + member.name)
+            self._track(step)
+            self._run_step(step)
+        return new_name
+
+    def _archive(self, path: str) -> ArchiveReader:
+        """Return an archive, opened once per command."""
+        reader = self._archives.get(path)
+        if reader is None:
+            reader = self._archives[path] = ArchiveReader(path)
+        return reader
+
+    def _archive_member(self, source: str
+                        ) -> Optional[Tuple[ArchiveReader, str]]:
+        """Return the archive and the member name of an archive!member
+        source, or None for a plain file."""
+        if ARCHIVE_SEP not in source:
+            return None
+        for path, reader in self._archives.items():
+            if source.startswith(path + ARCHIVE_SEP):
+                return reader, source[len(path) + 1:]
+        parts = split_source(source)
+        if parts is None:
+            return None
+        return self._archive(parts[0]), parts[1]
+
+    def _event(self, event: str, file: Optional[str] = None):
+        """Count an event and report it to the progress callback."""
+        self.stats.counts[event] += 1
+        if self.progress is not None:
+            self.progress(event, file, self.stats)
+
+    def _record(self, step: Step):
+        """Record the changes of a step to the names."""
+        if step.remove is not None:
+            self._remove_name(step.remove)
+        if step.orig is not None:
+            self._add_name(step.target, step.orig)
+
+    def _batched(self, naming):
+        """Run the naming pass of a command as a dry run, then execute the
+        plan in one batch, unless the command is a real dry run."""
+        if self._plan is not None:
+            naming()
+            return
+        existing = set(self._folder_files())
+        self._plan = Plan(self.folder, self.ref_file, self.copy_mode)
+        try:
+            naming()
+        finally:
+            plan, self._plan = self._plan, None
+            if isinstance(self._index, _PlannedIndex):
+                self._index = self._index.base
+        self._run_batch(plan, existing)
+
+    def _run_batch(self, steps: Iterable[Step], existing: set):
+        """Execute steps, the renames being run in one conflict free batch.
+
+        existing are the normalized names of the files of the folder
+        before the steps."""
+        renames = []
+        for step in steps:
+            if step.action != "copy":
+                renames.append(step)
+                continue
+            try:
+                self._run_step(step)
+            except OSError as e:
+                self.log.warning(_("Could not copy {file} to {folder}").format(
+                    file=step.source, folder=self.folder), exc_info=e)
+        def done(i):
+            self._record(renames[i])
+            self._event(progress.RENAMED, renames[i].source)
+
+        with self.stats.phase("rename"):
+            errors = batch.rename_batch(
+                self.folder, [(os.path.basename(step.source), step.target)
+                              for step in renames], existing, done)
+        for step, error in zip(renames, errors):
+            if error is not None:
+                self._event(progress.ERROR, step.source)
+                self.log.warning(_("Could not rename {file} in {folder}",
+                                   ).format(file=os.path.basename(step.source),
+                                            folder=self.folder),
+                                 exc_info=error)
+
+    def _track(self, step: Step):
+        """Report the file changes of a step in the folder snapshot."""
+        if step.action != "copy":
+            self._remove_file(os.path.basename(step.source))
+        self._add_file(step.target)
 
     def _merge_filter(self, src_folder, files: Iterable[str]) -> Iterable[str]:
         def test_path(file, folder):
@@ -470,11 +1569,94 @@ class Renamer:
         return [file for file in pictures if test_path(file)]
 
 
+def walk_folders(top: str, exclude: Iterable[str] = ()) -> Iterator[str]:
+    """Lazily yield top and all its sub-folders.
+
+    The tree is walked depth first with os.scandir, in name order, without
+    following symbolic links. Folders in exclude (and their sub-folders)
+    are skipped, and unreadable folders are ignored.
+    """
+    excluded = set(os.path.normcase(os.path.realpath(folder))
+                   for folder in exclude)
+    pending = [top]
+    while pending:
+        folder = pending.pop()
+        yield folder
+        try:
+            with os.scandir(folder) as entries:
+                subs = sorted(entry.path for entry in entries
+                              if entry.is_dir(follow_symlinks=False))
+        except OSError:
+            continue
+        pending.extend(sub for sub in reversed(subs)
+                       if os.path.normcase(os.path.realpath(sub))
+                       not in excluded)
+
+
+def _run_job(ren: Renamer, command: str, pictures: tuple,
+             kwargs: dict) -> Tuple[Stats, Optional[str]]:
+    """Run a Renamer command in one folder of a tree (see Renamer._recurse)
+    or of a manifest (see manifest.run_jobs).
+
+    Returns:
+        tuple: the stats of the command, and None if it succeeded, else
+            the error that stopped it
+    """
+    try:
+        if command == "merge" and not kwargs.get("dummy"):
+            os.makedirs(ren.folder, exist_ok=True)
+        getattr(ren, command)(*pictures, **kwargs)
+    except Exception as e:
+        ren.log.warning(_("Could not process folder {}").format(ren.folder),
+                        exc_info=e)
+        ren.stats.counts[progress.ERROR] += 1
+        ren.stats.stop()
+        return ren.stats, "{}: {}".format(type(e).__name__, e)
+    return ren.stats, None
+
+
+def _check_pool(pool: str):
+    """Reject an unknown kind of workers."""
+    if pool not in POOLS:
+        raise ValueError(_("Unknown pool type {}").format(pool))
+
+
+def _extensions(values: Iterable[str]) -> frozenset:
+    """Normalize extensions given with or without their dot."""
+    return frozenset(("" if value.startswith(".") or not value else ".")
+                     + value.lower() for value in values)
+
+
+def _name_shard(files: list, dst_mask: str, delta: float) -> list:
+    """Compute the tentative names of a shard of files (see
+    Renamer._process_sharded) in a worker process.
+
+    Returns:
+        list: for each file, its name built from its exif date (without
+            extension and suffix), None if it has no date, or False if it
+            is a directory
+    """
+    fmt = stamps.NameFormat(dst_mask)
+    names = []
+    for file in files:
+        try:
+            stamp = exif_stamp(file)
+        except OSError:
+            if os.path.isdir(file):
+                names.append(False)
+                continue
+            raise
+        names.append(None if stamp is None else fmt(stamp, delta))
+    return names
+
+
 def exif_dat(file):
     """Extract the timestamp of a picture file from the exif tags.
 
-    This function is a wrapper around the piexif module to easily find the
-    date and time when the picture was taken. It first tries the time when
+    This function first tries to find the date and time when the picture
+    was taken by only reading the exif headers of a JPEG or TIFF based RAW
+    file (mapped in memory), and falls back to the piexif module for other
+    files. It first tries the time when
     the camera took the picture, then the time when the file was writen on
     the memory card.
     
@@ -486,13 +1668,39 @@ def exif_dat(file):
             the date when the picture was taken or stored by the camera found
             in the exif tag or None if no date could be found.
     """
+    stamp = exif_stamp(file)
+    if stamp is None: return None
+    return datetime.datetime.fromisoformat(stamp)
+
+
+def exif_stamp(file):
+    """Same as exif_dat, but the timestamp is returned as an ISO string
+    (see the stamps module) without building a datetime object.
+
+    Files that cannot hold exif data (videos, sidecars...) are rejected
+    from their first bytes (see exif.sniff), and never passed to piexif."""
     try:
-        exif = piexif.load(file)["Exif"]
+        with open(file, "rb") as fd:
+            if exif.sniff(fd.read(exif.SNIFF_SIZE)) is None:
+                return None
+            fd.seek(0)
+            dt = exif.file_timestamp(fd)
+    except exif.UndecidedError:
+        dt = _piexif_timestamp(file)
+    if dt is None: return None
+    return stamps.parse(dt)
+
+
+def _piexif_timestamp(file):
+    """Slow path of exif_dat: let piexif decode the whole file."""
+    import piexif       # only needed for files other than plain JPEG
+    try:
+        tags = piexif.load(file)
     except ValueError:
         return None
-    for i in (0x9003, 0x9004, 0x132):
-        dt = exif.get(i)
-        if dt is not None: break
-    if dt is None: return None
-    return datetime.datetime.strptime(dt.decode("ascii"),
-                                      "%Y:%m:%d %H:%M:%S")
+    for ifd, tag in (("Exif", exif.DATE_TIME_ORIGINAL),
+                     ("Exif", exif.DATE_TIME_DIGITIZED),
+                     ("0th", exif.DATE_TIME)):
+        dt = tags[ifd].get(tag)
+        if dt is not None: return dt
+    return None
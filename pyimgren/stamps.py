@@ -0,0 +1,244 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+"""Exif timestamps as strings, and the names built from them.
+
+Between the exif reader and the final name, a timestamp is kept as an ISO
+string ``"YYYY-MM-DDTHH:MM:SS"`` (a *stamp*, the format of the exif
+cache), so that no datetime object is created per file:
+
+* parse validates a raw exif value with a regular expression and integer
+  comparisons, and only falls back to strptime for values that are not in
+  the standard fixed width form
+* shift adds whole minutes with integer calendar arithmetic, the dates
+  being shifted once per batch of pictures taken the same day
+* NameFormat compiles a dst_mask made of the numeric directives %Y, %y,
+  %m, %d, %H, %M, %S and %% into a str.format template filled with slices
+  of the stamp. Other masks are passed to strftime. The same masks give
+  back the stamp of a name (stamp_of), to select names by date.
+"""
+
+import datetime
+import functools
+import re
+from typing import Optional, Union
+
+from .i18n import _
+
+_DAYS = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+# where the fields are in a stamp, for the directives handled by NameFormat
+_FIELDS = {"Y": (0, 4), "m": (5, 7), "d": (8, 10), "H": (11, 13),
+           "M": (14, 16), "S": (17, 19), "y": (2, 4)}
+# regular expressions of the same directives, to read them back in names
+_GROUPS = {"Y": "([0-9]{4})", "y": "([0-9]{2})"}
+_DIRECTIVE = re.compile("%(.?)", re.DOTALL)
+_BOUND = re.compile(r"[0-9]{4}(-[0-9]{2}(-[0-9]{2}([T ][0-9]{2}"
+                    r"(:[0-9]{2}(:[0-9]{2})?)?)?)?)?")
+# "THH:MM" for each minute of a day
+_TIMES = ["T{:02d}:{:02d}".format(*divmod(minute, 60))
+          for minute in range(1440)]
+_RAW = re.compile(rb"([0-9]{4}):([0-9]{2}):([0-9]{2}) "
+                  rb"([0-9]{2}):([0-9]{2}):([0-9]{2})")
+
+
+def parse(raw: bytes) -> Optional[str]:
+    """Convert a raw exif timestamp into a stamp.
+
+    Parameters:
+        raw: an exif date value, normally ``b"YYYY:MM:DD HH:MM:SS"``
+
+    Returns:
+        str:
+            the stamp, or None if raw is not a valid date
+    """
+    match = _RAW.fullmatch(raw)
+    if match is not None:
+        year, month, day, hour, minute, second = map(int, match.groups())
+        if (year >= 1 and 1 <= month <= 12
+                and 1 <= day <= _month_days(year, month)
+                and hour < 24 and minute < 60 and second < 60):
+            return "{}-{}-{}T{}:{}:{}".format(
+                *[group.decode("ascii") for group in match.groups()])
+        return None
+    # unusual form (no padding, extra spaces...): let strptime decide
+    try:
+        return datetime.datetime.strptime(
+            raw.decode("ascii"), "%Y:%m:%d %H:%M:%S").isoformat()
+    except ValueError:
+        return None
+
+
+def bound(value: Union[str, datetime.date]) -> str:
+    """Convert a limit of a date range into a stamp prefix.
+
+    Parameters:
+        value: a date or datetime, or a prefix of an ISO date such as
+               ``"2023"``, ``"2023-05"`` or ``"2023-05-12 10:00"``
+
+    Raises:
+        ValueError:
+            if value is not a date or a prefix of an ISO date
+    """
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, str) and _BOUND.fullmatch(value):
+        return value.replace(" ", "T")
+    raise ValueError(_("Invalid date {}").format(value))
+
+
+def in_range(stamp: str, since: Optional[str], until: Optional[str]
+             ) -> bool:
+    """Tells whether a stamp is between two bounds (as given by bound),
+    both included: until="2023-05" includes the whole month of May."""
+    return ((since is None or stamp >= since)
+            and (until is None or stamp[:len(until)] <= until))
+
+
+def shift(stamp: str, minutes: float) -> str:
+    """Add a number of minutes to a stamp.
+
+    A fractional number of minutes (``-x 0.5`` on the command line) goes
+    through a timedelta, the seconds being truncated as strftime does.
+
+    Raises:
+        OverflowError:
+            if the result is not between years 1 and 9999
+    """
+    if minutes == 0:
+        return stamp
+    if minutes != int(minutes):
+        return (datetime.datetime.fromisoformat(stamp)
+                + datetime.timedelta(minutes=minutes)
+                ).isoformat(timespec="seconds")
+    minutes = int(minutes)
+    days, minute = divmod(int(stamp[11:13]) * 60 + int(stamp[14:16])
+                          + minutes, 1440)
+    return _shift_date(stamp[:10], days) + _TIMES[minute] + stamp[16:]
+
+
+class NameFormat:
+    """A dst_mask compiled for stamps.
+
+    Parameters:
+        mask: a strftime format
+
+    A NameFormat is called with a stamp and a number of minutes to add,
+    and returns the same string as strftime(mask) on the shifted date.
+    """
+
+    def __init__(self, mask: str):
+        self.mask = mask
+        self._slices = []
+        self._directives = []
+        self._template = self._name_regex = None
+        parts, regex = [], []
+        pos = 0
+        for match in _DIRECTIVE.finditer(mask):
+            parts.append(_escape(mask[pos:match.start()]))
+            regex.append(re.escape(mask[pos:match.start()]))
+            directive = match.group(1)
+            if directive == "%":
+                parts.append("%")
+                regex.append("%")
+            elif directive in _FIELDS:
+                parts.append("{%d}" % len(self._slices))
+                self._slices.append(_FIELDS[directive])
+                self._directives.append(directive)
+                regex.append(_GROUPS.get(directive, "([0-9]{2})"))
+            else:                   # left to strftime
+                return
+            pos = match.end()
+        parts.append(_escape(mask[pos:]))
+        regex.append(re.escape(mask[pos:]))
+        self._template = "".join(parts)
+        if "Y" in self._directives or "y" in self._directives:
+            self._name_regex = re.compile("".join(regex), re.IGNORECASE)
+
+    @property
+    def compiled(self) -> bool:
+        """True if the mask does not need strftime."""
+        return self._template is not None
+
+    def __call__(self, stamp: str, minutes: float = 0) -> str:
+        stamp = shift(stamp, minutes)
+        # strftime does not pad the years before 1000 on every platform
+        if self._template is None or stamp[0] == "0":
+            return datetime.datetime.fromisoformat(stamp).strftime(self.mask)
+        return self._template.format(*[stamp[start:end]
+                                       for start, end in self._slices])
+
+    def stamp_of(self, name: str) -> Optional[str]:
+        """Return the stamp of a name built with the mask (possibly
+        followed by a suffix and an extension), or None if the name does
+        not match the mask.
+
+        The fields missing from the mask are taken as the start of their
+        period (first day of the month, midnight...). Two digit years are
+        read as strptime does (69-99 are 1969-1999).
+
+        Raises:
+            ValueError:
+                if the mask has no numeric year directive, or directives
+                that NameFormat cannot read back
+        """
+        if self._name_regex is None:
+            raise ValueError(_("Cannot read dates from names built with {}"
+                               ).format(self.mask))
+        match = self._name_regex.match(name)
+        if match is None:
+            return None
+        fields = {}
+        for directive, value in zip(self._directives, match.groups()):
+            if directive == "y":
+                directive, value = "Y", ("19" if value >= "69" else "20"
+                                         ) + value
+            fields.setdefault(directive, value)
+        return "{Y}-{m}-{d}T{H}:{M}:{S}".format(**dict(
+            {"m": "01", "d": "01", "H": "00", "M": "00", "S": "00"},
+            **fields))
+
+
+@functools.lru_cache(maxsize=4096)
+def _shift_date(date: str, days: int) -> str:
+    """Add days to a "YYYY-MM-DD" date (the pictures of a batch share few
+    dates, hence the cache)."""
+    if days == 0:
+        return date
+    year, month, day = _civil(_days(int(date[0:4]), int(date[5:7]),
+                                    int(date[8:10])) + days)
+    if not 1 <= year <= 9999:
+        raise OverflowError("date value out of range")
+    return "{:04d}-{:02d}-{:02d}".format(year, month, day)
+
+
+def _escape(text: str) -> str:
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+def _month_days(year: int, month: int) -> int:
+    if month == 2 and year % 4 == 0 and (year % 100 != 0
+                                         or year % 400 == 0):
+        return 29
+    return _DAYS[month - 1]
+
+
+def _days(year: int, month: int, day: int) -> int:
+    """Number of days since 1970-01-01 (proleptic Gregorian calendar)."""
+    year -= month <= 2
+    era = year // 400
+    yoe = year - era * 400
+    doy = (153 * (month + (-3 if month > 2 else 9)) + 2) // 5 + day - 1
+    return era * 146097 + yoe * 365 + yoe // 4 - yoe // 100 + doy - 719468
+
+
+def _civil(days: int):
+    """Inverse of _days: (year, month, day) of a number of days."""
+    days += 719468
+    era = days // 146097
+    doe = days - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    day = doy - (153 * mp + 2) // 5 + 1
+    month = mp + (3 if mp < 10 else -9)
+    return yoe + era * 400 + (month <= 2), month, day
@@ -0,0 +1,242 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+"""Watch mode: rename the new pictures of folders as they arrive.
+
+A Watcher keeps one Renamer per folder alive, with its names loaded once,
+and renames the new files matching its patterns:
+
+* new files are detected with inotify on Linux, or by periodically
+  scanning the folders elsewhere (or when inotify is not available)
+* a file is only processed once its size and modification time have not
+  changed for settle seconds, so that files still being copied are left
+  alone
+* the new names are appended to the ref_file instead of rewriting it
+
+Example::
+
+    watcher = Watcher(["/drop/camera1", "/drop/camera2"], ["*.jpg"])
+    watcher.run()       # until watcher.stop() or KeyboardInterrupt
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import fnmatch
+import glob
+import os
+import select
+import struct
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .i18n import _
+from .renamer import Renamer
+
+# inotify constants (from <sys/inotify.h>)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT = struct.Struct("iIII")      # wd, mask, cookie, len
+
+
+class Watcher:
+    """Rename the new pictures of one or more folders.
+
+    Parameters:
+        folders : the folders to watch, or Renamer objects for them
+        patterns: fnmatch patterns of the file names to process
+        settle  : number of seconds a file must remain unchanged before
+                  being renamed (default 2)
+        interval: number of seconds between two scans when polling
+                  (default 1)
+        poll    : if True, always poll instead of using inotify
+        existing: if True (the default), the files already present when
+                  the watch starts are also processed
+        kwargs  : parameters of Renamer.rename (delta, debug, dummy)
+
+    Attributes:
+        renamers: the Renamer of each folder
+        inotify : True if inotify is used, False if the folders are polled
+    """
+
+    def __init__(self, folders: Iterable, patterns: Iterable[str] = ("*",),
+                 settle: float = 2.0, interval: float = 1.0,
+                 poll: bool = False, existing: bool = True, **kwargs):
+        self.renamers: List[Renamer] = [
+            folder if isinstance(folder, Renamer) else Renamer(folder)
+            for folder in folders]
+        self.patterns = list(patterns)
+        self.settle, self.interval, self.kwargs = settle, interval, kwargs
+        # pending[(renamer index, name)] = (size, mtime, unchanged since)
+        self._pending: Dict[Tuple[int, str], Tuple[int, int, float]] = {}
+        self._seen: List[Set[str]] = [set() for _ren in self.renamers]
+        self._stopped = False
+        self._inotify = None if poll else _Inotify.open()
+        self.inotify = self._inotify is not None
+        self._wds = {}
+        for i, ren in enumerate(self.renamers):
+            ren.load_names()        # and keep them loaded from now on
+            if self._inotify is not None:
+                self._wds[self._inotify.add_watch(ren.folder)] = i
+            files = self._scan(i)
+            if existing:
+                for name in files:
+                    self._candidate(i, name)
+            self._seen[i] = files
+
+    def run(self, duration: Optional[float] = None):
+        """Watch until stop is called (or for duration seconds)."""
+        end = None if duration is None else time.monotonic() + duration
+        self._stopped = False
+        while not self._stopped:
+            timeout = self.interval
+            if end is not None:
+                timeout = min(timeout, end - time.monotonic())
+                if timeout <= 0:
+                    break
+            self.step(timeout)
+
+    def stop(self):
+        """Ask run to return (can be called from another thread)."""
+        self._stopped = True
+
+    def close(self):
+        """Release the inotify file descriptor."""
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def step(self, timeout: float = 0.0) -> int:
+        """Wait up to timeout seconds for changes, then rename the files
+        that have settled. Returns the number of files passed to rename."""
+        if self._pending:
+            timeout = min(timeout, self.settle)
+        if self._inotify is not None:
+            names = self._inotify.read(timeout)
+            if names is None:            # the event queue overflowed
+                self._rescan()
+            else:
+                for wd, name in names:
+                    if wd in self._wds:
+                        self._candidate(self._wds[wd], name)
+        else:
+            if timeout > 0:
+                time.sleep(timeout)
+            self._rescan()
+        return self._process_settled()
+
+    def _rescan(self):
+        for i in range(len(self.renamers)):
+            files = self._scan(i)
+            for name in files - self._seen[i]:
+                self._candidate(i, name)
+            self._seen[i] = files
+
+    def _scan(self, i: int) -> Set[str]:
+        try:
+            return set(entry.name for entry in os.scandir(
+                self.renamers[i].folder) if entry.is_file())
+        except FileNotFoundError:
+            return set()
+
+    def _candidate(self, i: int, name: str):
+        """Start watching a new file, unless it is not a picture to rename.
+        """
+        ren = self.renamers[i]
+        if not any(fnmatch.fnmatch(name, pattern)
+                   for pattern in self.patterns):
+            return
+        if ren._own_file(name):
+            return
+        if ren._names_index().key(name) is not None:
+            return              # already renamed
+        self._pending[(i, name)] = (-1, -1, time.monotonic())
+
+    def _process_settled(self) -> int:
+        now = time.monotonic()
+        ready: Dict[int, List[str]] = {}
+        for key, (size, mtime, since) in list(self._pending.items()):
+            i, name = key
+            try:
+                st = os.stat(os.path.join(self.renamers[i].folder, name))
+            except FileNotFoundError:
+                del self._pending[key]
+                continue
+            if (st.st_size, st.st_mtime_ns) != (size, mtime):
+                self._pending[key] = (st.st_size, st.st_mtime_ns, now)
+            elif now - since >= self.settle:
+                del self._pending[key]
+                ready.setdefault(i, []).append(name)
+        count = 0
+        for i, names in ready.items():
+            ren = self.renamers[i]
+            try:
+                ren.rename(*sorted(glob.escape(name) for name in names),
+                           **self.kwargs)
+            except Exception as e:
+                ren.log.warning(_("Could not process folder {}").format(
+                    ren.folder), exc_info=e)
+            count += len(names)
+        return count
+
+
+class _Inotify:
+    """Minimal inotify binding through ctypes."""
+
+    def __init__(self, libc, fd: int):
+        self._libc, self.fd = libc, fd
+
+    @classmethod
+    def open(cls) -> Optional["_Inotify"]:
+        """Return an _Inotify, or None where inotify is not available."""
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            init = libc.inotify_init1
+        except (OSError, AttributeError, TypeError):
+            return None
+        fd = init(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return None
+        return cls(libc, fd)
+
+    def add_watch(self, folder: str) -> int:
+        wd = self._libc.inotify_add_watch(
+            self.fd, os.fsencode(folder),
+            IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), folder)
+        return wd
+
+    def read(self, timeout: float) -> Optional[List[Tuple[int, str]]]:
+        """Wait up to timeout seconds for events and return the (watch
+        descriptor, file name) pairs, or None if events were lost."""
+        if not select.select([self.fd], [], [], max(timeout, 0))[0]:
+            return []
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return events
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                raise
+            pos = 0
+            while pos < len(data):
+                wd, mask, _cookie, size = _EVENT.unpack_from(data, pos)
+                pos += _EVENT.size
+                name = data[pos:pos + size].rstrip(b"\0")
+                pos += size
+                if mask & IN_Q_OVERFLOW:
+                    return None
+                if name:
+                    events.append((wd, os.fsdecode(name)))
+
+    def close(self):
+        os.close(self.fd)
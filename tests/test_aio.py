@@ -0,0 +1,111 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+
+import asyncio
+import datetime
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import unittest.mock as mock
+
+import pyimgren
+from pyimgren.aio import AsyncRenamer
+
+
+class AsyncRenamerTest(unittest.IsolatedAsyncioTestCase):
+    """Tests for the coroutine commands of AsyncRenamer"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        src = os.path.join(os.path.dirname(__file__), "DSCF9762.JPG")
+        self.files = ["DSCF{:04d}.JPG".format(i) for i in range(5)]
+        for name in self.files:
+            shutil.copyfile(src, os.path.join(self.tmp.name, name))
+
+    async def test_rename_back(self):
+        """arename gives the same names as rename and aback reverts them"""
+        ren = AsyncRenamer(self.tmp.name, concurrency=2)
+        done = []
+        await ren.arename("*.JPG", progress=lambda *args: done.append(args))
+        expected = ["20180829_152420" + s + ".jpg" for s in ("", "a", "b",
+                                                            "c", "d")]
+        self.assertEqual(expected, [new for _old, new in done])
+        self.assertEqual(self.files, sorted(old for old, _new in done))
+        self.assertEqual(expected + ["names.log"],
+                         sorted(os.listdir(self.tmp.name)))
+        self.assertEqual(dict((new, old) for old, new in done), dict(
+            pyimgren.Renamer(self.tmp.name).load_names()))
+        await ren.aback()
+        self.assertEqual(self.files, sorted(os.listdir(self.tmp.name)))
+
+    async def test_merge_cache(self):
+        """amerge copies the files and fills the exif cache"""
+        dst = os.path.join(self.tmp.name, "dst")
+        os.mkdir(dst)
+        ren = AsyncRenamer(dst, cache_file="names.cache")
+        await ren.amerge("*.JPG", src_folder=self.tmp.name)
+        self.assertEqual(7, len(os.listdir(dst)))
+        self.assertEqual(self.files, sorted(ren.load_names().values()))
+        with pyimgren.cache.ExifCache(os.path.join(dst, "names.cache")) as c:
+            st = os.stat(os.path.join(self.tmp.name, self.files[0]))
+            self.assertEqual(datetime.datetime(2018, 8, 29, 15, 24, 20),
+                             c.get(os.path.join(self.tmp.name, self.files[0]),
+                                   st))
+
+    async def test_dummy(self):
+        """Nothing is changed in a dry run"""
+        ren = AsyncRenamer(self.tmp.name)
+        done = []
+        await ren.arename("*.JPG", dummy=True,
+                          progress=lambda *args: done.append(args))
+        self.assertEqual(5, len(done))
+        self.assertEqual(self.files, sorted(os.listdir(self.tmp.name)))
+
+    async def test_bounded_reads(self):
+        """No more than concurrency exif reads run at the same time"""
+        lock = threading.Lock()
+        current = peak = 0
+
+        def slow_dat(file):
+            nonlocal current, peak
+            with lock:
+                current += 1
+                peak = max(peak, current)
+            time.sleep(0.02)
+            with lock:
+                current -= 1
+            return None
+
+        ren = AsyncRenamer(self.tmp.name, concurrency=2)
+        with mock.patch("pyimgren.aio.exif_stamp", side_effect=slow_dat):
+            await ren.arename("*.JPG")
+        self.assertEqual(2, peak)
+
+    async def test_cancel(self):
+        """A cancelled command keeps the names of the files already renamed
+        """
+        ren = AsyncRenamer(self.tmp.name, concurrency=1)
+        task = None
+        done = []
+
+        def progress(old, new):
+            done.append((new, old))
+            task.cancel()
+
+        task = asyncio.ensure_future(ren.arename("*.JPG", progress=progress))
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        names = pyimgren.Renamer(self.tmp.name).load_names()
+        self.assertEqual(dict(done), dict(names))
+        self.assertEqual(1, len(names))
+        self.assertEqual(0, ren.delta)
+        self.assertIsNone(ren._files)
+
+    async def test_wrong_copy_mode(self):
+        with self.assertRaises(ValueError):
+            await AsyncRenamer(self.tmp.name).amerge("*", copy_mode="cow")
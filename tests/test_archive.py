@@ -0,0 +1,179 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+
+import io
+import os
+import tarfile
+import tempfile
+import unittest
+import zipfile
+
+from pyimgren import Renamer, archive, progress
+from pyimgren.aio import AsyncRenamer
+
+from .test_exif_dat import make_tiff
+
+JPG = os.path.join(os.path.dirname(__file__), "DSCF9762.JPG")
+
+
+class ArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.dst = os.path.join(self.tmp.name, "dst")
+        os.mkdir(self.dst)
+        with open(JPG, "rb") as fd:
+            self.jpg = fd.read()
+        self.members = [("DCIM/100/IMG_1.JPG", self.jpg),
+                        ("DCIM/100/IMG_2.JPG", self.jpg),
+                        ("DCIM/100/notes.txt", b"foo"),
+                        # date after the header read from each member
+                        ("DCIM/100/RAW_1.NEF",
+                         make_tiff(image=2 * archive.HEADER))]
+
+    def make_zip(self, name="card.zip"):
+        path = os.path.join(self.tmp.name, name)
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("DCIM/100/", b"")
+            for member, data in self.members:
+                zf.writestr(member, data)
+        return path
+
+    def make_tar(self, name="card.tar.gz"):
+        path = os.path.join(self.tmp.name, name)
+        with tarfile.open(path, "w:gz") as tf:
+            for member, data in self.members:
+                info = tarfile.TarInfo(member)
+                info.size = len(data)
+                tf.addfile(info, io.BytesIO(data))
+        return path
+
+    def pictures(self):
+        return sorted(name for name in os.listdir(self.dst)
+                      if name != "names.log")
+
+    def test_helpers(self):
+        path = self.make_zip()
+        self.assertTrue(archive.is_archive(path))
+        self.assertFalse(archive.is_archive(JPG))
+        self.assertFalse(archive.is_archive(self.tmp.name))
+        self.assertEqual((path, "DCIM/100/IMG_1.JPG"), archive.split_source(
+            path + "!DCIM/100/IMG_1.JPG"))
+        self.assertIsNone(archive.split_source(JPG + "!foo"))
+        self.assertEqual("IMG_1.JPG",
+                         archive.member_name("card.zip!DCIM/100/IMG_1.JPG"))
+        self.assertIsNone(archive.member_name("wow!.jpg"))
+
+    def test_copy_existing(self):
+        """A member never overwrites a file, whether spooled or not"""
+        target = os.path.join(self.dst, "x.JPG")
+        for spool in (False, True):
+            with self.subTest(spool=spool):
+                with open(target, "wb") as fd:
+                    fd.write(b"old")
+                member = archive.Member("x.JPG", len(self.jpg),
+                                        io.BytesIO(self.jpg))
+                if spool:
+                    member.spool(self.dst)
+                with self.assertRaises(FileExistsError):
+                    member.copy_to(target)
+                member.close()
+                with open(target, "rb") as fd:
+                    self.assertEqual(b"old", fd.read())
+                self.assertEqual(["x.JPG"], os.listdir(self.dst))
+
+    def test_merge(self):
+        """Members are copied to their names, with archive!member as the
+        original name"""
+        for path in (self.make_zip(), self.make_tar()):
+            with self.subTest(path=path):
+                for name in os.listdir(self.dst):
+                    os.remove(os.path.join(self.dst, name))
+                ren = Renamer(self.dst)
+                ren.merge("*.JPG", "*.NEF", "*.png", src_folder=path)
+                self.assertEqual(["20180829_152420.jpg",
+                                  "20180829_152420a.jpg",
+                                  "20210304_050607.jpg"], self.pictures())
+                with open(os.path.join(self.dst, "20180829_152420a.jpg"),
+                          "rb") as fd:
+                    self.assertEqual(self.jpg, fd.read())
+                base = os.path.basename(path)
+                self.assertEqual(base + "!DCIM/100/IMG_2.JPG",
+                                 ren.names["20180829_152420a.jpg"])
+                self.assertEqual(3, ren.stats.counts[progress.COPIED])
+
+    def test_back(self):
+        """A merged member is renamed back to the name of the member"""
+        ren = Renamer(self.dst)
+        ren.merge("*/IMG_1.JPG", src_folder=self.make_zip())
+        ren.back()
+        self.assertEqual(["IMG_1.JPG"], self.pictures())
+
+    def test_back_same_names(self):
+        """Members of the same name in two folders go back to free names"""
+        self.members = [("DCIM/100/IMG_1.JPG", self.jpg),
+                        ("DCIM/101/IMG_1.JPG", self.jpg)]
+        ren = Renamer(self.dst)
+        ren.merge("*.JPG", src_folder=self.make_zip())
+        ren.merge("*.JPG", src_folder=self.make_zip("other.zip"))
+        self.assertEqual(4, len(self.pictures()))
+        ren.back()
+        self.assertEqual(["IMG_1.JPG", "IMG_1a.JPG", "IMG_1b.JPG",
+                          "IMG_1c.JPG"], self.pictures())
+        self.assertEqual({}, dict(ren.names))
+
+    def test_back_dots(self):
+        """A member name may have several dots"""
+        self.members = [("DCIM/IMG.0001.JPG", self.jpg),
+                        ("DCIM/100/IMG.0001.JPG", self.jpg)]
+        ren = Renamer(self.dst)
+        ren.merge("*.JPG", src_folder=self.make_zip())
+        ren.back()
+        self.assertEqual(["IMG.0001.JPG", "IMG.0001a.JPG"], self.pictures())
+
+    def test_plan(self):
+        """A dry run writes nothing, and its plan is applied later"""
+        path = self.make_tar()
+        ren = Renamer(self.dst)
+        plan = ren.plan("merge", "*.JPG", "*.NEF", src_folder=path)
+        self.assertEqual([], os.listdir(self.dst))
+        self.assertEqual(path + "!DCIM/100/IMG_1.JPG", plan.steps[0].source)
+        ren.apply(plan)
+        self.assertEqual(["20180829_152420.jpg", "20180829_152420a.jpg",
+                          "20210304_050607.jpg"], self.pictures())
+
+    def test_recursive(self):
+        with self.assertRaises(ValueError):
+            Renamer(self.dst).merge("*.JPG", src_folder=self.make_zip(),
+                                    recursive=True)
+
+
+class AsyncArchiveTest(unittest.IsolatedAsyncioTestCase):
+    async def test_amerge(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "card.zip")
+            with zipfile.ZipFile(path, "w") as zf:
+                zf.write(JPG, "DCIM/DSCF9762.JPG")
+            done = []
+            ren = AsyncRenamer(tmp)
+            await ren.amerge("*.JPG", src_folder=path,
+                             progress=lambda old, new: done.append((old, new)))
+            self.assertEqual([("DCIM/DSCF9762.JPG", "20180829_152420.jpg")],
+                             done)
+            self.assertTrue(os.path.exists(os.path.join(
+                tmp, "20180829_152420.jpg")))
+
+    async def test_amerge_filters(self):
+        """The extension filters apply to the members"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "card.zip")
+            with zipfile.ZipFile(path, "w") as zf:
+                zf.write(JPG, "DCIM/DSCF9762.JPG")
+                zf.write(JPG, "DCIM/DSCF9762.JPEG")
+                zf.writestr("DCIM/notes.txt", b"foo")
+            ren = AsyncRenamer(tmp, exclude=["jpeg"])
+            await ren.amerge("*", src_folder=path)
+            self.assertEqual(["20180829_152420.jpg", "card.zip", "names.log"],
+                             sorted(os.listdir(tmp)))
+            self.assertEqual(1, ren.stats.counts[progress.SKIPPED])
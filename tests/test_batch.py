@@ -0,0 +1,143 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+
+import io
+import os
+import tempfile
+import unittest
+import unittest.mock as mock
+
+from pyimgren import Renamer
+from pyimgren.batch import order_renames, rename_batch
+
+
+class OrderTest(unittest.TestCase):
+    """Tests for the ordering of renames"""
+
+    def test_independent(self):
+        """Independent renames keep their order"""
+        self.assertEqual([("a", "x", 0), ("b", "y", 1)],
+                         order_renames([("a", "x"), ("b", "y")]))
+
+    def test_chain(self):
+        """A file is renamed after the one holding its target"""
+        self.assertEqual([("b", "c", 1), ("a", "b", 0)],
+                         order_renames([("a", "b"), ("b", "c")]))
+
+    def test_cycle(self):
+        """A cycle goes through a temporary name"""
+        order = order_renames([("a", "b"), ("b", "c"), ("c", "a")],
+                              existing={"a", "b", "c"})
+        tmp = order[0][1]
+        self.assertEqual([("a", tmp, None), ("c", "a", 2), ("b", "c", 1),
+                          (tmp, "b", 0)], order)
+
+    def test_duplicates(self):
+        with self.assertRaises(ValueError):
+            order_renames([("a", "x"), ("b", "x")])
+        with self.assertRaises(ValueError):
+            order_renames([("a", "x"), ("a", "y")])
+
+
+class BatchTest(unittest.TestCase):
+    """Tests for the execution of a batch of renames"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        for name in "abc":
+            self.write(name, name)
+
+    def write(self, name, content):
+        with io.open(os.path.join(self.tmp.name, name), "w") as fd:
+            fd.write(content)
+
+    def read(self, name):
+        with io.open(os.path.join(self.tmp.name, name)) as fd:
+            return fd.read()
+
+    def test_swap(self):
+        """Two files can exchange their names"""
+        done = []
+        self.assertEqual([None, None], rename_batch(
+            self.tmp.name, [("a", "b"), ("b", "a")], {"a", "b", "c"},
+            done.append))
+        self.assertEqual("b", self.read("a"))
+        self.assertEqual("a", self.read("b"))
+        self.assertEqual([1, 0], done)
+        self.assertEqual(["a", "b", "c"], sorted(os.listdir(self.tmp.name)))
+
+    def test_existing(self):
+        """A file outside of the batch is never overwritten"""
+        errors = rename_batch(self.tmp.name, [("a", "c"), ("b", "a")],
+                              {"a", "b", "c"})
+        self.assertIsInstance(errors[0], FileExistsError)
+        self.assertIsInstance(errors[1], FileExistsError)
+        self.assertEqual("a", self.read("a"))
+        self.assertEqual("c", self.read("c"))
+
+    def test_duplicate_target(self):
+        """Only the second rename to the same target fails"""
+        done = []
+        errors = rename_batch(self.tmp.name, [("a", "x"), ("b", "x"),
+                                              ("c", "b")],
+                              {"a", "b", "c"}, done.append)
+        self.assertIsNone(errors[0])
+        self.assertIsInstance(errors[1], FileExistsError)
+        self.assertIsInstance(errors[2], FileExistsError)
+        self.assertEqual([0], done)
+        self.assertEqual("a", self.read("x"))
+        self.assertEqual("b", self.read("b"))
+        self.assertEqual(["b", "c", "x"], sorted(os.listdir(self.tmp.name)))
+
+    def test_failure(self):
+        """A failed rename puts back the file of a broken cycle"""
+        real = os.rename
+
+        def rename(src, dst, **kwargs):
+            if (os.path.basename(str(src)), os.path.basename(str(dst))) == (
+                    "b", "a"):
+                raise PermissionError(dst)
+            real(src, dst, **kwargs)
+
+        with mock.patch("os.rename", side_effect=rename):
+            errors = rename_batch(self.tmp.name, [("a", "b"), ("b", "a")],
+                                  {"a", "b", "c"})
+        self.assertIsInstance(errors[1], PermissionError)
+        self.assertIsNotNone(errors[0])
+        self.assertEqual("a", self.read("a"))
+        self.assertEqual("b", self.read("b"))
+        self.assertEqual(["a", "b", "c"], sorted(os.listdir(self.tmp.name)))
+
+    def test_back_cycle(self):
+        """back resolves original names forming a cycle"""
+        self.write("names.log", "a:b\nb:a\n")
+        ren = Renamer(self.tmp.name)
+        ren.back()
+        self.assertEqual("b", self.read("a"))
+        self.assertEqual("a", self.read("b"))
+        self.assertEqual(["a", "b", "c"], sorted(os.listdir(self.tmp.name)))
+
+    def test_back_conflict(self):
+        """back does not overwrite a file having the original name"""
+        self.write("names.log", "a:c\n")
+        ren = Renamer(self.tmp.name)
+        with mock.patch.object(ren.log, "warning") as warning:
+            ren.back()
+        warning.assert_called_once()
+        self.assertEqual("c", self.read("c"))
+        self.assertEqual({"a": "c"}, dict(Renamer(self.tmp.name)
+                                          .load_names()))
+
+    def test_back_duplicate(self):
+        """back restores the other files when two share an original name"""
+        self.write("names.log", "a:x\nb:x\nc:y\n")
+        ren = Renamer(self.tmp.name)
+        with mock.patch.object(ren.log, "warning") as warning:
+            ren.back()
+        warning.assert_called_once()
+        self.assertEqual(["b", "names.log", "x", "y"],
+                         sorted(os.listdir(self.tmp.name)))
+        self.assertEqual({"b": "x"}, dict(Renamer(self.tmp.name)
+                                          .load_names()))
@@ -0,0 +1,116 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+
+import datetime
+import os
+import shutil
+import tempfile
+import types
+import unittest
+import unittest.mock as mock
+
+import pyimgren
+from pyimgren.cache import ExifCache, MISSING
+
+
+class ExifCacheTest(unittest.TestCase):
+    """Tests for the ExifCache class"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db = os.path.join(self.tmp.name, "names.cache")
+        self.file = os.path.join(self.tmp.name, "foo")
+        with open(self.file, "wb") as fd:
+            fd.write(b"foo")
+        self.date = datetime.datetime(2018, 8, 29, 15, 24, 20)
+
+    def test_put_get(self):
+        """A stored date is found in a later session"""
+        with ExifCache(self.db) as cache:
+            self.assertIs(MISSING, cache.get(self.file, os.stat(self.file)))
+            cache.put(self.file, os.stat(self.file), self.date)
+        with ExifCache(self.db) as cache:
+            self.assertEqual(self.date,
+                             cache.get(self.file, os.stat(self.file)))
+            self.assertEqual(1, cache.hits)
+
+    def test_no_date(self):
+        """The absence of date is cached too"""
+        with ExifCache(self.db) as cache:
+            cache.put(self.file, os.stat(self.file), None)
+            self.assertIsNone(cache.get(self.file, os.stat(self.file)))
+
+    def test_renamed(self):
+        """A renamed file keeps its entry"""
+        with ExifCache(self.db) as cache:
+            cache.put(self.file, os.stat(self.file), self.date)
+            new = os.path.join(self.tmp.name, "bar")
+            os.rename(self.file, new)
+            self.assertEqual(self.date, cache.get(new, os.stat(new)))
+
+    def test_modified(self):
+        """A modified file is no longer known"""
+        with ExifCache(self.db) as cache:
+            cache.put(self.file, os.stat(self.file), self.date)
+            with open(self.file, "ab") as fd:
+                fd.write(b"bar")
+            self.assertIs(MISSING, cache.get(self.file, os.stat(self.file)))
+
+    def test_eviction(self):
+        """Only max_entries entries are kept"""
+        with ExifCache(self.db, max_entries=2) as cache:
+            for i in range(5):
+                cache._now = i
+                cache.put("f{}".format(i), types.SimpleNamespace(
+                    st_dev=1, st_ino=i + 1, st_size=3, st_mtime_ns=0),
+                          self.date)
+        with ExifCache(self.db) as cache:
+            self.assertEqual(
+                [("f3",), ("f4",)],
+                cache._db.execute("SELECT path FROM exif ORDER BY path"
+                                  ).fetchall())
+
+    def test_readonly(self):
+        """A read only cache is never written"""
+        with ExifCache(self.db):
+            pass
+        with ExifCache(self.db, readonly=True) as cache:
+            cache.put(self.file, os.stat(self.file), self.date)
+            self.assertIs(MISSING, cache.get(self.file, os.stat(self.file)))
+
+
+class RenamerCacheTest(unittest.TestCase):
+    """Tests for the use of an exif cache by a Renamer"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        shutil.copyfile(os.path.join(os.path.dirname(__file__),
+                                     "DSCF9762.JPG"),
+                        os.path.join(self.tmp.name, "foo"))
+        self.ren = pyimgren.Renamer(self.tmp.name, cache_file="names.cache")
+
+    def test_second_run(self):
+        """A file is only read once"""
+        self.ren.rename("foo")
+        self.ren.back()
+        with mock.patch("pyimgren.renamer.exif_stamp") as exif_stamp:
+            self.ren.rename("foo")
+            exif_stamp.assert_not_called()
+        self.assertEqual(["foo"], list(self.ren.names.values()))
+
+    def test_clear_cache(self):
+        """clear_cache removes the cache file"""
+        self.ren.rename("foo")
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name,
+                                                    "names.cache")))
+        self.ren.clear_cache()
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name,
+                                                     "names.cache")))
+
+    def test_dry_run(self):
+        """A dry run does not create a cache"""
+        self.ren.rename("foo", dummy=True)
+        self.assertEqual(["foo"], os.listdir(self.tmp.name))
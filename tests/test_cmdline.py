@@ -2,7 +2,9 @@
 #  #
 #  SPDX-License-Identifier: MIT
 
+import os
 import sys
+import tempfile
 import unittest
 from unittest.mock import patch
 
@@ -19,51 +21,182 @@ class TestMain(unittest.TestCase):
                      {"folder": "fold", "files": ["DSCF*.jpg"],
                       "dst_mask": "%Y%m%d_%H%M%S",
                       "ext_mask": ".jpg", "ref_file": "names.log",
-                      "debug": True, "dummy": False, "subcommand": "back",
-                      "delta": 0.0
+                      "journal": False, "recursive": False, "progress": False,
+                      "profile_file": None, "pstats": None,
+                      "debug": True, "dummy": False, "subcommand": "back", "plan": None,
+                      "delta": 0.0, "since": None, "until": None
                       },
                      "--ext=.jpeg -X -f fold rename IMG*.jpg":
                      {"folder": "fold", "dst_mask": "%Y%m%d_%H%M%S",
                       "ext_mask": ".jpeg", "ref_file": "names.log",
-                      "debug": False, "dummy": True, "subcommand": "rename",
+                      "journal": False, "recursive": False, "progress": False,
+                      "profile_file": None, "pstats": None,
+                      "debug": False, "dummy": True, "subcommand": "rename", "plan": None,
+                      "workers": 1, "pool": "thread",
+                      "cache_file": "names.cache", "rebuild_cache": False,
+                      "include": None, "exclude": None,
                       "files": ["IMG*.jpg"], "delta": 0.0
                       },
                      "--ext=.jpeg -X -f fold -x 1.5 rename IMG*.jpeg":
                      {"folder": "fold",
                       "dst_mask": "%Y%m%d_%H%M%S",
                       "ext_mask": ".jpeg", "ref_file": "names.log",
-                      "debug": False, "dummy": True, "subcommand": "rename",
+                      "journal": False, "recursive": False, "progress": False,
+                      "profile_file": None, "pstats": None,
+                      "debug": False, "dummy": True, "subcommand": "rename", "plan": None,
+                      "workers": 1, "pool": "thread",
+                      "cache_file": "names.cache", "rebuild_cache": False,
+                      "include": None, "exclude": None,
                       "files": ["IMG*.jpeg"], "delta": 1.5
                       },
-                     """--dst=%Y%m%d%H%M%S -f fold rename IMG*.*""":
+                     "--dst=%Y%m%d%H%M%S -f fold rename --exclude xmp --exclude .MP4 IMG*.*":
                      {"folder": "fold",
                       "dst_mask": "%Y%m%d%H%M%S",
                       "ext_mask": ".jpg", "ref_file": "names.log",
-                      "debug": False, "dummy": False, "subcommand": "rename",
+                      "journal": False, "recursive": False, "progress": False,
+                      "profile_file": None, "pstats": None,
+                      "debug": False, "dummy": False, "subcommand": "rename", "plan": None,
+                      "workers": 1, "pool": "thread",
+                      "cache_file": "names.cache", "rebuild_cache": False,
+                      "include": None, "exclude": ["xmp", ".MP4"],
                       "files": ["IMG*.*"], "delta": 0.0
                       },
                      "-r names.txt --folder=fold rename DSC*.jpg":
                      {"folder": "fold",
                       "dst_mask": "%Y%m%d_%H%M%S",
                       "ext_mask": ".jpg", "ref_file": "names.txt",
-                      "debug": False, "dummy": False, "subcommand": "rename",
+                      "journal": False, "recursive": False, "progress": False,
+                      "profile_file": None, "pstats": None,
+                      "debug": False, "dummy": False, "subcommand": "rename", "plan": None,
+                      "workers": 1, "pool": "thread",
+                      "cache_file": "names.cache", "rebuild_cache": False,
+                      "include": None, "exclude": None,
                       "files": ["DSC*.jpg"], "delta": 0.0
                       },
                      "-r names.txt -f fold rename foo bar":
                      {"folder": "fold",
                       "dst_mask": "%Y%m%d_%H%M%S",
                       "ext_mask": ".jpg", "ref_file": "names.txt",
-                      "debug": False, "dummy": False, "subcommand": "rename",
+                      "journal": False, "recursive": False, "progress": False,
+                      "profile_file": None, "pstats": None,
+                      "debug": False, "dummy": False, "subcommand": "rename", "plan": None,
+                      "workers": 1, "pool": "thread",
+                      "cache_file": "names.cache", "rebuild_cache": False,
+                      "include": None, "exclude": None,
                       "files": ["foo", "bar"], "delta": 0.0
                       },
                      "merge -s fold foo bar":
                      {"folder": ".",
                       "dst_mask": "%Y%m%d_%H%M%S",
                       "ext_mask": ".jpg", "ref_file": "names.log",
-                      "debug": False, "dummy": False, "subcommand": "merge",
-                      "files": ["foo", "bar"], "src_folder": "fold",
+                      "journal": False, "recursive": False, "progress": False,
+                      "profile_file": None, "pstats": None,
+                      "debug": False, "dummy": False, "subcommand": "merge", "plan": None,
+                      "workers": 1, "pool": "thread",
+                      "cache_file": "names.cache", "rebuild_cache": False,
+                      "include": None, "exclude": None,
+                      "files": ["foo", "bar"], "src_folder": "fold", "copy_mode": "copy",
+                      "delta": 0.0, "dedupe": False
+                      },
+                     "--journal back":
+                     {"folder": ".",
+                      "dst_mask": "%Y%m%d_%H%M%S",
+                      "ext_mask": ".jpg", "ref_file": "names.log",
+                      "journal": True, "recursive": False, "progress": False,
+                      "profile_file": None, "pstats": None,
+                      "debug": False, "dummy": False, "subcommand": "back", "plan": None,
+                      "files": [], "delta": 0.0, "since": None, "until": None
+                      },
+                     "back --since 2023-05 --until 2023-06-02T12:00":
+                     {"folder": ".",
+                      "dst_mask": "%Y%m%d_%H%M%S",
+                      "ext_mask": ".jpg", "ref_file": "names.log",
+                      "journal": False, "recursive": False, "progress": False,
+                      "profile_file": None, "pstats": None,
+                      "debug": False, "dummy": False, "subcommand": "back", "plan": None,
+                      "files": [], "delta": 0.0, "since": "2023-05",
+                      "until": "2023-06-02T12:00"
+                      },
+                     "back --plan plan.json":
+                     {"folder": ".",
+                      "dst_mask": "%Y%m%d_%H%M%S",
+                      "ext_mask": ".jpg", "ref_file": "names.log",
+                      "journal": False, "recursive": False, "progress": False,
+                      "profile_file": None, "pstats": None,
+                      "debug": False, "dummy": False, "subcommand": "back",
+                      "plan": "plan.json", "files": [], "delta": 0.0,
+                      "since": None, "until": None
+                      },
+                     "apply plan.json":
+                     {"folder": ".",
+                      "dst_mask": "%Y%m%d_%H%M%S",
+                      "ext_mask": ".jpg", "ref_file": "names.log",
+                      "journal": False, "recursive": False, "progress": False,
+                      "profile_file": None, "pstats": None,
+                      "debug": False, "dummy": False, "subcommand": "apply",
+                      "files": ["plan.json"], "delta": 0.0
+                      },
+                     "watch -w other --settle 0.5 --poll *.JPG":
+                     {"folder": ".",
+                      "dst_mask": "%Y%m%d_%H%M%S",
+                      "ext_mask": ".jpg", "ref_file": "names.log",
+                      "journal": False, "recursive": False, "progress": False,
+                      "profile_file": None, "pstats": None,
+                      "debug": False, "dummy": False, "subcommand": "watch",
+                      "workers": 1, "pool": "thread",
+                      "cache_file": "names.cache", "rebuild_cache": False,
+                      "include": None, "exclude": None,
+                      "files": ["*.JPG"], "folders": ["other"],
+                      "settle": 0.5, "interval": 1.0, "poll": True,
+                      "new_only": False, "delta": 0.0
+                      },
+                     "batch -j 4 -o report.json jobs.toml":
+                     {"folder": ".",
+                      "dst_mask": "%Y%m%d_%H%M%S",
+                      "ext_mask": ".jpg", "ref_file": "names.log",
+                      "journal": False, "recursive": False, "progress": False,
+                      "profile_file": None, "pstats": None,
+                      "debug": False, "dummy": False, "subcommand": "batch",
+                      "workers": 4, "pool": "thread",
+                      "cache_file": "names.cache", "rebuild_cache": False,
+                      "include": None, "exclude": None,
+                      "files": ["jobs.toml"], "output": "report.json",
                       "delta": 0.0
                       },
+                     "convert names.db":
+                     {"folder": ".",
+                      "dst_mask": "%Y%m%d_%H%M%S",
+                      "ext_mask": ".jpg", "ref_file": "names.log",
+                      "journal": False, "recursive": False, "progress": False,
+                      "profile_file": None, "pstats": None,
+                      "debug": False, "dummy": False, "subcommand": "convert",
+                      "files": ["names.db"], "delta": 0.0
+                      },
+                     "-R merge -j 2 -s src --copy-mode auto --dedupe *.JPG":
+                     {"folder": ".",
+                      "dst_mask": "%Y%m%d_%H%M%S",
+                      "ext_mask": ".jpg", "ref_file": "names.log",
+                      "journal": False, "recursive": True, "progress": False,
+                      "profile_file": None, "pstats": None,
+                      "debug": False, "dummy": False, "subcommand": "merge", "plan": None,
+                      "workers": 2, "pool": "thread",
+                      "cache_file": "names.cache", "rebuild_cache": False,
+                      "include": None, "exclude": None,
+                      "files": ["*.JPG"], "src_folder": "src", "copy_mode": "auto", "delta": 0.0,
+                      "dedupe": True
+                      },
+                     "rename -j 4 --pool process --no-cache --rebuild-cache IMG*.jpg":
+                     {"folder": ".",
+                      "dst_mask": "%Y%m%d_%H%M%S",
+                      "ext_mask": ".jpg", "ref_file": "names.log",
+                      "journal": False, "recursive": False, "progress": False,
+                      "profile_file": None, "pstats": None,
+                      "debug": False, "dummy": False, "subcommand": "rename", "plan": None,
+                      "workers": 4, "pool": "process",
+                      "cache_file": None, "rebuild_cache": True,
+                      "include": None, "exclude": None,
+                      "files": ["IMG*.jpg"], "delta": 0.0
+                      },
                      }
         for (args, v) in args_list.items():
             params = self.parser.parse_args(args.split())
@@ -131,4 +264,45 @@ class TestMain(unittest.TestCase):
         self.assertEqual(False, kwargs["dummy"])
         kwargs = call[1]
         self.assertEqual("tests", kwargs["folder"])
-        
+
+    def test_main_convert(self):
+        """Controls script call as convert"""
+        with patch("pyimgren.cmdline.Renamer") as patcher:
+            sys.argv = [ "pyimgren", "-f", "foo", "convert", "names.db" ]
+            ren = patcher("f")
+            patcher.side_effect = [ren, Exception("Only one Renamer") ]
+            simple_cmd()
+            ren.convert.assert_called_once_with("names.db", debug=False,
+                                                dummy=False)
+
+    def test_main_plan(self):
+        """Controls script call with --plan then apply"""
+        with tempfile.TemporaryDirectory() as tmp:
+            plan_file = os.path.join(tmp, "plan.json")
+            with patch("pyimgren.cmdline.Renamer") as patcher:
+                sys.argv = ["pyimgren", "-f", "foo", "rename", "--plan",
+                            plan_file, "bar"]
+                ren = patcher("f")
+                patcher.side_effect = [ren, Exception("Only one Renamer")]
+                ren.plan.return_value = pyimgren.plan.Plan("foo", "names.log")
+                simple_cmd()
+                ren.rename.assert_not_called()
+                self.assertEqual(("rename", "bar"), ren.plan.call_args[0])
+            with patch("pyimgren.cmdline.Renamer") as patcher:
+                sys.argv = ["pyimgren", "-f", "foo", "apply", plan_file]
+                ren = patcher("f")
+                patcher.side_effect = [ren, Exception("Only one Renamer")]
+                simple_cmd()
+                ren.apply.assert_called_once_with(
+                    pyimgren.plan.Plan("foo", "names.log"), debug=False,
+                    dummy=False, profile=False)
+
+    def test_plan_recursive(self):
+        """A plan cannot be computed recursively"""
+        with patch("pyimgren.cmdline.Renamer") as patcher, \
+                patch("sys.stderr"):
+            sys.argv = ["pyimgren", "-R", "-f", "foo", "rename", "--plan",
+                        "plan.json", "bar"]
+            with self.assertRaises(SystemExit):
+                simple_cmd()
+            patcher.assert_not_called()
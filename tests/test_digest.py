@@ -0,0 +1,141 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock as mock
+
+import pyimgren
+from pyimgren import Renamer, progress
+from pyimgren.digest import BLOCK, DIGEST_FILE, DigestIndex
+
+
+class DigestIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.folder = os.path.join(self.tmp.name, "dst")
+        os.mkdir(self.folder)
+        self.db = os.path.join(self.folder, DIGEST_FILE)
+
+    def write(self, path, data):
+        with open(path, "wb") as fd:
+            fd.write(data)
+        return path
+
+    def test_sizes(self):
+        """A file of a size absent from the folder is never read"""
+        self.write(os.path.join(self.folder, "a"), b"x" * 10)
+        src = self.write(os.path.join(self.tmp.name, "b"), b"x" * 11)
+        with DigestIndex(self.folder, self.db) as index, \
+             mock.patch("pyimgren.digest.partial_digest") as partial:
+            self.assertIsNone(index.find(src))
+            partial.assert_not_called()
+
+    def test_partial_then_full(self):
+        """Large files differing in the middle only need the full digest"""
+        data = os.urandom(3 * BLOCK)
+        self.write(os.path.join(self.folder, "a"), data)
+        other = bytearray(data)
+        other[BLOCK + 10] ^= 0xff
+        src = self.write(os.path.join(self.tmp.name, "b"), bytes(other))
+        same = self.write(os.path.join(self.tmp.name, "c"), data)
+        with DigestIndex(self.folder, self.db) as index:
+            self.assertIsNone(index.find(src))
+            self.assertEqual("a", index.find(same))
+
+    def test_persistent(self):
+        """The digests of the folder are computed once"""
+        data = os.urandom(3 * BLOCK)
+        self.write(os.path.join(self.folder, "a"), data)
+        src = self.write(os.path.join(self.tmp.name, "b"), data)
+        with DigestIndex(self.folder, self.db) as index:
+            self.assertEqual("a", index.find(src))
+            self.assertEqual(4, index.reads)
+        with DigestIndex(self.folder, self.db) as index:
+            self.assertEqual("a", index.find(src))
+            self.assertEqual(2, index.reads)     # only the source file
+        os.remove(os.path.join(self.folder, "a"))
+        with DigestIndex(self.folder, self.db) as index:
+            self.assertIsNone(index.find(src))
+        with DigestIndex(self.folder, self.db) as index:
+            self.assertEqual([], index._db.execute(
+                "SELECT * FROM digests").fetchall())
+
+    def test_added(self):
+        """A file given to add is found as the copy of the next ones"""
+        src = self.write(os.path.join(self.tmp.name, "b"), b"small")
+        same = self.write(os.path.join(self.tmp.name, "c"), b"small")
+        with DigestIndex(self.folder, self.db) as index:
+            self.assertIsNone(index.find(src))
+            index.add(src)
+            self.assertEqual(src, index.find(same))
+
+    def test_readonly(self):
+        """A readonly index never creates its database"""
+        src = self.write(os.path.join(self.tmp.name, "b"), b"small")
+        with DigestIndex(self.folder, self.db, readonly=True) as index:
+            self.assertIsNone(index.find(src))
+        self.assertFalse(os.path.exists(self.db))
+
+
+class MergeDedupeTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.src = os.path.join(self.tmp.name, "src")
+        self.dst = os.path.join(self.tmp.name, "dst")
+        os.mkdir(self.src)
+        os.mkdir(self.dst)
+        jpg = os.path.join(os.path.dirname(__file__), "DSCF9762.JPG")
+        for name in ("foo.jpg", "bar.jpg"):
+            shutil.copyfile(jpg, os.path.join(self.src, name))
+
+    def pictures(self):
+        return sorted(name for name in os.listdir(self.dst)
+                      if name.endswith(".jpg"))
+
+    def test_merge_twice(self):
+        """Importing the same files again copies nothing"""
+        ren = Renamer(self.dst)
+        ren.merge("*.jpg", src_folder=self.src, dedupe=True)
+        self.assertEqual(["20180829_152420.jpg"], self.pictures())
+        self.assertEqual(1, ren.stats.counts[progress.DUPLICATE])
+        ren.merge("*.jpg", src_folder=self.src, dedupe=True)
+        self.assertEqual(["20180829_152420.jpg"], self.pictures())
+        self.assertEqual(2, ren.stats.counts[progress.DUPLICATE])
+        self.assertEqual(0, ren.stats.counts[progress.READ])
+        self.assertTrue(os.path.exists(os.path.join(self.dst, DIGEST_FILE)))
+
+    def test_rejected(self):
+        """A file rejected after the comparison does not hide the others"""
+        real = pyimgren.renamer.exif_stamp
+        for rejected in ("foo.jpg", "bar.jpg"):
+            with self.subTest(rejected=rejected):
+                for name in os.listdir(self.dst):
+                    os.remove(os.path.join(self.dst, name))
+                ren = Renamer(self.dst)
+                with mock.patch(
+                        "pyimgren.renamer.exif_stamp",
+                        side_effect=lambda file: None if os.path.basename(
+                            file) == rejected else real(file)):
+                    ren.merge("*.jpg", src_folder=self.src, dedupe=True)
+                self.assertEqual(["20180829_152420.jpg"], self.pictures())
+
+    def test_no_dedupe(self):
+        """Without dedupe, identical files still get suffixed copies"""
+        ren = Renamer(self.dst)
+        ren.merge("*.jpg", src_folder=self.src)
+        self.assertEqual(["20180829_152420.jpg", "20180829_152420a.jpg"],
+                         self.pictures())
+        self.assertFalse(os.path.exists(os.path.join(self.dst, DIGEST_FILE)))
+
+    def test_dry_run(self):
+        """A dry run plans the same copies and creates no database"""
+        ren = Renamer(self.dst)
+        plan = ren.plan("merge", "*.jpg", src_folder=self.src, dedupe=True)
+        self.assertEqual(1, len(plan))
+        self.assertEqual([], os.listdir(self.dst))
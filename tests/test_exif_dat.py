@@ -3,9 +3,53 @@
 #  SPDX-License-Identifier: MIT
 
 import unittest
+import unittest.mock as mock
 from  pyimgren.renamer import exif_dat
+from pyimgren import exif
 import datetime
+import io
 import os
+import struct
+import tempfile
+
+import piexif
+
+
+def make_jpeg(tags=None, app0=True):
+    """Build a minimal JPEG byte string with an optional exif segment"""
+    data = b"\xff\xd8"
+    if app0:
+        data += b"\xff\xe0\x00\x10JFIF\x00\x01\x01\x01\x00H\x00H\x00\x00"
+    if tags is not None:
+        seg = piexif.dump(tags)
+        data += b"\xff\xe1" + struct.pack(">H", len(seg) + 2) + seg
+    return data + b"\xff\xda\x00\x02" + b"\x00" * 1024 + b"\xff\xd9"
+
+
+def make_tiff(date=b"2021:03:04 05:06:07", endian="<", image=65536):
+    """Build a TIFF based RAW file: header, image data, then IFD0 and the
+    Exif IFD holding DateTimeOriginal"""
+    order = b"II" if endian == "<" else b"MM"
+    ifd0 = 8 + image
+    exif_ifd = ifd0 + 2 + 12 + 4
+    value = exif_ifd + 2 + 12 + 4
+    data = order + struct.pack(endian + "HL", 42, ifd0) + b"\xa5" * image
+    data += struct.pack(endian + "HHHLLL", 1, exif.EXIF_IFD_POINTER, 4, 1,
+                        exif_ifd, 0)
+    data += struct.pack(endian + "HHHLLL", 1, exif.DATE_TIME_ORIGINAL, 2,
+                        len(date) + 1, value, 0)
+    return data + date + b"\x00"
+
+
+class CountingReader(io.BytesIO):
+    """A BytesIO that counts the bytes actually read"""
+    nread = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.nread += len(data)
+        return data
+
 
 class ExifDatTest(unittest.TestCase):
     def test_exif_dat(self):
@@ -13,4 +57,144 @@ class ExifDatTest(unittest.TestCase):
         folder = os.path.dirname(__file__)
         self.assertEqual(datetime.datetime(2018, 8, 29, 15, 24, 20),
                          exif_dat(os.path.join(folder, "DSCF9762.JPG")))
-        
+
+    def test_fallback(self):
+        """A non JPEG file is passed to piexif"""
+        with mock.patch("pyimgren.renamer.open",
+                        return_value=io.BytesIO(b"II*\x00"), create=True), \
+             mock.patch("piexif.load", return_value={
+                 "0th": {}, "Exif": {0x9004: b"2020:01:02 03:04:05"}}) as load:
+            self.assertEqual(datetime.datetime(2020, 1, 2, 3, 4, 5),
+                             exif_dat("foo"))
+            load.assert_called_once_with("foo")
+
+    def test_no_fallback(self):
+        """A JPEG file with no exif segment is not passed to piexif"""
+        with mock.patch("pyimgren.renamer.open",
+                        return_value=io.BytesIO(make_jpeg()), create=True), \
+             mock.patch("piexif.load") as load:
+            self.assertIsNone(exif_dat("foo"))
+            load.assert_not_called()
+
+
+class SniffTest(unittest.TestCase):
+    def test_sniff(self):
+        self.assertEqual("jpeg", exif.sniff(make_jpeg()[:exif.SNIFF_SIZE]))
+        self.assertEqual("tiff", exif.sniff(make_tiff(image=0)[:16]))
+        self.assertEqual("webp", exif.sniff(b"RIFF\x10\x00\x00\x00WEBPVP8 "))
+        for head in (b"\x00\x00\x00\x18ftypmp42\x00\x00\x00\x00",
+                     b"<?xpacket begin=", b"", b"\xff"):
+            self.assertIsNone(exif.sniff(head), head)
+
+    def test_rejected(self):
+        """A video is rejected after a single small read"""
+        fd = CountingReader(b"\x00\x00\x00\x18ftypmp42" + b"\x00" * 100000)
+        with mock.patch("pyimgren.renamer.open", return_value=fd,
+                        create=True), \
+             mock.patch("piexif.load") as load:
+            self.assertIsNone(exif_dat("foo.mp4"))
+            load.assert_not_called()
+        self.assertEqual(exif.SNIFF_SIZE, fd.nread)
+
+
+class FastPathTest(unittest.TestCase):
+    def test_bounded_read(self):
+        """Only the exif segment of a real picture is read"""
+        folder = os.path.dirname(__file__)
+        with open(os.path.join(folder, "DSCF9762.JPG"), "rb") as fd:
+            data = fd.read()
+        fd = CountingReader(data)
+        self.assertEqual(b"2018:08:29 15:24:20", exif.read_timestamp(fd))
+        self.assertLess(fd.nread, 65536)
+        self.assertLess(fd.nread, len(data) // 2)
+
+    def test_tag_order(self):
+        """DateTimeOriginal has precedence over IFD0 DateTime"""
+        data = make_jpeg({"0th": {0x132: b"2020:01:01 00:00:00"},
+                          "Exif": {0x9003: b"2019:01:01 00:00:00"}})
+        self.assertEqual(b"2019:01:01 00:00:00",
+                         exif.read_timestamp(io.BytesIO(data)))
+
+    def test_ifd0_only(self):
+        """DateTime is found in IFD0"""
+        data = make_jpeg({"0th": {0x132: b"2020:01:01 00:00:00"}})
+        self.assertEqual(b"2020:01:01 00:00:00",
+                         exif.read_timestamp(io.BytesIO(data)))
+
+    def test_no_date(self):
+        """An exif segment without date tags gives None"""
+        data = make_jpeg({"0th": {0x10f: b"Fuji"}}, app0=False)
+        self.assertIsNone(exif.read_timestamp(io.BytesIO(data)))
+
+    def test_truncated(self):
+        """A truncated exif segment cannot be decided"""
+        data = make_jpeg({"Exif": {0x9003: b"2019:01:01 00:00:00"}})
+        with self.assertRaises(exif.UndecidedError):
+            exif.read_timestamp(io.BytesIO(data[:60]))
+
+    def test_not_jpeg(self):
+        """A non JPEG file cannot be decided"""
+        with self.assertRaises(exif.UndecidedError):
+            exif.read_timestamp(io.BytesIO(b"\x00\x00\x00\x18ftypmp42"))
+
+
+class MappedTest(unittest.TestCase):
+    """Tests for the memory mapped parser"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, name, data):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as fd:
+            fd.write(data)
+        return path
+
+    def test_raw(self):
+        """The date of a TIFF based RAW file is found after its image data"""
+        for endian in "<>":
+            path = self.write("foo.NEF", make_tiff(endian=endian))
+            with mock.patch("piexif.load") as load:
+                self.assertEqual(datetime.datetime(2021, 3, 4, 5, 6, 7),
+                                 exif_dat(path))
+                load.assert_not_called()
+
+    def test_jpeg(self):
+        """A JPEG buffer gives the same date as the stream parser"""
+        data = make_jpeg({"0th": {0x132: b"2020:01:01 00:00:00"},
+                          "Exif": {0x9004: b"2019:01:01 00:00:00"}})
+        with open(self.write("foo.jpg", data), "rb") as fd:
+            self.assertEqual(b"2019:01:01 00:00:00", exif.file_timestamp(fd))
+        self.assertEqual(b"2019:01:01 00:00:00",
+                         exif.buffer_timestamp(memoryview(data)))
+        self.assertIsNone(exif.buffer_timestamp(memoryview(make_jpeg())))
+
+    def test_stream(self):
+        """A TIFF stream that cannot be mapped cannot be decided"""
+        with self.assertRaises(exif.UndecidedError):
+            exif.file_timestamp(io.BytesIO(make_tiff()))
+
+    def test_no_slice_left(self):
+        """No slice of the buffer outlives the parsing, even on errors"""
+        data = bytearray(make_tiff(image=4096))
+        for size in (len(data), 60):
+            with memoryview(data) as view:
+                try:
+                    exif.buffer_timestamp(view[:size])
+                except exif.UndecidedError:
+                    pass
+            data.extend(b"\x00")   # BufferError if a slice is still alive
+
+    def test_truncated(self):
+        """A truncated RAW file is passed to piexif and the map is closed"""
+        path = self.write("foo.CR2", make_tiff()[:-30])
+        with mock.patch("piexif.load", side_effect=ValueError) as load:
+            self.assertIsNone(exif_dat(path))
+            load.assert_called_once_with(path)
+
+    def test_empty(self):
+        """An empty file cannot be decided"""
+        with open(self.write("foo", b""), "rb") as fd:
+            with self.assertRaises(exif.UndecidedError):
+                exif.file_timestamp(fd)
@@ -0,0 +1,111 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+
+import os
+import tempfile
+import unittest
+import unittest.mock as mock
+
+import pyimgren
+from pyimgren import fastcopy
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class CopyFileTest(unittest.TestCase):
+    """Tests for the copy modes"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.src = os.path.join(os.path.dirname(__file__), "DSCF9762.JPG")
+        with open(self.src, "rb") as fd:
+            self.data = fd.read()
+        self.dst = os.path.join(self.tmp.name, "dst.jpg")
+
+    def content(self):
+        with open(self.dst, "rb") as fd:
+            return fd.read()
+
+    def test_copy(self):
+        """copy mode uses shutil.copy"""
+        with mock.patch("shutil.copy") as copy:
+            self.assertEqual("copy", fastcopy.copy_file(self.src, self.dst))
+            copy.assert_called_once_with(self.src, self.dst)
+
+    def test_hardlink(self):
+        """hardlink mode links the same inode"""
+        src = os.path.join(self.tmp.name, "src.jpg")
+        fastcopy.copy_file(self.src, src)
+        self.assertEqual("hardlink",
+                         fastcopy.copy_file(src, self.dst, "hardlink"))
+        self.assertTrue(os.path.samefile(src, self.dst))
+
+    def test_auto(self):
+        """auto mode always gives an identical copy"""
+        self.assertIn(fastcopy.copy_file(self.src, self.dst, "auto"),
+                      ("reflink", "kernel", "copy"))
+        self.assertEqual(self.data, self.content())
+
+    def test_auto_fallback(self):
+        """auto mode falls back to a plain copy"""
+        with mock.patch.object(fastcopy, "reflink", side_effect=OSError), \
+             mock.patch.object(fastcopy, "kernel_copy",
+                               side_effect=OSError):
+            self.assertEqual("copy",
+                             fastcopy.copy_file(self.src, self.dst, "auto"))
+        self.assertEqual(self.data, self.content())
+
+    def test_kernel_copy(self):
+        """a kernel copy gives an identical file"""
+        fastcopy.kernel_copy(self.src, self.dst)
+        self.assertEqual(self.data, self.content())
+
+    def test_kernel_copy_short(self):
+        """a kernel copy stopping early leaves no file behind"""
+        def short(*args):
+            return 0
+        with mock.patch("os.copy_file_range", side_effect=short,
+                        create=True), \
+             mock.patch("os.sendfile", side_effect=short, create=True):
+            with self.assertRaises(OSError):
+                fastcopy.kernel_copy(self.src, self.dst)
+            self.assertFalse(os.path.exists(self.dst))
+            with mock.patch.object(fastcopy, "reflink", side_effect=OSError), \
+                 mock.patch("shutil.copyfile") as copyfile:
+                self.assertEqual("copy", fastcopy.copy_file(
+                    self.src, self.dst, "auto"))
+            copyfile.assert_called_once_with(self.src, self.dst)
+
+    def test_auto_existing(self):
+        """auto mode never overwrites an existing file"""
+        with open(self.dst, "wb") as fd:
+            fd.write(b"old")
+        with self.assertRaises(FileExistsError):
+            fastcopy.copy_file(self.src, self.dst, "auto")
+        self.assertEqual(b"old", self.content())
+
+    @unittest.skipUnless(fcntl, "no fcntl module")
+    def test_reflink_unsupported(self):
+        """a failed reflink leaves no file behind"""
+        with mock.patch("fcntl.ioctl", side_effect=OSError):
+            with self.assertRaises(OSError):
+                fastcopy.copy_file(self.src, self.dst, "reflink")
+        self.assertFalse(os.path.exists(self.dst))
+
+    def test_merge_mode(self):
+        """merge uses its copy_mode and rejects unknown ones"""
+        src = os.path.join(self.tmp.name, "src")
+        os.mkdir(src)
+        fastcopy.copy_file(self.src, os.path.join(src, "foo"))
+        ren = pyimgren.Renamer(self.tmp.name)
+        with self.assertRaises(ValueError):
+            ren.merge("foo", src_folder=src, copy_mode="move")
+        ren.merge("foo", src_folder=src, copy_mode="hardlink")
+        self.assertTrue(os.path.samefile(
+            os.path.join(src, "foo"),
+            os.path.join(self.tmp.name, "20180829_152420.jpg")))
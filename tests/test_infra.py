@@ -2,7 +2,10 @@
 #  #
 #  SPDX-License-Identifier: MIT
 
+import os.path
 import re
+import subprocess
+import sys
 import unittest
 
 import pyimgren
@@ -23,3 +26,15 @@ above 0.0"""
         maj_v = int(m.group(1))
         min_v = int(m.group(2))
         self.assertTrue(maj_v > 0 or min_v > 0, "Unacceptable version 0.0")
+
+    def test_lazy_imports(self):
+        """Importing the command line does not load the exif machinery"""
+        heavy = ("pyimgren.renamer", "piexif", "concurrent.futures",
+                 "urllib.request")
+        out = subprocess.run(
+            [sys.executable, "-c", "import sys, pyimgren.cmdline; print("
+             "[m for m in {!r} if m in sys.modules])".format(heavy)],
+            stdout=subprocess.PIPE, universal_newlines=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.assertEqual("[]", out.stdout.strip())
+        self.assertEqual("Renamer", pyimgren.Renamer.__name__)
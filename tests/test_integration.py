@@ -13,6 +13,7 @@ if parent not in sys.path:
     sys.path.append(parent)
 
 from pyimgren import Renamer
+from pyimgren.renamer import walk_folders
 
 
 class SimpleTest(TestCase):
@@ -206,6 +207,55 @@ class TestSameName(TestCase):
         self.assertEqual(0, len(ren.names))
 
 
+class RecursiveTest(TestCase):
+    """Tests for the recursive mode"""
+
+    def setUp(self):
+        self.setUpPyfakefs()
+        self.fs.add_real_directory(os.path.dirname(__file__),
+                                   target_path="/orig")
+        for folder in ("/test", "/test/a", "/test/a/b", "/test/c"):
+            self.fs.create_dir(folder)
+            for name in ("foo", "bar"):
+                shutil.copyfile("/orig/DSCF9762.JPG",
+                                os.path.join(folder, name))
+        self.ren = Renamer("/test")
+
+    def test_rename(self):
+        """Each folder receives its own names.log"""
+        self.ren.rename("foo", "bar", recursive=True, workers=2)
+        for folder in ("/test", "/test/a", "/test/a/b", "/test/c"):
+            self.assertEqual(["20180829_152420.jpg", "20180829_152420a.jpg",
+                              "names.log"],
+                             sorted(f for f in os.listdir(folder)
+                                    if os.path.isfile(
+                                        os.path.join(folder, f))))
+            self.assertEqual(["foo", "bar"], list(
+                Renamer(folder).load_names().values()))
+
+    def test_back(self):
+        """All folders are renamed back"""
+        self.ren.rename("*", recursive=True)
+        self.ren.back(recursive=True)
+        self.assertEqual(["a", "bar", "c", "foo"], sorted(os.listdir("/test")))
+        self.assertEqual(["bar", "foo"], sorted(os.listdir("/test/a/b")))
+
+    def test_merge(self):
+        """A tree is merged into the same sub-folders"""
+        ren = Renamer("/dst")
+        ren.merge("foo", src_folder="/test", recursive=True)
+        self.assertTrue(os.path.exists("/dst/a/b/20180829_152420.jpg"))
+        self.assertTrue(os.path.exists("/dst/c/names.log"))
+        self.assertTrue(os.path.exists("/test/a/foo"))
+
+    def test_walk(self):
+        """Folders are walked in order, excluded ones skipped"""
+        self.assertEqual(["/test", "/test/a", "/test/a/b", "/test/c"],
+                         list(walk_folders("/test")))
+        self.assertEqual(["/test", "/test/c"],
+                         list(walk_folders("/test", ["/test/a"])))
+
+
 if __name__ == "__main__":
     import unittest
     unittest.main(verbosity=2)
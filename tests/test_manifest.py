@@ -0,0 +1,110 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import unittest.mock as mock
+
+from pyimgren.cmdline import simple_cmd
+from pyimgren.manifest import load_manifest, parse_manifest, run_jobs
+
+PICT = os.path.join(os.path.dirname(__file__), "DSCF9762.JPG")
+
+
+class ManifestTest(unittest.TestCase):
+    """Tests for the manifest driven batch mode"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        for folder in ("a", "b"):
+            os.mkdir(self.path(folder))
+            for name in ("foo.JPG", "bar.JPG"):
+                shutil.copyfile(PICT, self.path(folder, name))
+
+    def path(self, *names):
+        return os.path.join(self.tmp.name, *names)
+
+    def write(self, name, text):
+        with io.open(self.path(name), "w", encoding="utf-8") as fd:
+            fd.write(text)
+        return self.path(name)
+
+    def test_json(self):
+        """Each job has its own Renamer parameters"""
+        manifest = self.write("jobs.json", json.dumps({
+            "defaults": {"ext_mask": ".jpeg"},
+            "jobs": [{"folder": "a", "files": ["*.JPG"]},
+                     {"folder": "b", "files": "foo.JPG",
+                      "dst_mask": "%Y", "ref_file": "b.log"},
+                     {"folder": "c", "command": "merge", "files": ["*.JPG"],
+                      "src_folder": "a", "copy_mode": "hardlink"}]}))
+        report = run_jobs(load_manifest(manifest), workers=2)
+        self.assertEqual([], report.failed)
+        self.assertEqual(["20180829_152420.jpeg", "20180829_152420a.jpeg",
+                          "names.log"], sorted(os.listdir(self.path("a"))))
+        self.assertEqual(["2018.jpeg", "b.log", "bar.JPG"],
+                         sorted(os.listdir(self.path("b"))))
+        self.assertEqual(3, report.stats.counts["renamed"])
+        self.assertIn("3 jobs, 0 failed", str(report))
+
+    def test_toml_chain(self):
+        """Jobs on the same ref_file run in the manifest order"""
+        manifest = self.write("jobs.toml", "\n".join([
+            "[[jobs]]", 'folder = "a"', 'files = ["*.JPG"]',
+            "[[jobs]]", 'folder = "a"', 'command = "back"',
+            "[[jobs]]", 'folder = "b"', 'files = ["foo.JPG"]']))
+        try:
+            jobs = load_manifest(manifest)
+        except ValueError:
+            self.skipTest("no TOML parser")
+        report = run_jobs(jobs, workers=3)
+        self.assertEqual([0, 1, 2], [result.index
+                                     for result in report.results])
+        self.assertEqual(["bar.JPG", "foo.JPG"],
+                         sorted(os.listdir(self.path("a"))))
+        self.assertEqual(1, report.results[2].stats.counts["renamed"])
+
+    def test_error(self):
+        """An error in a job does not stop the other ones"""
+        self.write(os.path.join("a", "names.log"), "no colon\n")
+        jobs = parse_manifest({"jobs": [{"folder": "a", "files": ["*"]},
+                                        {"folder": "b", "files": ["*"]}]},
+                              self.tmp.name)
+        with mock.patch("logging.Logger.warning"):
+            report = run_jobs(jobs)
+        self.assertEqual(1, len(report.failed))
+        self.assertIn("NamesLogException", report.failed[0].error)
+        self.assertEqual(2, report.results[1].stats.counts["renamed"])
+
+    def test_invalid(self):
+        for data in ({}, {"jobs": [{"files": ["*"]}]},
+                     {"jobs": [{"folder": "a"}]},
+                     {"jobs": [{"folder": "a", "command": "delete",
+                                "files": ["*"]}]},
+                     {"jobs": [{"folder": "a", "files": ["*"],
+                                "copy_mode": "copy"}]},
+                     {"defaults": {"mask": "%Y"}, "jobs": []}):
+            with self.assertRaises(ValueError):
+                parse_manifest(data)
+
+    def test_cmdline(self):
+        """The command line options are defaults for the jobs"""
+        manifest = self.write("jobs.json", json.dumps({"jobs": [
+            {"folder": "a", "files": ["*.JPG"]},
+            {"folder": "b", "files": ["*.JPG"], "ext_mask": ".jpg"}]}))
+        report = self.path("report.json")
+        with mock.patch.object(sys, "argv", [
+                "pyimgren", "-e", ".JPEG", "batch", "-j", "2", "-o", report,
+                manifest]), mock.patch.object(sys, "stdout", io.StringIO()):
+            simple_cmd()
+        self.assertIn("20180829_152420.JPEG", os.listdir(self.path("a")))
+        self.assertIn("20180829_152420.jpg", os.listdir(self.path("b")))
+        with io.open(report) as fd:
+            self.assertEqual(0, json.load(fd)["failed"])
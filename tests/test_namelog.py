@@ -0,0 +1,142 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+
+import os.path
+import shutil
+import tempfile
+import unittest
+import unittest.mock as mock
+
+from pyfakefs.fake_filesystem_unittest import TestCase
+
+from pyimgren import Renamer
+from pyimgren import namelog
+
+
+class JournalTest(TestCase):
+    """Tests for the journaled mode of a Renamer"""
+
+    def setUp(self):
+        self.setUpPyfakefs()
+        self.fs.add_real_directory(os.path.dirname(__file__),
+                                   target_path="/orig")
+        self.fs.create_dir("/test")
+        for name in ("foo", "bar"):
+            shutil.copyfile("/orig/DSCF9762.JPG", "/test/" + name)
+        self.ren = Renamer("/test", journal=True)
+
+    def test_append(self):
+        """A journaled rename only writes the journal"""
+        self.ren.rename("foo", "bar")
+        self.assertFalse(os.path.exists("/test/names.log"))
+        with open("/test/names.log.journal") as fd:
+            self.assertEqual(["+20180829_152420.jpg:foo\n",
+                              "+20180829_152420a.jpg:bar\n"],
+                             fd.readlines())
+        ren = Renamer("/test")
+        self.assertEqual(self.ren.names, ren.load_names())
+
+    def test_back(self):
+        """Rename back adds removal records"""
+        self.ren.rename("foo", "bar")
+        self.ren.back("*a.jpg")
+        self.assertEqual({"20180829_152420.jpg": "foo"},
+                         Renamer("/test").load_names())
+        self.assertTrue(os.path.exists("/test/bar"))
+
+    def test_interrupted(self):
+        """A partially written record is ignored"""
+        self.ren.rename("foo")
+        with open("/test/names.log.journal", "a") as fd:
+            fd.write("+20180829_152420a.jpg:b")
+        self.assertEqual({"20180829_152420.jpg": "foo"},
+                         Renamer("/test").load_names())
+
+    def test_compaction(self):
+        """A large journal is folded in the ref_file"""
+        with mock.patch.object(namelog, "COMPACT_MIN", 1):
+            self.ren.rename("foo", "bar")
+        self.assertFalse(os.path.exists("/test/names.log.journal"))
+        with open("/test/names.log") as fd:
+            self.assertEqual(["20180829_152420.jpg:foo\n",
+                              "20180829_152420a.jpg:bar\n"],
+                             fd.readlines())
+
+    def test_fold(self):
+        """A non journaled Renamer folds an existing journal"""
+        self.ren.rename("foo")
+        ren = Renamer("/test")
+        ren.rename("bar")
+        self.assertFalse(os.path.exists("/test/names.log.journal"))
+        self.assertEqual(2, len(Renamer("/test").load_names()))
+
+
+class SqliteNamesTest(unittest.TestCase):
+    """Tests for the SQLite ref_file format"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        for name in ("foo", "bar"):
+            shutil.copyfile(os.path.join(os.path.dirname(__file__),
+                                         "DSCF9762.JPG"),
+                            os.path.join(self.tmp.name, name))
+        self.ren = Renamer(self.tmp.name, ref_file="names.db")
+
+    def tearDown(self):
+        if isinstance(self.ren.names, namelog.SqliteNames):
+            self.ren.names.close()
+
+    def test_rename(self):
+        """Names are stored in the database"""
+        self.ren.rename("foo", "bar")
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name,
+                                                     "names.log")))
+        names = namelog.SqliteNames(os.path.join(self.tmp.name, "names.db"))
+        self.assertEqual([("20180829_152420.jpg", "foo"),
+                          ("20180829_152420a.jpg", "bar")], names.items())
+        names.close()
+
+    def test_back_lookup(self):
+        """Renaming back a pattern does not iterate the names"""
+        self.ren.rename("foo", "bar")
+        ren = Renamer(self.tmp.name, ref_file="names.db")
+        with mock.patch.object(namelog.SqliteNames, "__iter__",
+                               side_effect=AssertionError):
+            ren.back("*a.jpg")
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, "bar")))
+        self.assertEqual(1, len(ren.names))
+        ren.names.close()
+
+    def test_back_all(self):
+        """The database is closed, and removed once it holds no names"""
+        self.ren.rename("foo", "bar")
+        self.assertIsNone(self.ren.names._db)
+        self.ren.back()
+        self.assertEqual(["bar", "foo"], sorted(os.listdir(self.tmp.name)))
+        self.assertEqual(0, len(self.ren.names))
+
+    def test_dry_run(self):
+        """A dry run does not create the database"""
+        self.ren.rename("foo", "bar", dummy=True)
+        self.assertEqual(["bar", "foo"], sorted(os.listdir(self.tmp.name)))
+
+    def test_convert(self):
+        """A text ref_file can be converted to SQLite and back"""
+        ren = Renamer(self.tmp.name)
+        ren.rename("foo", "bar")
+        ren.convert("names.db")
+        self.assertEqual("names.db", ren.ref_file)
+        self.assertEqual(2, len(self.ren.load_names()))
+        self.assertEqual("bar", self.ren.names["20180829_152420a.jpg"])
+        self.ren.convert("names.txt")
+        with open(os.path.join(self.tmp.name, "names.txt")) as fd:
+            self.assertEqual(["20180829_152420.jpg:foo\n",
+                              "20180829_152420a.jpg:bar\n"], fd.readlines())
+        ren.names.close()
+
+    def test_convert_existing(self):
+        """An existing ref_file is not overwritten"""
+        with self.assertRaises(FileExistsError):
+            self.ren.convert("foo")
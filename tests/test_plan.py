@@ -0,0 +1,106 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock as mock
+
+from pyimgren import Renamer
+from pyimgren.plan import Plan, Step
+
+
+class PlanTest(unittest.TestCase):
+    """Tests for the plans computed by dry runs"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        src = os.path.join(os.path.dirname(__file__), "DSCF9762.JPG")
+        self.folder = os.path.join(self.tmp.name, "pict")
+        os.mkdir(self.folder)
+        for name in ("foo", "bar", "fee"):
+            shutil.copyfile(src, os.path.join(self.folder, name))
+        self.ren = Renamer(self.folder)
+
+    def test_same_names(self):
+        """A dry run gives the same names as a real run"""
+        plan = self.ren.plan("rename", "foo", "bar", "fee")
+        self.assertEqual(["20180829_152420.jpg", "20180829_152420a.jpg",
+                          "20180829_152420b.jpg"],
+                         [step.target for step in plan])
+        self.assertEqual(["bar", "fee", "foo"], sorted(os.listdir(
+            self.folder)))
+        self.ren.rename("foo", "bar", "fee")
+        self.assertEqual(plan.added, list(self.ren.names.items()))
+
+    def test_apply_json(self):
+        """A plan saved as JSON is applied without reading exif data"""
+        plan = Plan.from_json(self.ren.plan("rename", "*").to_json())
+        ren = Renamer(self.folder)
+        with mock.patch("pyimgren.renamer.exif_stamp",
+                        side_effect=AssertionError):
+            ren.apply(plan)
+        self.assertEqual(["20180829_152420.jpg", "20180829_152420a.jpg",
+                          "20180829_152420b.jpg", "names.log"],
+                         sorted(os.listdir(self.folder)))
+        self.assertEqual(plan.added, list(Renamer(self.folder)
+                                          .load_names().items()))
+
+    def test_stale_step(self):
+        """Steps made stale by a change in the folder are skipped"""
+        plan = self.ren.plan("rename", "foo", "bar")
+        os.remove(os.path.join(self.folder, "bar"))
+        with mock.patch.object(self.ren.log, "warning") as warning:
+            self.ren.apply(plan)
+        warning.assert_called_once()
+        self.assertEqual({"20180829_152420.jpg": "foo"},
+                         dict(self.ren.names))
+
+    def test_back(self):
+        """A plan of back removes the names"""
+        self.ren.rename("foo", "bar")
+        plan = self.ren.plan("back")
+        self.assertEqual(["20180829_152420.jpg", "20180829_152420a.jpg"],
+                         plan.removed)
+        self.assertEqual([], plan.added)
+        self.assertEqual(2, len(self.ren.names))
+        self.ren.apply(plan)
+        self.assertEqual(["bar", "fee", "foo"], sorted(os.listdir(
+            self.folder)))
+
+    def test_merge(self):
+        """A plan of merge keeps its copy mode"""
+        dst = os.path.join(self.tmp.name, "dst")
+        os.mkdir(dst)
+        ren = Renamer(dst)
+        plan = ren.plan("merge", "f*", src_folder=self.folder,
+                        copy_mode="hardlink")
+        self.assertEqual("hardlink", plan.copy_mode)
+        self.assertEqual({"copy"}, set(step.action for step in plan))
+        self.assertEqual([], os.listdir(dst))
+        ren.apply(plan)
+        self.assertEqual(2, os.stat(os.path.join(dst, plan.steps[0].target)
+                                    ).st_nlink)
+
+    def test_dry_run_journal(self):
+        """A dry run in journaled mode writes no journal"""
+        ren = Renamer(self.folder, journal=True)
+        ren.rename("*", dummy=True)
+        self.assertEqual(["bar", "fee", "foo"], sorted(os.listdir(
+            self.folder)))
+
+    def test_wrong_folder(self):
+        plan = Plan(self.tmp.name, "names.log", steps=[
+            Step("move", "foo", "bar")])
+        with self.assertRaises(ValueError):
+            self.ren.apply(plan)
+
+    def test_invalid_json(self):
+        with self.assertRaises(ValueError):
+            Plan.from_json('{"format": 1, "steps": []}')
+        with self.assertRaises(ValueError):
+            Plan.from_dict(dict(Plan("a", "b").to_dict(), steps=[
+                dict(action="delete", source="a", target="b")]))
@@ -0,0 +1,157 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+
+import io
+import json
+import os
+import pstats
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+import unittest.mock as mock
+
+from pyimgren import Renamer, progress
+from pyimgren.cmdline import simple_cmd
+from pyimgren.progress import ProgressLine, Stats
+
+
+class StatsTest(unittest.TestCase):
+    """Tests for the Stats object"""
+
+    def test_nested_phases(self):
+        """A nested phase pauses the outer one"""
+        stats = Stats()
+        with stats.phase("name"):
+            with stats.phase("rename"):
+                time.sleep(0.02)
+        stats.stop()
+        self.assertGreaterEqual(stats.times["rename"], 0.02)
+        self.assertLess(stats.times["name"], 0.02)
+        self.assertGreaterEqual(stats.elapsed, sum(stats.times.values()))
+
+    def test_merge(self):
+        stats, other = Stats(), Stats()
+        other.counts[progress.READ] = 3
+        other.times["read"] = 1.5
+        stats.merge(other)
+        stats.merge(other)
+        self.assertEqual(6, stats.files)
+        self.assertEqual(3.0, stats.times["read"])
+
+    def test_progress_line(self):
+        """The line is rewritten at most once per interval"""
+        stream = io.StringIO()
+        line = ProgressLine(stream, interval=60)
+        stats = Stats()
+        for _i in range(3):
+            stats.counts[progress.SCANNED] += 1
+            line(progress.SCANNED, "foo", stats)
+        self.assertEqual(1, stream.getvalue().count("\r"))
+        line.close(stats)
+        self.assertTrue(stream.getvalue().endswith("\n"))
+        self.assertIn("3 scanned", stream.getvalue())
+
+
+class RenamerStatsTest(unittest.TestCase):
+    """Tests for the statistics of the Renamer commands"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        src = os.path.join(os.path.dirname(__file__), "DSCF9762.JPG")
+        self.folder = os.path.join(self.tmp.name, "pict")
+        os.mkdir(self.folder)
+        for name in ("foo", "bar", "fee"):
+            shutil.copyfile(src, os.path.join(self.folder, name))
+        self.events = []
+
+    def callback(self, event, file, stats):
+        self.events.append(event)
+
+    def test_rename(self):
+        """rename counts its files, reads, collisions and renames"""
+        ren = Renamer(self.folder)
+        ren.progress = self.callback
+        ren.rename("*")
+        counts = ren.stats.counts
+        self.assertEqual(3, counts[progress.SCANNED])
+        self.assertEqual(3, counts[progress.READ])
+        self.assertEqual(2, counts[progress.COLLISION])
+        self.assertEqual(3, counts[progress.RENAMED])
+        self.assertEqual(0, counts[progress.ERROR])
+        self.assertEqual(11, len(self.events))
+        self.assertGreater(ren.stats.elapsed, 0)
+        self.assertEqual(set(progress.PHASES), set(
+            ren.stats.to_dict()["times"]))
+
+    def test_cache_hits(self):
+        """A second run reads the dates from the cache"""
+        ren = Renamer(self.folder, cache_file="names.cache")
+        ren.rename("foo", "bar", "fee")
+        ren.back()
+        ren.rename("foo", "bar", "fee", dummy=True)
+        self.assertEqual(3, ren.stats.counts[progress.CACHE_HIT])
+        self.assertEqual(0, ren.stats.counts[progress.READ])
+        self.assertEqual(0, ren.stats.counts[progress.RENAMED])
+
+    def test_merge(self):
+        dst = os.path.join(self.tmp.name, "dst")
+        os.mkdir(dst)
+        ren = Renamer(dst)
+        ren.merge("f*", src_folder=self.folder)
+        self.assertEqual(2, ren.stats.counts[progress.COPIED])
+        self.assertEqual(1, ren.stats.counts[progress.COLLISION])
+
+    def test_recursive(self):
+        """The stats of the sub-folders are summed"""
+        sub = os.path.join(self.folder, "sub")
+        os.mkdir(sub)
+        shutil.copyfile(os.path.join(self.folder, "foo"),
+                        os.path.join(sub, "foo"))
+        ren = Renamer(self.folder)
+        ren.progress = self.callback
+        ren.rename("*", recursive=True, workers=2)
+        self.assertEqual(4, ren.stats.counts[progress.RENAMED])
+        self.assertEqual(4, self.events.count(progress.RENAMED))
+
+    def test_cmdline(self):
+        """--progress writes the final statistics"""
+        with mock.patch.object(sys, "argv", [
+                "pyimgren", "--progress", "-f", self.folder, "rename", "*"]
+                ), mock.patch.object(sys, "stderr", io.StringIO()) as err:
+            simple_cmd()
+        self.assertIn("3 renamed", err.getvalue())
+        self.assertIn("total", err.getvalue())
+
+    def test_profile(self):
+        """profile records the duration of each file in each phase"""
+        ren = Renamer(self.folder)
+        ren.rename("*")
+        self.assertIsNone(ren.stats.samples)
+        self.assertNotIn("phases", ren.stats.to_dict())
+        ren.back(profile=True)
+        ren.rename("*", profile=True)
+        phases = ren.stats.to_dict()["phases"]
+        self.assertEqual(4, phases["read"]["calls"])   # and end of files
+        self.assertEqual(3, phases["name"]["calls"])
+        self.assertLessEqual(phases["read"]["mean"], phases["read"]["max"])
+        self.assertNotIn("calls", phases["copy"])
+        self.assertIn("read", ren.stats.report())
+
+    def test_cmdline_profile(self):
+        """--profile writes a JSON report and --pstats a cProfile dump"""
+        report = os.path.join(self.tmp.name, "report.json")
+        dump = os.path.join(self.tmp.name, "run.pstats")
+        with mock.patch.object(sys, "argv", [
+                "pyimgren", "--profile", report, "--pstats", dump, "-f",
+                self.folder, "rename", "foo", "bar", "fee"]):
+            simple_cmd()
+        with io.open(report) as fd:
+            data = json.load(fd)
+        self.assertEqual(3, data["counts"][progress.RENAMED])
+        self.assertEqual(3, data["phases"]["name"]["calls"])
+        self.assertEqual(1, data["phases"]["load"]["calls"])
+        self.assertTrue(pstats.Stats(dump).total_calls)
@@ -6,11 +6,27 @@ import collections
 import datetime
 import io
 import os.path
+import shutil
+import string
+import tempfile
+import types
 import unittest
 import unittest.mock as mock
 
 import pyimgren
 
+SUFFIXES = list(string.ascii_lowercase) + [
+    a + b for a in string.ascii_lowercase for b in string.ascii_lowercase]
+
+
+class CountingSet(set):
+    """A set counting the membership tests"""
+    count = 0
+
+    def __contains__(self, item):
+        self.count += 1
+        return super().__contains__(item)
+
 
 class RenamerTest(unittest.TestCase):
     """Tests for the Renamer class"""
@@ -50,31 +66,44 @@ c
 
     def test_get_names(self):
         """find a new name pretending 55 files already exist"""
-        with mock.patch("os.path.exists",
-                        side_effect = ([True] * 55) + [False]):
+        existing = [types.SimpleNamespace(name=n + self.obj.ext_mask)
+                    for n in ["foo"] + ["foo" + s for s in SUFFIXES[:54]]]
+        with mock.patch("os.scandir", return_value=existing), \
+             mock.patch("os.path.exists") as exists:
             self.obj.names = {}
             n = self.obj.get_new_name("foo")
-            self.assertEqual(56, os.path.exists.call_count)
-            self.assertEqual(os.path.join(self.obj.folder, "foobc")
-                             + self.obj.ext_mask,
-                             os.path.exists.call_args[0][0])
-            self.assertEqual(os.path.join(self.obj.folder, "foo")
-                             + self.obj.ext_mask,
-                             os.path.exists.call_args_list[0][0][0])
-            self.assertEqual(os.path.join(self.obj.folder, "fooa")
-                             + self.obj.ext_mask,
-                             os.path.exists.call_args_list[1][0][0])
             self.assertEqual("foobc" + self.obj.ext_mask, n)
+            os.scandir.assert_called_once_with(self.obj.folder)
+            exists.assert_not_called()
+
+    def test_get_names_burst(self):
+        """the search for a name starts after the last one found"""
+        with mock.patch("os.scandir", return_value=[]):
+            self.obj.names = {}
+            self.obj._add_file(self.obj.get_new_name("foo"))
+            self.obj._add_file(self.obj.get_new_name("foo"))
+            self.assertEqual(1, self.obj._free["foo" + self.obj.ext_mask])
+            self.obj._files = CountingSet(self.obj._files)
+            self.assertEqual("foob" + self.obj.ext_mask,
+                             self.obj.get_new_name("foo"))
+            self.assertEqual(2, self.obj._files.count)
+
+    def test_get_names_freed(self):
+        """a removed file makes its name available again"""
+        with mock.patch("os.scandir", return_value=[]):
+            self.obj.names = {}
+            for _ in range(3):
+                self.obj._add_file(self.obj.get_new_name("foo"))
+            self.obj._remove_file("fooa" + self.obj.ext_mask)
+            self.assertEqual("fooa" + self.obj.ext_mask,
+                             self.obj.get_new_name("foo"))
 
     def test_back(self):
         """Rename back 3 files"""
         flist = [("a", "b"), ("c", "d"), ("e", "f")]
-        with mock.patch("os.rename"), mock.patch(
-                "glob.glob", side_effect = [
-                    [ os.path.join(self.folder, i)]
-                    for i,j in flist]), mock.patch(
-                'os.path.exists', return_value=True), mock.patch.object(
-                self.obj, '_save_names'):
+        with mock.patch("os.rename"), mock.patch.object(
+                self.obj, '_folder_files', return_value={"a", "c", "e"}
+                ), mock.patch.object(self.obj, '_save_names'):
             self.obj.names = collections.OrderedDict(flist)
             self.obj.back()
             self.assertEqual(3, os.rename.call_count)
@@ -100,8 +129,8 @@ c
         with mock.patch("os.rename"), \
              mock.patch("io.open", return_value = open_ctx), \
              mock.patch("glob.glob", return_value = names), \
-             mock.patch("pyimgren.renamer.exif_dat",
-                        side_effect = dates):
+             mock.patch("pyimgren.renamer.exif_stamp",
+                        side_effect = [d.isoformat() for d in dates]):
             self.obj.names = collections.OrderedDict()
             self.obj._orig = self.obj._target = set()
             self.obj.rename('?', delta=delta)
@@ -119,6 +148,19 @@ c
         """Rename files with 60 minutes delta"""
         self.test_rename(delta=60)
 
+    def test_rename_float_delta(self):
+        """The command line gives the delta as a float"""
+        for delta, name in ((5.0, "20180829_152920.jpg"),
+                            (0.5, "20180829_152450.jpg")):
+            with self.subTest(delta=delta), \
+                    tempfile.TemporaryDirectory() as tmp:
+                shutil.copyfile(os.path.join(self.folder, "DSCF9762.JPG"),
+                                os.path.join(tmp, "DSCF9762.JPG"))
+                ren = pyimgren.Renamer(tmp)
+                ren.rename("*.JPG", delta=delta)
+                self.assertTrue(os.path.exists(os.path.join(tmp, name)))
+                self.assertEqual({name: "DSCF9762.JPG"}, dict(ren.names))
+
     def test_rename_no_exif_tag(self):
         """Try to rename files having no exif tag"""
         fd = mock.Mock()
@@ -130,7 +172,7 @@ c
         with mock.patch("os.rename"), \
              mock.patch("io.open", return_value = open_ctx), \
              mock.patch("glob.glob", return_value = names), \
-             mock.patch("pyimgren.renamer.exif_dat",
+             mock.patch("pyimgren.renamer.exif_stamp",
                         side_effect = dates):
             self.obj.names = collections.OrderedDict()
             self.obj.rename()
@@ -165,7 +207,9 @@ c
     def test_too_many_files(self):
         """Try to rename more than 700 files with same timestamp"""
         self.obj.names = {}
-        with mock.patch("os.path.exists", return_value = True):
+        existing = [types.SimpleNamespace(name="foo" + s + self.obj.ext_mask)
+                    for s in [""] + SUFFIXES]
+        with mock.patch("os.scandir", return_value = existing):
             try:
                 self.obj.get_new_name("foo")
             except RuntimeError as e:
@@ -186,7 +230,7 @@ c
              mock.patch.object(self.obj, "_save_names"), \
              mock.patch('glob.glob', side_effect=lambda x: [x]), \
              mock.patch('os.rename') as rename, \
-             mock.patch('pyimgren.renamer.exif_dat', return_value=datetime.datetime(2018,2,1)),\
+             mock.patch('pyimgren.renamer.exif_stamp', return_value="2018-02-01T00:00:00"),\
              mock.patch.object(self.obj, 'get_new_name', return_value='c'):
             self.obj.names = names
             self.obj._orig = set(self.obj.names.values())
@@ -204,7 +248,7 @@ c
              mock.patch.object(self.obj, "_save_names"), \
              mock.patch('glob.glob', side_effect=lambda x: [x]), \
              mock.patch('os.rename') as rename, \
-             mock.patch('pyimgren.renamer.exif_dat', return_value=datetime.datetime(2018,2,1)),\
+             mock.patch('pyimgren.renamer.exif_stamp', return_value="2018-02-01T00:00:00"),\
              mock.patch.object(self.obj, 'get_new_name', return_value='c'):
             self.obj.names = names
             self.obj._orig = set(self.obj.names.values())
@@ -244,8 +288,8 @@ class MergeTest(unittest.TestCase):
         with mock.patch.object(self.obj, "_copy") as copy, \
              mock.patch("glob.glob", side_effect=lambda x: [x]), \
              mock.patch.object(self.obj, "_move") as move, \
-             mock.patch("pyimgren.renamer.exif_dat",
-                        return_value=datetime.datetime(2016, 6, 4, 15, 9, 10)):
+             mock.patch("pyimgren.renamer.exif_stamp",
+                        return_value="2016-06-04T15:09:10"):
             self.obj.merge("foo", "bar", src_folder=os.path.join(self.folder, ".."))
             self.assertEqual(2, copy.call_count)
             copy.assert_any_call(os.path.join(self.folder, "..", "foo"),
@@ -260,8 +304,8 @@ class MergeTest(unittest.TestCase):
         """merge should ignore directories and warn."""
         with mock.patch.object(self.obj, "_copy") as copy, \
              mock.patch("glob.glob", side_effect=lambda x: [x]), \
-             mock.patch("pyimgren.renamer.exif_dat",
-                        return_value=datetime.datetime(2016, 6, 4, 15, 9, 10)),\
+             mock.patch("pyimgren.renamer.exif_stamp",
+                        return_value="2016-06-04T15:09:10"),\
              mock.patch("os.path.isdir", side_effect= [True, False ]), \
              mock.patch.object(self.obj.log, "warning") as warning:
             self.obj.merge("foo", "bar", src_folder=os.path.join(self.folder, ".."))
@@ -278,7 +322,7 @@ class MergeTest(unittest.TestCase):
              mock.patch.object(self.obj, "_save_names"), \
              mock.patch('glob.glob', side_effect=lambda x: [x]), \
              mock.patch('shutil.copy') as copy, \
-             mock.patch('pyimgren.renamer.exif_dat', return_value=datetime.datetime(2018,2,1)),\
+             mock.patch('pyimgren.renamer.exif_stamp', return_value="2018-02-01T00:00:00"),\
              mock.patch.object(self.obj, 'get_new_name', return_value='c'):
             self.obj.names = names
             self.obj._orig = set(self.obj.names.values())
@@ -288,3 +332,248 @@ class MergeTest(unittest.TestCase):
             self.assertTrue(copy.call_args[0][0].endswith('x'))
             self.assertTrue(copy.call_args[0][1].endswith('c'))
             self.assertEqual(collections.OrderedDict({'b': 'x', 'c': 'xa'}), self.obj.names)
+
+
+class ParallelTest(unittest.TestCase):
+    """Tests for the parallel extraction of exif dates"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.src = os.path.join(os.path.dirname(__file__), "DSCF9762.JPG")
+        self.obj = pyimgren.Renamer(self.tmp.name)
+
+    def test_thread_order(self):
+        """Files are renamed in order whatever the order of exif reads"""
+        names = [os.path.join(self.tmp.name, i) for i in "abcdef"]
+        dates = {name: datetime.datetime(2018, 2, 1 + i).isoformat()
+                 for i, name in enumerate(names)}
+        with mock.patch("os.rename") as rename, \
+             mock.patch("glob.glob", return_value=names), \
+             mock.patch("pyimgren.renamer.exif_stamp",
+                        side_effect=dates.get), \
+             mock.patch.object(self.obj, "_save_names"):
+            self.obj.rename("*", workers=3)
+            self.assertEqual(names, [c[0][0] for c in rename.call_args_list])
+            self.assertEqual(1, self.obj.workers)
+
+    def test_process_merge(self):
+        """Merge real files with a process pool"""
+        src = os.path.join(self.tmp.name, "src")
+        os.mkdir(src)
+        dst = os.path.join(self.tmp.name, "dst")
+        os.mkdir(dst)
+        for name in ("foo", "bar", "fee"):
+            shutil.copyfile(self.src, os.path.join(src, name))
+        ren = pyimgren.Renamer(dst)
+        ren.merge("foo", "bar", "fee", src_folder=src, workers=2,
+                  pool="process")
+        self.assertEqual(["20180829_152420.jpg", "20180829_152420a.jpg",
+                          "20180829_152420b.jpg", "names.log"],
+                         sorted(os.listdir(dst)))
+        self.assertEqual(["foo", "bar", "fee"], list(ren.names.values()))
+
+    def test_wrong_pool(self):
+        """An unknown pool type raises a ValueError"""
+        with self.assertRaises(ValueError):
+            self.obj.rename("*", workers=2, pool="fiber")
+
+    def make_pictures(self, folder):
+        """Bursts of pictures, pictures without date, a directory and
+        files already having the names of some pictures"""
+        import piexif
+        os.mkdir(folder)
+        for i in range(40):
+            date = "2020:01:01 08:00:{:02d}".format(i // 4).encode()
+            tags = ({"0th": {}} if i % 7 == 3
+                    else {"0th": {}, "Exif": {0x9003: date}})
+            with open(os.path.join(folder, "IMG{:02d}.JPG".format(i)),
+                      "wb") as fd:
+                fd.write(b"\xff\xd8" + b"\xff\xe1" + (len(
+                    piexif.dump(tags)) + 2).to_bytes(2, "big")
+                         + piexif.dump(tags) + b"\xff\xda\x00\x02\xff\xd9")
+        os.mkdir(os.path.join(folder, "DIR.JPG"))
+        shutil.copyfile(os.path.join(folder, "IMG05.JPG"),
+                        os.path.join(folder, "20200101_080002.jpg"))
+        for name in ("20200101_080003a.jpg", "20200101_080004.JPG"):
+            shutil.copyfile(os.path.join(folder, "IMG00.JPG"),
+                            os.path.join(folder, name))
+
+    def test_shard(self):
+        """The shard pool gives the same names as a sequential rename"""
+        results = []
+        for workers in (1, 3):
+            folder = os.path.join(self.tmp.name, str(workers))
+            self.make_pictures(folder)
+            ren = pyimgren.Renamer(folder)
+            with mock.patch("pyimgren.renamer.SHARD_SIZE", 5):
+                ren.rename("*.JPG", "*.jpg", "none*", workers=workers,
+                           pool="shard")
+            with open(os.path.join(folder, "names.log")) as fd:
+                results.append((sorted(os.listdir(folder)), fd.read(),
+                                ren.stats.counts))
+        self.assertEqual(results[0], results[1])
+
+
+class FilterTest(unittest.TestCase):
+    """Tests for the extension filters"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        src = os.path.join(os.path.dirname(__file__), "DSCF9762.JPG")
+        shutil.copyfile(src, os.path.join(self.tmp.name, "DSCF9762.JPG"))
+        for name, data in (("MOV01.MP4", b"\x00" * 64),
+                           ("DSCF9762.xmp", b"<?xpacket begin="),
+                           ("names.log", b"20180101_000000.jpg:IMG_1.JPG\n")):
+            with open(os.path.join(self.tmp.name, name), "wb") as fd:
+                fd.write(data)
+
+    def rename(self, **kwargs):
+        ren = pyimgren.Renamer(self.tmp.name, **kwargs)
+        with mock.patch("pyimgren.renamer.exif_stamp",
+                        side_effect=pyimgren.renamer.exif_stamp) as stamp:
+            ren.rename("*", dummy=True)
+        return ren, sorted(os.path.basename(c[0][0])
+                           for c in stamp.call_args_list)
+
+    def test_own_files(self):
+        """The ref_file is never read"""
+        ren, read = self.rename()
+        self.assertEqual(["DSCF9762.JPG", "DSCF9762.xmp", "MOV01.MP4"], read)
+        self.assertEqual(1, ren.stats.counts[pyimgren.progress.SKIPPED])
+        self.assertEqual(2, ren.stats.counts[pyimgren.progress.NO_DATE])
+
+    def test_own_names(self):
+        """Pictures named like the beginning of the ref_file are read"""
+        shutil.copyfile(os.path.join(self.tmp.name, "DSCF9762.JPG"),
+                        os.path.join(self.tmp.name, "photos1.jpg"))
+        for name in ("photos", "photos.journal", "photos-wal"):
+            with open(os.path.join(self.tmp.name, name), "wb") as fd:
+                fd.write(b"")
+        ren, read = self.rename(ref_file="photos", exclude=["xmp", "mp4"])
+        self.assertEqual(["DSCF9762.JPG", "names.log", "photos1.jpg"], read)
+        self.assertEqual(5, ren.stats.counts[pyimgren.progress.SKIPPED])
+
+    def test_exclude(self):
+        ren, read = self.rename(exclude=("xmp", ".mp4"))
+        self.assertEqual(["DSCF9762.JPG"], read)
+        self.assertEqual(3, ren.stats.counts[pyimgren.progress.SKIPPED])
+
+    def test_include(self):
+        ren, read = self.rename(include=[".JPG"])
+        self.assertEqual(["DSCF9762.JPG"], read)
+        self.assertEqual(["DSCF9762.JPG"], [step.source[-12:]
+                                            for step in ren._last_plan])
+
+
+class NameIndexTest(unittest.TestCase):
+    """Tests for the incremental index of names"""
+
+    def setUp(self):
+        self.obj = pyimgren.Renamer(os.path.dirname(__file__))
+        self.obj.names = collections.OrderedDict([("B.jpg", "x"),
+                                                  ("c.jpg", "x")])
+
+    def test_used_names(self):
+        """Both new and original names are known to the index"""
+        index = self.obj._names_index()
+        for name in ("B.jpg", "c.jpg", "x"):
+            self.assertIn(os.path.normcase(name), index)
+        self.assertEqual("B.jpg", index.key("B.jpg"))
+        self.assertIsNone(index.key("x"))
+
+    def test_incremental(self):
+        """The index follows changes without being rebuilt"""
+        index = self.obj._names_index()
+        index.remove("B.jpg")
+        self.assertIn("x", index)
+        index.remove("c.jpg")
+        self.assertNotIn("x", index)
+        index.add("d.jpg", "y")
+        self.assertEqual({"d.jpg": "y"}, self.obj.names)
+        self.assertIs(index, self.obj._names_index())
+
+    def test_replaced_names(self):
+        """A new names mapping gives a new index"""
+        index = self.obj._names_index()
+        self.obj.names = {"e.jpg": "z"}
+        self.assertIsNot(index, self.obj._names_index())
+        self.assertIn("z", self.obj._names_index())
+
+    def test_no_rebuild(self):
+        """get_new_file_name does not scan the names mapping"""
+        self.obj._names_index()
+        with mock.patch("os.path.exists", return_value=False), \
+             mock.patch.object(pyimgren.renamer, "_NameIndex") as index:
+            self.assertEqual("xa", self.obj.get_new_file_name("x"))
+            index.assert_not_called()
+
+
+class BackSelectionTest(unittest.TestCase):
+    """Tests for the selection of the names to rename back"""
+    names = [("20230501_100000.jpg", "a.JPG"),
+             ("20230531_235959a.jpg", "b.JPG"),
+             ("20230601_000000.jpg", "c.JPG"),
+             ("20220101_000000.jpg", "d.JPG")]       # no longer in folder
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.folder = self.tmp.name
+
+    def make(self, ref_file="names.log"):
+        ren = pyimgren.Renamer(self.folder, ref_file=ref_file)
+        ren.names = ren.load_names()
+        for new, orig in self.names:
+            ren._add_name(new, orig)
+        ren._save_names()
+        for new, _orig in self.names[:3]:
+            io.open(os.path.join(self.folder, new), "w").close()
+        io.open(os.path.join(self.folder, "x.jpg"), "w").close()
+        return pyimgren.Renamer(self.folder, ref_file=ref_file)
+
+    def test_pattern(self):
+        """Patterns are matched against names.log, not the folder"""
+        ren = self.make()
+        with mock.patch.object(ren.log, "warning") as warning, \
+             mock.patch("glob.glob") as glob:
+            ren.back("2023*.jpg")
+            glob.assert_not_called()
+            warning.assert_not_called()
+        self.assertEqual(["a.JPG", "b.JPG", "c.JPG"], sorted(
+            name for name in os.listdir(self.folder) if name.endswith(".JPG")))
+
+    def test_range(self):
+        """since and until select names by date, until being included"""
+        ren = self.make()
+        ren.back(since="2023-05", until="2023-05")
+        self.assertEqual(["a.JPG", "b.JPG"], sorted(
+            name for name in os.listdir(self.folder) if name.endswith(".JPG")))
+        ren.back("*.jpg", since=datetime.date(2023, 6, 1))
+        self.assertIn("c.JPG", os.listdir(self.folder))
+        with self.assertRaises(ValueError):
+            ren.back(until="May 2023")
+
+    def test_stale(self):
+        """Names whose file is missing are skipped with one warning"""
+        ren = self.make()
+        with mock.patch.object(ren.log, "warning") as warning:
+            ren.back()
+            warning.assert_called_once()
+        self.assertEqual({"20220101_000000.jpg": "d.JPG"}, ren.load_names())
+        self.assertEqual(3, ren.stats.counts[pyimgren.progress.RENAMED])
+
+    def test_sqlite(self):
+        """A SQLite ref_file is queried with GLOB"""
+        ren = self.make("names.db")
+        ren.back("202305[!0]*")
+        self.assertEqual(["20230501_100000.jpg", "20230601_000000.jpg"],
+                         sorted(ren.load_names())[1:])
+
+    def test_plan(self):
+        """A dry run selects the same names"""
+        ren = self.make()
+        plan = ren.plan("back", "*", until="2023-05-31")
+        self.assertEqual(["a.JPG", "b.JPG"],
+                         sorted(step.target for step in plan))
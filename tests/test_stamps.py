@@ -0,0 +1,128 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+
+import datetime
+import random
+import unittest
+
+from pyimgren import stamps
+
+
+def reference(raw):
+    """What exif_dat used to compute with strptime"""
+    try:
+        return datetime.datetime.strptime(raw.decode("ascii"),
+                                          "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return None
+
+
+class ParseTest(unittest.TestCase):
+    def test_parse(self):
+        """parse accepts and rejects the same values as strptime"""
+        for raw in (b"2018:08:29 15:24:20", b"2020:02:29 12:00:00",
+                    b"2019:02:29 12:00:00", b"1900:02:29 00:00:00",
+                    b"0000:00:00 00:00:00", b"    :  :     :  :  ",
+                    b"2020:01:01 24:00:00", b"2020:01:01 00:00:60",
+                    b"2020:1:2 3:4:5", b"2020:01:01 00:00:00\x00",
+                    b"\xff" * 19, b""):
+            dat = reference(raw)
+            self.assertEqual(None if dat is None else dat.isoformat(),
+                             stamps.parse(raw), raw)
+
+
+class ShiftTest(unittest.TestCase):
+    def test_shift(self):
+        """shift gives the same result as a timedelta"""
+        rnd = random.Random(0)
+        for _i in range(2000):
+            dat = datetime.datetime(1, 1, 1) + datetime.timedelta(
+                minutes=rnd.randrange(5_000_000_000))
+            minutes = rnd.randrange(-10_000_000, 10_000_000)
+            try:
+                expected = (dat + datetime.timedelta(minutes=minutes)
+                            ).isoformat()
+            except OverflowError:
+                with self.assertRaises(OverflowError):
+                    stamps.shift(dat.isoformat(), minutes)
+            else:
+                self.assertEqual(expected,
+                                 stamps.shift(dat.isoformat(), minutes))
+
+    def test_fraction(self):
+        """Fractions of minutes shift the seconds, as a timedelta does"""
+        self.assertEqual("2018-08-29T15:24:50",
+                         stamps.shift("2018-08-29T15:24:20", 0.5))
+        self.assertEqual("2018-08-29T15:29:20",
+                         stamps.shift("2018-08-29T15:24:20", 5.0))
+        self.assertEqual("2018-08-29T15:23:49",
+                         stamps.shift("2018-08-29T15:24:20", -0.51))
+
+    def test_leap(self):
+        self.assertEqual("2024-02-29T00:10:05",
+                         stamps.shift("2024-02-28T23:40:05", 30))
+        self.assertEqual("2023-03-01T00:10:05",
+                         stamps.shift("2023-02-28T23:40:05", 30))
+
+
+class NameFormatTest(unittest.TestCase):
+    def test_compiled(self):
+        """A numeric mask is formatted without strftime"""
+        fmt = stamps.NameFormat("IMG_{%y}%m%d-%H%M%S%%")
+        self.assertTrue(fmt.compiled)
+        self.assertEqual("IMG_{18}0829-152420%",
+                         fmt("2018-08-29T15:24:20"))
+        self.assertEqual("IMG_{18}0830-002420%",
+                         fmt("2018-08-29T15:24:20", 540))
+
+    def test_fallback(self):
+        """Other directives are passed to strftime"""
+        fmt = stamps.NameFormat("%a %d %b %Y")
+        self.assertFalse(fmt.compiled)
+        dat = datetime.datetime(2018, 8, 29)
+        self.assertEqual(dat.strftime("%a %d %b %Y"),
+                         fmt(dat.isoformat()))
+
+    def test_strftime(self):
+        """The names are the same as with strftime"""
+        rnd = random.Random(1)
+        masks = ("%Y%m%d_%H%M%S", "%y-%m-%d %Hh%M", "%j_%H", "100%%", "%")
+        for _i in range(200):
+            dat = datetime.datetime(1000, 1, 1) + datetime.timedelta(
+                minutes=rnd.randrange(4_000_000_000))
+            for mask in masks:
+                self.assertEqual(dat.strftime(mask),
+                                 stamps.NameFormat(mask)(dat.isoformat()))
+
+
+class RangeTest(unittest.TestCase):
+    def test_bound(self):
+        self.assertEqual("2023-05", stamps.bound("2023-05"))
+        self.assertEqual("2023-05-02T10:00", stamps.bound("2023-05-02 10:00"))
+        self.assertEqual("2023-05-02", stamps.bound(datetime.date(2023, 5, 2)))
+        for value in ("2023-5", "May 2023", 2023):
+            with self.assertRaises(ValueError):
+                stamps.bound(value)
+
+    def test_in_range(self):
+        """until includes the whole period it gives"""
+        self.assertTrue(stamps.in_range("2023-05-31T23:59:59", "2023-05",
+                                        "2023-05"))
+        self.assertFalse(stamps.in_range("2023-06-01T00:00:00", None,
+                                         "2023-05"))
+        self.assertFalse(stamps.in_range("2023-04-30T23:59:59", "2023-05",
+                                         None))
+
+    def test_stamp_of(self):
+        """The stamp of a name is read back with the mask"""
+        fmt = stamps.NameFormat("%Y%m%d_%H%M%S")
+        self.assertEqual("2023-05-12T10:11:12",
+                         fmt.stamp_of("20230512_101112ab.jpg"))
+        self.assertIsNone(fmt.stamp_of("DSCF9762.JPG"))
+        self.assertEqual("1999-12-01T00:00:00",
+                         stamps.NameFormat("IMG_%y%m").stamp_of("img_9912.jpg"))
+        with self.assertRaises(ValueError):
+            stamps.NameFormat("%a %H").stamp_of("Mon 12")
+        with self.assertRaises(ValueError):
+            stamps.NameFormat("%H%M").stamp_of("1210")
@@ -0,0 +1,121 @@
+#  SPDX-FileCopyrightText: 2025-present s-ball <s-ball@laposte.net>
+#  #
+#  SPDX-License-Identifier: MIT
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock as mock
+
+from pyimgren import Renamer
+from pyimgren.watch import Watcher, _Inotify
+
+PICT = os.path.join(os.path.dirname(__file__), "DSCF9762.JPG")
+
+
+def has_inotify():
+    inotify = _Inotify.open()
+    if inotify is None:
+        return False
+    inotify.close()
+    return True
+
+
+class WatchTest(unittest.TestCase):
+    """Tests for the watch mode"""
+
+    poll = True
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.folder = os.path.join(self.tmp.name, "drop")
+        os.mkdir(self.folder)
+        shutil.copyfile(PICT, os.path.join(self.folder, "old.JPG"))
+
+    def watcher(self, **kwargs):
+        watcher = Watcher([self.folder], ["*.JPG"], settle=0,
+                          interval=0.01, poll=self.poll, **kwargs)
+        self.addCleanup(watcher.close)
+        return watcher
+
+    def settle(self, watcher):
+        """Run steps until nothing is pending"""
+        count = 0
+        for _i in range(100):
+            count += watcher.step(0.01)
+            if not watcher._pending:
+                break
+        return count
+
+    def listdir(self):
+        return sorted(os.listdir(self.folder))
+
+    def test_existing(self):
+        """Files present at start are renamed, unless new_only"""
+        self.assertEqual(0, self.settle(self.watcher(existing=False)))
+        self.assertEqual(1, self.settle(self.watcher()))
+        self.assertEqual(["20180829_152420.jpg", "names.log"], self.listdir())
+
+    def test_new_files(self):
+        """New files are renamed and appended to names.log"""
+        watcher = self.watcher(existing=False)
+        ren = watcher.renamers[0]
+        shutil.copyfile(PICT, os.path.join(self.folder, "new.JPG"))
+        self.assertEqual(1, self.settle(watcher))
+        with mock.patch.object(ren, "_read_names",
+                               side_effect=AssertionError):
+            shutil.copyfile(PICT, os.path.join(self.folder, "new2.JPG"))
+            self.assertEqual(1, self.settle(watcher))
+        self.assertEqual(["20180829_152420.jpg", "20180829_152420a.jpg",
+                          "names.log", "old.JPG"], self.listdir())
+        with io.open(os.path.join(self.folder, "names.log")) as fd:
+            self.assertEqual(["20180829_152420.jpg:new.JPG",
+                              "20180829_152420a.jpg:new2.JPG"],
+                             fd.read().splitlines())
+
+    def test_settle(self):
+        """A file being written is only renamed once it has settled"""
+        watcher = self.watcher(existing=False)
+        watcher.settle = 3600
+        shutil.copyfile(PICT, os.path.join(self.folder, "new.JPG"))
+        for _i in range(3):
+            self.assertEqual(0, watcher.step(0.01))
+        self.assertEqual(1, len(watcher._pending))
+        watcher.settle = 0
+        self.assertEqual(1, self.settle(watcher))
+
+    def test_ignored(self):
+        """Files not matching the patterns or of pyimgren are ignored"""
+        watcher = Watcher([Renamer(self.folder, ref_file="names.JPG")],
+                          ["*.JPG"], settle=0, interval=0.01,
+                          poll=self.poll, existing=False)
+        self.addCleanup(watcher.close)
+        for name in ("notes.txt", "names.JPG", "x.JPG.0.pyimgren.tmp"):
+            with io.open(os.path.join(self.folder, name), "w") as fd:
+                fd.write("x")
+        self.assertEqual(0, self.settle(watcher))
+
+    def test_several_folders(self):
+        other = os.path.join(self.tmp.name, "other")
+        os.mkdir(other)
+        watcher = Watcher([Renamer(self.folder), other], ["*.JPG"],
+                          settle=0, poll=self.poll, existing=False)
+        self.addCleanup(watcher.close)
+        shutil.copyfile(PICT, os.path.join(other, "new.JPG"))
+        self.assertEqual(1, self.settle(watcher))
+        self.assertEqual(["20180829_152420.jpg", "names.log"],
+                         sorted(os.listdir(other)))
+        self.assertEqual(["old.JPG"], self.listdir())
+
+
+@unittest.skipUnless(has_inotify(), "no inotify")
+class InotifyWatchTest(WatchTest):
+    """The same tests with inotify"""
+
+    poll = False
+
+    def test_inotify(self):
+        self.assertTrue(self.watcher().inotify)